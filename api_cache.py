@@ -0,0 +1,151 @@
+"""
+Caché persistente en disco (SQLite) para las respuestas JSON de la API de
+Decorabano. Las entradas se indexan por URL + parámetros, caducan tras un
+TTL y se revalidan con peticiones condicionales (ETag / Last-Modified).
+Cuando la caché supera el tamaño máximo se eliminan las entradas menos
+usadas recientemente (LRU).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from urllib.parse import urlencode
+
+# ================================
+# CONFIGURACIÓN
+# ================================
+API_CACHE_ENABLED = True
+API_CACHE_PATH = os.path.join('.scraper_cache', 'decorabano_api.sqlite')
+API_CACHE_TTL = 24 * 60 * 60            # Segundos que una respuesta se considera fresca
+API_CACHE_MAX_BYTES = 200 * 1024 * 1024  # Tamaño máximo antes de expulsar entradas (LRU)
+
+
+def make_cache_key(url, params=None):
+    """Clave estable URL + parámetros ordenados"""
+    if not params:
+        return url
+    return f"{url}?{urlencode(sorted((str(k), str(v)) for k, v in params.items()))}"
+
+
+class ApiCache:
+    """Caché HTTP en SQLite, segura para usar desde varios hilos"""
+
+    def __init__(self, path=API_CACHE_PATH, ttl=API_CACHE_TTL, max_bytes=API_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                body TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        self._conn.commit()
+
+    # --- acceso a la tabla ---
+    def _load(self, key):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+    def _touch(self, key, refreshed=False):
+        now = time.time()
+        with self._lock:
+            if refreshed:
+                self._conn.execute(
+                    "UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+            else:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+
+    def _store(self, key, body, etag, last_modified):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, body, etag, last_modified, now, now, len(body.encode('utf-8')))
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Elimina las entradas menos usadas hasta quedar por debajo de max_bytes"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at ASC").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    # --- API pública ---
+    def get_json(self, session, url, params=None, timeout=10):
+        """
+        GET con caché. Retorna (status_code, datos_json).
+        - Entrada fresca (< TTL): no hay petición de red
+        - Entrada caducada con ETag/Last-Modified: petición condicional, 304 reutiliza el cuerpo
+        - Sin entrada o 200: se descarga y se guarda
+        """
+        key = make_cache_key(url, params)
+        cached = self._load(key)
+
+        if cached:
+            body, etag, last_modified, fetched_at = cached
+            if time.time() - fetched_at < self.ttl:
+                self.stats['hits'] += 1
+                self._touch(key)
+                return 200, json.loads(body)
+
+        headers = {}
+        if cached:
+            if cached[1]:
+                headers['If-None-Match'] = cached[1]
+            if cached[2]:
+                headers['If-Modified-Since'] = cached[2]
+
+        response = session.get(url, params=params, timeout=timeout, headers=headers)
+
+        if response.status_code == 304 and cached:
+            self.stats['revalidated'] += 1
+            self._touch(key, refreshed=True)
+            return 200, json.loads(cached[0])
+
+        self.stats['misses'] += 1
+        if response.status_code != 200:
+            return response.status_code, None
+
+        data = response.json()
+        try:
+            self._store(key, json.dumps(data, ensure_ascii=False),
+                        response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        except sqlite3.Error as e:
+            print(f"    [!] No se pudo guardar en caché {url}: {e}")
+        return 200, data
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,502 @@
+"""
+Benchmark de las etapas de transformación y exportación, sin red ni Chrome.
+Mide extract_product_data, extract_combinations_data (iter_combinations_data),
+convert_complement_to_prestashop_format y los writers de CSV sobre un
+catálogo sintético construido a partir de nuxt_data.json,
+nuxt_data-caso-especial.json y los CSVs de referencia 20251013012751-royo-*.csv
+(hasta 100k productos / 1M combinaciones).
+
+Cada etapa se ejecuta en un proceso aparte para que el pico de memoria (RSS)
+sea solo suyo. Los resultados se añaden a BENCHMARK_RESULTS_PATH y cada
+etapa se compara con la última ejecución a la misma escala.
+
+    python benchmark.py                                   # escala por defecto
+    python benchmark.py --products 100000 --combinations 1000000
+    python benchmark.py --stages products,writers --label "antes del cambio"
+
+Antes de medir se comprueba que productos, combinaciones y complementos de
+un catálogo pequeño salen byte a byte iguales que los CSVs de
+GOLDEN_OUTPUT_DIR, generados con la versión original del scraper:
+
+    git archive 4e67bb4 | tar -x -C /tmp/original
+    python benchmark.py --build-golden /tmp/original
+"""
+
+import argparse
+import contextlib
+import csv
+import importlib.util
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from functools import lru_cache
+from types import SimpleNamespace
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from csv_stream import PrestaShopCSVWriter
+from nuxt_http import project_nuxt_data
+from prestashop_rows import PRODUCT_CSV_HEADERS, COMBINATION_CSV_HEADERS, ProductRow, CombinationRow
+from royo_prestashop_ftp import extract_product_data, iter_combinations_data
+from get_complementos import convert_complement_to_prestashop_format, TAX_RATE
+
+# ================================
+# CONFIGURACIÓN
+# ================================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Páginas de producto de las que sale el catálogo sintético (se alternan como en Royo)
+NUXT_SAMPLES = ['nuxt_data.json', 'nuxt_data-caso-especial.json']
+SPECIAL_CASE_EVERY = 7  # 1 de cada 7 productos usa el caso especial
+
+# CSVs de referencia: fuente de las filas de los writers y de los complementos
+GOLDEN_CSV = {
+    'products': '20251013012751-royo-products_import.csv',
+    'combinations': '20251013012751-royo-combinations_import.csv',
+    'complements': '20251013012751-royo-complements_import.csv',
+}
+
+# CSVs generados con la versión original (build_golden) a partir de un catálogo sintético
+# pequeño y de los complementos de referencia; check_golden los compara byte a byte
+GOLDEN_OUTPUT_DIR = os.path.join(BASE_DIR, 'benchmark_golden')
+GOLDEN_OUTPUT_CSV = {
+    'products': 'products_import.csv',
+    'combinations': 'combinations_import.csv',
+    'complements': 'complements_import.csv',
+}
+GOLDEN_PRODUCTS = 14  # Incluye 2 casos especiales (SPECIAL_CASE_EVERY)
+GOLDEN_COMBINATIONS = 300
+
+# Escala por defecto (la de referencia: 48 productos, 1232 combinaciones, 73 complementos)
+DEFAULT_PRODUCTS = 1000
+DEFAULT_COMBINATIONS = 10000
+DEFAULT_COMPLEMENTS = 1500
+
+STAGES = ['products', 'combinations', 'complements', 'writers']
+
+# Unidades (productos / complementos / filas) que se repiten con tracemalloc
+ALLOC_SAMPLE = 1000
+
+# Historial de resultados (una línea JSON por ejecución)
+BENCHMARK_RESULTS_PATH = os.path.join(BASE_DIR, 'benchmark_results.jsonl')
+# Caída de filas/s respecto a la ejecución anterior a partir de la que se avisa
+REGRESSION_THRESHOLD = 0.10
+
+IMAGE_URL_PREFIX = "https://cdn.todomueblesdebano.com/image/upload/f_auto%2Cq_auto/v1/"
+
+# ================================
+# CSVs DE REFERENCIA
+# ================================
+# Campo de un CSV de PrestaShop: entre comillas (texto) o sin ellas (número)
+_CSV_FIELD = re.compile(r'"((?:[^"]|"")*)"|([^;"\r\n]*)')
+
+def parse_csv_line(line):
+    """
+    Línea de un CSV generado con CSV_FORMAT → lista de valores con su tipo
+    (los campos sin comillas son int o float), tal y como se escribieron
+    """
+    values = []
+    pos = 0
+    while True:
+        match = _CSV_FIELD.match(line, pos)
+        quoted, number = match.groups()
+        if quoted is not None:
+            values.append(quoted.replace('""', '"'))
+        else:
+            values.append(float(number) if any(c in number for c in '.eE') else int(number))
+        pos = match.end()
+        if pos >= len(line):
+            return values
+        pos += 1  # ';'
+
+@lru_cache(maxsize=None)
+def read_golden(kind):
+    """Retorna (texto del fichero, cabeceras, filas con tipo); se lee una vez por proceso"""
+    with open(os.path.join(BASE_DIR, GOLDEN_CSV[kind]), encoding='utf-8', newline='') as f:
+        text = f.read()
+    lines = text.splitlines()
+    return text, parse_csv_line(lines[0]), [parse_csv_line(line) for line in lines[1:]]
+
+def golden_complement_data(row):
+    """
+    Fila de complemento de referencia → respuesta de la API equivalente
+    (lo que convert_complement_to_prestashop_format recibió para generarla)
+    """
+    row = dict(zip(PRODUCT_CSV_HEADERS, row))
+    name, brand = row['Name *'], row['Supplier']
+    price_cents = round((row['Price tax excluded'] or 0) * TAX_RATE * 100)
+    discount_cents = round((row['Discount amount'] or 0) * 100)
+    tags = row['Tags (x,y,z...)'].split(',')
+    type_name = next((tag for tag in tags if tag not in ('complemento', 'baño', brand.lower())), 'Complemento')
+    delivery = re.match(r'Entre (.+) y (.+) días', row['Delivery time of in-stock products'])
+    return {
+        'name': name,
+        'sub_name': row['Description'][len(name):].strip(),
+        'ref': row['Reference #'],
+        'slug': row['URL rewritten'],
+        'ean': row['EAN13'],
+        'mpn': row['MPN'],
+        'brand': brand,
+        'price': price_cents,
+        'pvp_supplier': price_cents + discount_cents,
+        'web_discount': row['Discount percent'] or 0,
+        'img': row['Image URLs (x,y,z...)'].replace(IMAGE_URL_PREFIX, '', 1),
+        'delivery_time': {'min': float(delivery.group(1)), 'max': float(delivery.group(2))} if delivery else {},
+        'complement_type': {'name': type_name},
+    }
+
+# ================================
+# CATÁLOGO SINTÉTICO
+# ================================
+@lru_cache(maxsize=None)
+def load_nuxt_samples():
+    """Páginas de muestra proyectadas (se cargan una vez: no cuentan en las asignaciones)"""
+    samples = []
+    for filename in NUXT_SAMPLES:
+        with open(os.path.join(BASE_DIR, filename), encoding='utf-8') as f:
+            samples.append(project_nuxt_data(json.load(f)))
+    return samples
+
+def synthetic_catalogue(products, combinations, limit=None):
+    """
+    Genera (numeric_id, nuxt_data) de `products` productos con `combinations`
+    variantes en total, sin tenerlos todos en memoria. Cada producto es una
+    copia superficial de una página de muestra con su propio UUID, nombre y
+    referencias de variantes.
+    """
+    samples = load_nuxt_samples()
+    per_product, extra = divmod(combinations, products) if products else (0, 0)
+    for i in range(min(products, limit) if limit else products):
+        nuxt = samples[1] if i % SPECIAL_CASE_EVERY == SPECIAL_CASE_EVERY - 1 else samples[0]
+        product = dict(nuxt['state']['product']['product'])
+        product['id'] = f"bench-{i:08d}"
+        product['name'] = f"{product.get('name', '')} {i}"
+        base_variants = product.get('variants') or [{}]
+        product['variants'] = [dict(base_variants[k % len(base_variants)], ref=f"B{i}-{k}")
+                               for k in range(per_product + (1 if i < extra else 0))]
+        state_product = dict(nuxt['state']['product'], product=product)
+        yield 87 + i, {'state': dict(nuxt['state'], product=state_product)}
+
+def golden_rows(kind, row_type, count):
+    """count filas compactas recorriendo en bucle las de referencia"""
+    _, _, rows = read_golden(kind)
+    rows = [row_type(row) for row in rows]
+    for i in range(count):
+        yield rows[i % len(rows)]
+
+# ================================
+# SALIDA DE REFERENCIA (VERSIÓN ORIGINAL)
+# ================================
+def golden_outputs(extract_product, extract_combinations, convert_complement, driver_for=lambda product: None):
+    """
+    {tipo: filas} de las tres conversiones sobre las entradas de referencia
+    (catálogo sintético de GOLDEN_PRODUCTS productos y las 73 filas de
+    complementos convertidas en su respuesta de la API)
+    """
+    outputs = {'products': [], 'combinations': [], 'complements': []}
+    for numeric_id, nuxt_data in synthetic_catalogue(GOLDEN_PRODUCTS, GOLDEN_COMBINATIONS):
+        driver = driver_for(nuxt_data['state']['product']['product'])
+        product_row = extract_product(nuxt_data, numeric_id, driver)
+        if product_row:
+            outputs['products'].append(product_row)
+        outputs['combinations'].extend(extract_combinations(nuxt_data, numeric_id))
+    _, _, rows = read_golden('complements')
+    outputs['complements'] = [convert_complement(golden_complement_data(row), row[0]) for row in rows]
+    return outputs
+
+@lru_cache(maxsize=None)
+def recorded_dom_prices():
+    """
+    {URL rewritten: (precio con IVA, en oferta)} del CSV de productos de
+    referencia: el precio que la versión original leyó del navegador en una
+    ejecución real (allí Price tax excluded = precio del DOM / TAX_RATE)
+    """
+    _, headers, rows = read_golden('products')
+    prices = {}
+    for row in rows:
+        row = dict(zip(headers, row))
+        prices.setdefault(row['URL rewritten'], (round(row['Price tax excluded'] * TAX_RATE, 2),
+                                                 row['On sale (0/1)'] == 1))
+    return prices
+
+class OriginalPriceDOM:
+    """
+    Navegador de la versión original con el precio grabado para la página en
+    el CSV de referencia (recorded_dom_prices): el tachado si estaba en
+    oferta, si no el normal. No se deduce del __NUXT__, así que check_golden
+    contrasta el precio calculado a partir de la API con el que se vio en la web
+    """
+
+    def __init__(self, product):
+        self.price, self.on_sale = recorded_dom_prices()[product['slug']]
+
+    def find_element(self, by, selector):
+        if selector == "span.line-through" and not self.on_sale:
+            raise LookupError(selector)
+        return SimpleNamespace(text=f"{self.price:.2f}".replace('.', ',') + "€")
+
+def load_original_module(original_dir, name):
+    """Módulo de la versión original con otro nombre (sin sustituir al actual)"""
+    spec = importlib.util.spec_from_file_location(f"original_{name}", os.path.join(original_dir, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # Las etiquetas salían de set(): con el orden de inserción el resultado es estable entre ejecuciones
+    module.set = lambda items=(): dict.fromkeys(items)
+    return module
+
+def build_golden(original_dir):
+    """Regenera GOLDEN_OUTPUT_DIR con la versión original (un árbol de `git archive 4e67bb4`)"""
+    original = load_original_module(original_dir, 'royo_prestashop_ftp')
+    original_complements = load_original_module(original_dir, 'get_complementos')
+    with contextlib.redirect_stdout(io.StringIO()):
+        outputs = golden_outputs(original.extract_product_data, original.extract_combinations_data,
+                                 original_complements.convert_complement_to_prestashop_format,
+                                 driver_for=OriginalPriceDOM)
+    headers = {'products': original.PRODUCT_CSV_HEADERS, 'combinations': original.COMBINATION_CSV_HEADERS,
+               'complements': original_complements.PRODUCT_CSV_HEADERS}
+    os.makedirs(GOLDEN_OUTPUT_DIR, exist_ok=True)
+    for kind, filename in GOLDEN_OUTPUT_CSV.items():
+        # Mismo writer que usaba la versión original
+        with open(os.path.join(GOLDEN_OUTPUT_DIR, filename), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=headers[kind], delimiter=';', quoting=csv.QUOTE_NONNUMERIC)
+            writer.writeheader()
+            writer.writerows(outputs[kind])
+        print(f"✅ {filename}: {len(outputs[kind])} filas")
+
+def check_golden():
+    """
+    {tipo: ok}: la versión actual, con las mismas entradas, genera (con
+    PrestaShopCSVWriter) los mismos bytes que la versión original
+    """
+    outputs = golden_outputs(extract_product_data, iter_combinations_data, convert_complement_to_prestashop_format)
+    headers = {'products': PRODUCT_CSV_HEADERS, 'combinations': COMBINATION_CSV_HEADERS,
+               'complements': PRODUCT_CSV_HEADERS}
+    checks = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind, filename in GOLDEN_OUTPUT_CSV.items():
+            path = os.path.join(tmp, filename)
+            with PrestaShopCSVWriter(path, headers[kind]) as writer:
+                writer.write_rows(outputs[kind])
+            with open(path, 'rb') as current, open(os.path.join(GOLDEN_OUTPUT_DIR, filename), 'rb') as golden:
+                checks[kind] = current.read() == golden.read()
+    return checks
+
+# ================================
+# ETAPAS
+# ================================
+def bench_products(scale, limit=None):
+    rows = 0
+    for numeric_id, nuxt_data in synthetic_catalogue(scale['products'], scale['combinations'], limit):
+        if extract_product_data(nuxt_data, numeric_id):
+            rows += 1
+    return rows
+
+def bench_combinations(scale, limit=None):
+    rows = 0
+    for numeric_id, nuxt_data in synthetic_catalogue(scale['products'], scale['combinations'], limit):
+        for _ in iter_combinations_data(nuxt_data, numeric_id):
+            rows += 1
+    return rows
+
+def bench_complements(scale, limit=None):
+    _, _, golden = read_golden('complements')
+    complements = [golden_complement_data(row) for row in golden]
+    count = min(scale['complements'], limit) if limit else scale['complements']
+    for i in range(count):
+        convert_complement_to_prestashop_format(complements[i % len(complements)], 136 + i)
+    return count
+
+def bench_writers(scale, limit=None):
+    """Productos y combinaciones de referencia (en bucle) escritos en streaming"""
+    products = min(scale['products'], limit) if limit else scale['products']
+    combinations = min(scale['combinations'], limit) if limit else scale['combinations']
+    with tempfile.TemporaryDirectory() as tmp:
+        with PrestaShopCSVWriter(os.path.join(tmp, 'products.csv'), PRODUCT_CSV_HEADERS) as writer:
+            writer.write_rows(golden_rows('products', ProductRow, products))
+        with PrestaShopCSVWriter(os.path.join(tmp, 'combinations.csv'), COMBINATION_CSV_HEADERS) as writer:
+            writer.write_rows(golden_rows('combinations', CombinationRow, combinations))
+    return products + combinations
+
+STAGE_FUNCTIONS = {
+    'products': bench_products,
+    'combinations': bench_combinations,
+    'complements': bench_complements,
+    'writers': bench_writers,
+}
+
+# ================================
+# MEDICIÓN
+# ================================
+def peak_rss_bytes():
+    """Pico de memoria residente del proceso (None si no se puede saber)"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # macOS: bytes; Linux: KB
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                    'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize
+    except (AttributeError, OSError):
+        return None
+
+def _mb(value):
+    return round(value / (1024 * 1024), 1) if value is not None else None
+
+def measure_stage(stage, scale):
+    """Ejecuta una etapa en este proceso: tiempo y RSS a escala completa, asignaciones con una muestra"""
+    function = STAGE_FUNCTIONS[stage]
+    rss_base = peak_rss_bytes()
+
+    start = time.perf_counter()
+    rows = function(scale)
+    seconds = time.perf_counter() - start
+    rss_peak = peak_rss_bytes()
+
+    # Asignaciones: la misma etapa con ALLOC_SAMPLE unidades bajo tracemalloc (mucho más lento)
+    tracemalloc.start()
+    sample_rows = function(scale, ALLOC_SAMPLE)
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'rows': rows,
+        'seconds': round(seconds, 3),
+        'rows_per_s': round(rows / seconds) if seconds else None,
+        'rss_base_mb': _mb(rss_base),
+        'rss_peak_mb': _mb(rss_peak),
+        'alloc_sample_rows': sample_rows,
+        'alloc_peak_kb': round(alloc_peak / 1024, 1),
+    }
+
+def run_stage_in_subprocess(stage, scale):
+    """Cada etapa en un proceso nuevo: el pico de RSS no arrastra el de las anteriores"""
+    command = [sys.executable, os.path.abspath(__file__), '--stage', stage,
+               '--products', str(scale['products']), '--combinations', str(scale['combinations']),
+               '--complements', str(scale['complements'])]
+    completed = subprocess.run(command, cwd=BASE_DIR, capture_output=True, text=True, encoding='utf-8')
+    if completed.returncode != 0:
+        raise RuntimeError(f"La etapa {stage} falló:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+# ================================
+# HISTORIAL
+# ================================
+def code_version():
+    """Commit actual (con -dirty si hay cambios sin confirmar), o None fuera de git"""
+    try:
+        completed = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=BASE_DIR,
+                                   capture_output=True, text=True)
+    except OSError:
+        return None
+    return completed.stdout.strip() or None
+
+def previous_result(path, scale):
+    """Última ejecución guardada con la misma escala"""
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                result = json.loads(line)
+                if result.get('scale') == scale:
+                    previous = result
+    return previous
+
+def save_result(path, result):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+def print_stage(stage, metrics, previous):
+    comparison = ""
+    old = (previous or {}).get('stages', {}).get(stage)
+    if old and old.get('rows_per_s') and metrics['rows_per_s']:
+        change = metrics['rows_per_s'] / old['rows_per_s'] - 1
+        flag = "⚠️ " if change < -REGRESSION_THRESHOLD else ""
+        comparison = f"  {flag}{change:+.1%} vs {previous.get('version') or previous['timestamp']}"
+    print(f"  📊 {stage:<13} {metrics['rows']:>9} filas  {metrics['seconds']:>8.2f} s  "
+          f"{metrics['rows_per_s']:>9} filas/s  RSS {metrics['rss_base_mb']} → {metrics['rss_peak_mb']} MB  "
+          f"asignaciones {metrics['alloc_peak_kb']} KB ({metrics['alloc_sample_rows']} filas){comparison}")
+
+# ================================
+# FUNCIÓN PRINCIPAL
+# ================================
+def main(scale, stages, label=None, results_path=BENCHMARK_RESULTS_PATH, save=True):
+    print(f"⏱️  Benchmark: {scale['products']} productos, {scale['combinations']} combinaciones, "
+          f"{scale['complements']} complementos")
+
+    golden = check_golden()
+    for name, ok in golden.items():
+        print(f"  {'✅' if ok else '❌'} Referencia {name}: "
+              f"{'idéntica' if ok else 'DIFERENTE de la versión original (benchmark_golden/)'}")
+
+    previous = previous_result(results_path, scale)
+    result = {
+        'timestamp': datetime.now().strftime("%Y%m%d%H%M%S"),
+        'version': code_version(),
+        'label': label,
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'scale': scale,
+        'golden': golden,
+        'stages': {},
+    }
+    for stage in stages:
+        metrics = run_stage_in_subprocess(stage, scale)
+        result['stages'][stage] = metrics
+        print_stage(stage, metrics, previous)
+
+    if save:
+        save_result(results_path, result)
+        print(f"💾 Resultados añadidos a {results_path}")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de las etapas de transformación y exportación")
+    parser.add_argument('--products', type=int, default=DEFAULT_PRODUCTS)
+    parser.add_argument('--combinations', type=int, default=DEFAULT_COMBINATIONS)
+    parser.add_argument('--complements', type=int, default=DEFAULT_COMPLEMENTS)
+    parser.add_argument('--stages', default=",".join(STAGES),
+                        help=f"etapas separadas por comas (por defecto {','.join(STAGES)})")
+    parser.add_argument('--label', help="nota que se guarda con los resultados")
+    parser.add_argument('--results', default=BENCHMARK_RESULTS_PATH, help="fichero de historial (JSON por líneas)")
+    parser.add_argument('--no-save', action='store_true', help="no añadir los resultados al historial")
+    parser.add_argument('--build-golden', metavar='DIR',
+                        help="regenerar benchmark_golden/ con la versión original extraída en DIR")
+    parser.add_argument('--stage', choices=STAGES, help=argparse.SUPPRESS)  # proceso hijo de una etapa
+    args = parser.parse_args()
+
+    scale = {'products': args.products, 'combinations': args.combinations, 'complements': args.complements}
+    if args.build_golden:
+        build_golden(args.build_golden)
+    elif args.stage:
+        print(json.dumps(measure_stage(args.stage, scale)))
+    else:
+        stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+        unknown = [stage for stage in stages if stage not in STAGE_FUNCTIONS]
+        if unknown:
+            parser.error(f"etapas desconocidas: {', '.join(unknown)}")
+        result = main(scale, stages, args.label, args.results, save=not args.no_save)
+        if not all(result['golden'].values()):
+            sys.exit(1)
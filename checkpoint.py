@@ -0,0 +1,136 @@
+"""
+Diario (journal) de checkpoints para reanudar ejecuciones largas. Cada etapa
+del proceso (URLs descubiertas, cada producto extraído, complementos por
+producto, ficheros subidos al FTP) se añade como una línea JSON a un fichero
+por marca. Si la ejecución anterior no llegó a terminar, la siguiente
+reanuda desde la última unidad de trabajo completada, siempre que no tenga
+más de CHECKPOINT_MAX_AGE segundos (precios y complementos viejos).
+"""
+
+import os
+import re
+import json
+import threading
+from datetime import datetime
+
+from incremental_state import STATE_DIR
+
+# ================================
+# CONFIGURACIÓN
+# ================================
+CHECKPOINT_DIR = os.path.join(STATE_DIR, 'checkpoints')
+# Antigüedad máxima (desde el inicio) de una ejecución para reanudarla; si es
+# mayor, p. ej. porque la subida al FTP falla una y otra vez, se empieza de cero
+CHECKPOINT_MAX_AGE = 6 * 60 * 60
+
+
+def journal_name(brand_url):
+    """Nombre de fichero a partir de la URL de la marca (…/marcas/royo/ → royo)"""
+    slug = re.sub(r'[^a-z0-9]+', '-', brand_url.lower().rstrip('/').rsplit('/', 1)[-1]).strip('-')
+    return f"{slug or 'run'}.jsonl"
+
+
+class RunJournal:
+    """
+    Journal append-only de una ejecución. Al crearlo:
+    - si existe un journal sin registro 'done' de menos de max_age segundos
+      → se carga y resumed = True
+    - en otro caso → se empieza uno nuevo con el timestamp indicado
+      (expired = True si se descartó uno sin terminar por antiguo)
+    """
+
+    def __init__(self, brand_url, timestamp, directory=CHECKPOINT_DIR, max_age=CHECKPOINT_MAX_AGE):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, journal_name(brand_url))
+        self._lock = threading.Lock()
+
+        self.timestamp = timestamp
+        self.resumed = False
+        self.urls = None
+        self.products = {}      # {índice: resultado de process_product}
+        self.complements = {}   # {product_uuid: [(comp_type, complements_list), ...]}
+        self.uploaded = set()   # ficheros ya subidos al FTP
+
+        records = self._read_records()
+        unfinished = bool(records) and records[-1].get('stage') != 'done'
+        self.expired = unfinished and self._age(records[0]) > max_age
+        if unfinished and not self.expired:
+            self.resumed = True
+            for record in records:
+                self._apply(record)
+        else:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'stage': 'start', 'timestamp': timestamp,
+                                    'brand_url': brand_url,
+                                    'started_at': datetime.now().isoformat()}) + '\n')
+
+    @staticmethod
+    def _age(start_record):
+        """Segundos desde el inicio de la ejecución (infinito si no se sabe)"""
+        try:
+            started_at = datetime.fromisoformat(start_record['started_at'])
+        except (KeyError, TypeError, ValueError):
+            return float('inf')
+        return (datetime.now() - started_at).total_seconds()
+
+    def _read_records(self):
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Última línea a medio escribir (proceso interrumpido)
+                    break
+        return records
+
+    def _apply(self, record):
+        stage = record.get('stage')
+        if stage == 'start':
+            self.timestamp = record['timestamp']
+        elif stage == 'urls':
+            self.urls = record['data']
+        elif stage == 'product':
+            result = record['data']
+            if result.get('complements') is not None:
+                result['complements'] = [tuple(entry) for entry in result['complements']]
+            self.products[record['index']] = result
+        elif stage == 'complements':
+            self.complements[record['uuid']] = [tuple(entry) for entry in record['data']]
+        elif stage == 'upload':
+            self.uploaded.add(record['file'])
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    # --- registro de etapas ---
+    def record_urls(self, product_urls_with_context):
+        self.urls = product_urls_with_context
+        self._append({'stage': 'urls', 'data': product_urls_with_context})
+
+    def record_product(self, index, result):
+        """Llamado desde los workers al terminar cada producto"""
+        if result is None:
+            return  # Los fallos no se guardan: se reintentan al reanudar
+        self.products[index] = result
+        self._append({'stage': 'product', 'index': index, 'data': result})
+
+    def record_complements(self, complements_by_product):
+        for product_uuid, complements in complements_by_product.items():
+            self.complements[product_uuid] = complements
+            self._append({'stage': 'complements', 'uuid': product_uuid, 'data': complements})
+
+    def record_upload(self, filename):
+        self.uploaded.add(filename)
+        self._append({'stage': 'upload', 'file': filename})
+
+    def finish(self):
+        """Marca la ejecución como completa: la próxima empezará de cero"""
+        self._append({'stage': 'done', 'finished_at': datetime.now().isoformat()})
@@ -0,0 +1,211 @@
+"""
+Índice global de complementos para el PASO 3. Toma los tipos de complemento
+del propio __NUXT__ cuando vienen en la página (sin llamada a
+complement_types) y pide cada lista una sola vez por (producto, tipo),
+aunque el producto aparezca en varias colecciones o marcas. La lista de
+complementos depende del producto (no hay clave más general verificada),
+así que las peticiones escalan con productos × tipos; las listas con el
+mismo contenido se guardan una única vez.
+"""
+
+import json
+import queue
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from get_complementos import (get_api_session, get_complement_types, get_complements_by_type,
+                              API_MAX_CONCURRENCY)
+
+# ================================
+# CONFIGURACIÓN
+# ================================
+# Pipeline PASO 2 → PASO 3: productos en espera como máximo (si la API va más
+# lenta que la extracción, los workers esperan) y segundos que se espera a
+# completar un lote antes de enviarlo incompleto
+PIPELINE_QUEUE_SIZE = 100
+PIPELINE_BATCH_WAIT = 2.0
+
+_DONE = object()
+
+
+def compact_complement_type(comp_type):
+    """Solo los campos del tipo que se usan aguas abajo"""
+    return {'id': comp_type.get('id', ''), 'web_name': comp_type.get('web_name', '')}
+
+
+def complement_types_from_nuxt(nuxt_data):
+    """Tipos de complemento de state.product.configuration.options (None si la página no los trae)"""
+    try:
+        complement_types = nuxt_data['state']['product']['configuration']['options']['complement_types']
+    except (KeyError, TypeError):
+        return None
+    if not isinstance(complement_types, list):
+        return None
+    return [compact_complement_type(comp_type) for comp_type in complement_types if comp_type.get('id')]
+
+
+def _list_hash(complements_list):
+    payload = json.dumps(complements_list, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ComplementIndex:
+    """
+    Catálogo {producto → [(tipo, lista)]} con las listas deduplicadas.
+    Uso: add_product() por cada UUID, fetch() una vez, results().
+    Los productos con alguna llamada fallida quedan en `failed` y no salen en
+    results(): sin complementos en esta ejecución, pero sin guardarse como
+    "no tiene complementos" (se vuelven a pedir en la siguiente).
+    """
+
+    def __init__(self):
+        self.types_by_product = {}  # {product_uuid: [comp_type, ...] o None si hay que pedirlos}
+        self.lists = {}             # {hash: complements_list} (cada lista distinta una sola vez)
+        self.list_by_pair = {}      # {(product_uuid, type_id): hash}
+        self.failed = set()         # productos con alguna llamada fallida
+        self.stats = {'products': 0, 'type_requests': 0, 'list_requests': 0, 'distinct_lists': 0, 'failed': 0}
+
+    def add_product(self, product_uuid, complement_types=None):
+        """complement_types: los del __NUXT__ si se conocen (evita la llamada a complement_types)"""
+        if product_uuid and product_uuid not in self.types_by_product:
+            self.types_by_product[product_uuid] = complement_types
+
+    def _plan(self):
+        """Peticiones a hacer: pares (product_uuid, type_id) sin repetir"""
+        return list(dict.fromkeys(
+            (product_uuid, comp_type.get('id', ''))
+            for product_uuid, complement_types in self.types_by_product.items()
+            for comp_type in complement_types or []))
+
+    def fetch(self, max_workers=API_MAX_CONCURRENCY, session=None):
+        """Descarga en paralelo los tipos que falten y la lista de cada (producto, tipo)"""
+        session = session or get_api_session()
+        self.stats['products'] = len(self.types_by_product)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # 1. complement_types solo de los productos cuya página no los traía
+            missing = [uuid for uuid, types in self.types_by_product.items() if types is None]
+            for product_uuid, complement_types in zip(
+                    missing, executor.map(lambda uuid: get_complement_types(uuid, session), missing)):
+                if complement_types is None:
+                    self.failed.add(product_uuid)
+                self.types_by_product[product_uuid] = [
+                    compact_complement_type(comp_type) for comp_type in complement_types or []]
+            self.stats['type_requests'] = len(missing)
+
+            # 2. una petición por (producto, tipo)
+            pairs = self._plan()
+            complements_lists = executor.map(lambda pair: get_complements_by_type(*pair, session), pairs)
+            for pair, complements_list in zip(pairs, complements_lists):
+                if complements_list is None:
+                    self.failed.add(pair[0])
+                    continue
+                list_hash = _list_hash(complements_list)
+                self.lists.setdefault(list_hash, complements_list or [])
+                self.list_by_pair[pair] = list_hash
+            self.stats['list_requests'] = len(pairs)
+
+        self.stats['distinct_lists'] = len(self.lists)
+        self.stats['failed'] = len(self.failed)
+        return self
+
+    def complements_for(self, product_uuid):
+        """[(comp_type, complements_list), ...] en el orden de tipos de la página/API"""
+        return [
+            (comp_type, self.lists[self.list_by_pair[(product_uuid, comp_type.get('id', ''))]])
+            for comp_type in self.types_by_product.get(product_uuid) or []
+        ]
+
+    def results(self):
+        """{product_uuid: [(comp_type, complements_list), ...]} (mismo formato que antes), sin los fallidos"""
+        return {product_uuid: self.complements_for(product_uuid)
+                for product_uuid in self.types_by_product if product_uuid not in self.failed}
+
+
+class ComplementPipeline:
+    """
+    Etapa consumidora del PASO 3 solapada con el PASO 2: los workers de
+    productos envían cada UUID en cuanto lo conocen (submit) y un hilo los
+    agrupa en lotes de batch_size (o lo que haya tras PIPELINE_BATCH_WAIT s)
+    y descarga sus complementos mientras se siguen visitando páginas.
+    Los resultados se acumulan en complements_by_product; cada lote se anota
+    en el journal con el que se envió cada producto.
+    """
+
+    def __init__(self, complements_by_product, batch_size, max_workers=API_MAX_CONCURRENCY,
+                 queue_size=PIPELINE_QUEUE_SIZE):
+        self.complements_by_product = complements_by_product
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max_workers
+        self.stats = {'products': 0, 'type_requests': 0, 'list_requests': 0, 'failed': 0, 'batches': 0}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._submitted = set()
+        self._lock = threading.Lock()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, product_uuid, complement_types=None, journal=None):
+        """Encola un producto (una sola vez por UUID). Bloquea si la cola está llena"""
+        if not product_uuid:
+            return
+        with self._lock:
+            if product_uuid in self.complements_by_product or product_uuid in self._submitted:
+                return
+            self._submitted.add(product_uuid)
+        self._queue.put((product_uuid, complement_types, journal))
+
+    def close(self):
+        """Espera a que se descarguen los pendientes; relanza el error de la etapa si lo hubo"""
+        self._queue.put(_DONE)
+        self._thread.join()
+        if self._error:
+            raise self._error
+
+    def _run(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get(timeout=PIPELINE_BATCH_WAIT)
+            except queue.Empty:
+                item = None
+            if item is _DONE:
+                break
+            if item is not None:
+                batch.append(item)
+            if batch and (item is None or len(batch) >= self.batch_size):
+                self._fetch(batch)
+                batch = []
+        if batch:
+            self._fetch(batch)
+
+    def _fetch(self, batch):
+        if self._error:
+            return  # Tras un fallo solo se vacía la cola (los workers no se quedan bloqueados)
+        try:
+            index = ComplementIndex()
+            for product_uuid, complement_types, _ in batch:
+                index.add_product(product_uuid, complement_types)
+            index.fetch(self.max_workers)
+            batch_results = index.results()
+            for key in ('products', 'type_requests', 'list_requests', 'failed'):
+                self.stats[key] += index.stats[key]
+            self.stats['batches'] += 1
+            failed = f", ⚠️  {index.stats['failed']} con fallos de la API" if index.failed else ""
+            print(f"  🔧 Lote {self.stats['batches']}: complementos de {len(batch)} productos "
+                  f"({index.stats['list_requests']} listas{failed})")
+
+            # Los fallidos no se guardan (ni aquí ni en el journal): se vuelven a pedir en la próxima ejecución
+            self.complements_by_product.update(batch_results)
+            by_journal = {}
+            for product_uuid, _, journal in batch:
+                if journal is not None and product_uuid in batch_results:
+                    by_journal.setdefault(id(journal), (journal, {}))[1][product_uuid] = batch_results[product_uuid]
+            for journal, journal_results in by_journal.values():
+                journal.record_complements(journal_results)
+        except Exception as e:
+            self._error = e
@@ -0,0 +1,98 @@
+"""
+Escritura de los CSVs de PrestaShop en streaming: cada fila se escribe en
+cuanto es definitiva en lugar de acumular todas en memoria hasta el final.
+Las filas que todavía no son definitivas (productos pendientes de la
+columna de accesorios) esperan en un fichero temporal compacto y se
+completan al leerlas de vuelta.
+"""
+
+import csv
+import json
+import tempfile
+
+# Mismo formato en todos los CSVs: ';' y textos entre comillas
+CSV_FORMAT = {'delimiter': ';', 'quoting': csv.QUOTE_NONNUMERIC}
+
+
+def row_values(row, headers):
+    """
+    Fila → lista de valores en el orden de headers. Las filas compactas
+    (prestashop_rows) ya lo son; un dict se ordena ('' si falta la columna).
+    """
+    if isinstance(row, list):
+        return row
+    return [row.get(header, '') for header in headers]
+
+
+class PrestaShopCSVWriter:
+    """
+    CSV que se abre con la primera fila: si no llega ninguna no se crea el
+    fichero (igual que antes, cuando solo se escribía con filas).
+    Acepta filas compactas (prestashop_rows) o listas de valores en el orden
+    de headers, que se escriben tal cual, y también dicts.
+    """
+
+    def __init__(self, filename, headers):
+        self.filename = filename
+        self.headers = headers
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def _open(self):
+        self._file = open(self.filename, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file, **CSV_FORMAT)
+        self._writer.writerow(self.headers)
+
+    def write(self, row):
+        if self._file is None:
+            self._open()
+        self._writer.writerow(row_values(row, self.headers))
+        self.count += 1
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write(row)
+        return self
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RowSpill:
+    """
+    Fichero temporal de registros pendientes, una línea JSON por registro.
+    Las filas se guardan como lista de valores (row_values) para no repetir
+    las claves en cada línea. Se borra solo al cerrarlo.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._file = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+
+    def append(self, record):
+        """record: cualquier estructura serializable a JSON"""
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self.count += 1
+
+    def __iter__(self):
+        """Relee los registros en el orden en que se añadieron"""
+        self._file.flush()
+        self._file.seek(0)
+        for line in self._file:
+            yield json.loads(line)
+        self._file.seek(0, 2)
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._file.close()
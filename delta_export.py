@@ -0,0 +1,155 @@
+"""
+Exportación delta: compara las filas de la ejecución actual con la foto
+(snapshot) de lo último que se subió al FTP y genera solo las filas nuevas
+o modificadas, más una lista de desactivación para los productos que han
+desaparecido. La foto se actualiza únicamente tras una subida correcta.
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+
+from incremental_state import STATE_DIR
+from csv_stream import PrestaShopCSVWriter
+
+# ================================
+# CONFIGURACIÓN
+# ================================
+DELTA_SNAPSHOT_PATH = os.path.join(STATE_DIR, 'export_snapshot.sqlite')
+
+IMAGE_URLS_COLUMN = 'Image URLs (x,y,z...)'
+DELETE_IMAGES_COLUMN = 'Delete existing images (0 = No, 1 = Yes)'
+ACTIVE_COLUMN = 'Active (0/1)'
+
+
+def row_hash(row):
+    """Hash estable de una fila (o lista de filas) del CSV"""
+    payload = json.dumps(row, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def write_prestashop_csv(filename, rows, headers):
+    """Escribe filas con el mismo formato que el resto de CSVs (';' y QUOTE_NONNUMERIC)"""
+    with PrestaShopCSVWriter(filename, headers) as writer:
+        writer.write_rows(rows)
+
+
+class DeltaExporter:
+    """
+    Foto persistente de lo último subido, por tipo de fichero:
+    'products', 'complements' (clave: Product ID) y 'combinations'
+    (clave: Id del Producto; se comparan todas las combinaciones del producto juntas)
+    """
+
+    def __init__(self, path=DELTA_SNAPSHOT_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS snapshot (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                row_hash TEXT NOT NULL,
+                row_json TEXT NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        """)
+        self._conn.commit()
+        self._pending = {}
+
+    def _load(self, kind):
+        return {
+            key: (stored_hash, row_json)
+            for key, stored_hash, row_json in self._conn.execute(
+                "SELECT key, row_hash, row_json FROM snapshot WHERE kind = ?", (kind,))
+        }
+
+    def diff(self, kind, rows, key_column, grouped=False):
+        """
+        Compara rows con la foto anterior.
+        Retorna: (filas_a_exportar, filas_eliminadas)
+        - grouped=True agrupa varias filas por clave (combinaciones): si cambia
+          una combinación se exportan todas las del producto
+        - filas_eliminadas: última versión subida de las claves que ya no existen
+        El nuevo estado queda pendiente hasta llamar a commit()
+        """
+        previous = self._load(kind)
+
+        groups = {}
+        for row in rows:
+            key = str(row[key_column])
+            if grouped:
+                groups.setdefault(key, []).append(row)
+            else:
+                groups[key] = row
+
+        current = {}
+        changed = []
+        for key, value in groups.items():
+            value_hash = row_hash(value)
+            current[key] = (value_hash, value)
+            old = previous.get(key)
+            if old and old[0] == value_hash:
+                continue
+            if grouped:
+                changed.extend(value)
+            else:
+                changed.append(self._without_unchanged_images(value, old))
+
+        removed = []
+        for key, (_, row_json) in previous.items():
+            if key not in current:
+                old_value = json.loads(row_json)
+                removed.extend(old_value if grouped else [old_value])
+
+        self._pending[kind] = current
+        return changed, removed
+
+    @staticmethod
+    def _without_unchanged_images(row, old):
+        """Si las imágenes no han cambiado, no pedir a PrestaShop que las borre y descargue de nuevo"""
+        if not old or IMAGE_URLS_COLUMN not in row:
+            return row
+        old_row = json.loads(old[1])
+        if old_row.get(IMAGE_URLS_COLUMN) != row.get(IMAGE_URLS_COLUMN):
+            return row
+        return dict(row, **{IMAGE_URLS_COLUMN: '', DELETE_IMAGES_COLUMN: 0})
+
+    def keys_in_use(self, suffix):
+        """
+        Claves de todas las fotos cuyo tipo termina en suffix (p. ej. las de
+        complementos de todas las marcas): las calculadas en diff() en esta
+        ejecución y, para los tipos no comparados ahora, las de la última subida
+        """
+        keys = set()
+        for kind, current in self._pending.items():
+            if kind.endswith(suffix):
+                keys.update(current)
+        for kind, key in self._conn.execute("SELECT kind, key FROM snapshot"):
+            if kind.endswith(suffix) and kind not in self._pending:
+                keys.add(key)
+        return keys
+
+    @staticmethod
+    def deactivation_rows(removed_rows):
+        """Filas para desactivar en PrestaShop los productos que ya no existen"""
+        return [dict(row, **{ACTIVE_COLUMN: 0, IMAGE_URLS_COLUMN: '', DELETE_IMAGES_COLUMN: 0})
+                for row in removed_rows]
+
+    def commit(self):
+        """Guarda como nueva foto todo lo calculado en diff() (llamar tras subir al FTP)"""
+        for kind, current in self._pending.items():
+            self._conn.execute("DELETE FROM snapshot WHERE kind = ?", (kind,))
+            self._conn.executemany(
+                "INSERT INTO snapshot VALUES (?, ?, ?, ?)",
+                [(kind, key, value_hash, json.dumps(value, ensure_ascii=False))
+                 for key, (value_hash, value) in current.items()]
+            )
+        self._conn.commit()
+        self._pending = {}
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,293 @@
+"""
+Subida de ficheros al FTP reutilizando una única sesión autenticada para
+todo el lote, con opción de transferir en paralelo por conexiones
+separadas. Los ficheros siempre se suben con un nombre temporal y se
+publican (RNFR/RNTO) uno a uno en el orden requerido, de modo que el cron
+de PrestaShop nunca ve un CSV a medio escribir ni los productos antes que
+los complementos. Un manifiesto remoto con SHA-256/tamaño por fichero
+lógico evita volver a transferir contenido idéntico.
+"""
+
+import io
+import os
+import re
+import json
+import hashlib
+import threading
+from datetime import datetime
+from ftplib import FTP, all_errors, error_perm
+from concurrent.futures import ThreadPoolExecutor
+
+# ================================
+# CONFIGURACIÓN
+# ================================
+FTP_TIMEOUT = 60
+TEMP_SUFFIX = '.part'
+BACKUP_SUFFIX = '.bak'  # Copia del fichero publicado mientras se sustituye (servidores sin RNTO sobre existente)
+MANIFEST_NAME = '.upload_manifest.json'
+
+
+def logical_name(nombre_archivo):
+    """Nombre sin el timestamp: 20251013012751-royo-products_import.csv → royo-products_import.csv"""
+    return re.sub(r'^\d{14}-', '', os.path.basename(nombre_archivo))
+
+
+def file_digest(nombre_archivo):
+    """(sha256, tamaño) del fichero local"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(nombre_archivo, 'rb') as archivo:
+        for chunk in iter(lambda: archivo.read(1024 * 1024), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class FTPUploader:
+    """Sesión FTP persistente (más un pequeño pool para subidas en paralelo)"""
+
+    def __init__(self, servidor, usuario, contraseña, ruta_remota="/", parallel=1, skip_unchanged=True):
+        self.servidor = servidor
+        self.usuario = usuario
+        self.contraseña = contraseña
+        self.ruta_remota = ruta_remota
+        self.parallel = max(1, parallel)
+        self.skip_unchanged = skip_unchanged
+        self._ftp = None
+        self._lock = threading.Lock()
+        self._manifest = None
+
+    @classmethod
+    def from_config(cls, config, parallel=1, skip_unchanged=True):
+        """Crea el uploader a partir del dict de leer_configuracion_ftp"""
+        return cls(config.get("servidor"), config.get("usuario"), config.get("contraseña"),
+                   config.get("ruta_remota", "/"), parallel, skip_unchanged)
+
+    # --- conexión ---
+    def _connect(self, verbose=True):
+        ftp = FTP(self.servidor, timeout=FTP_TIMEOUT)
+        ftp.login(self.usuario, self.contraseña)
+        directorio_actual = ftp.pwd()
+        if verbose:
+            print(f"🔗 Conectado al FTP: {self.servidor}")
+            print(f"📁 Directorio actual: {directorio_actual}")
+
+        if self.ruta_remota and self.ruta_remota != "/" and self.ruta_remota.strip():
+            try:
+                ftp.cwd(self.ruta_remota)
+                if verbose:
+                    print(f"📁 Cambiado a: {self.ruta_remota}")
+            except all_errors as e:
+                if verbose:
+                    print(f"⚠️  No se pudo cambiar a '{self.ruta_remota}': {e}")
+                    print(f"📁 Usando directorio actual: {directorio_actual}")
+        return ftp
+
+    @property
+    def ftp(self):
+        """Sesión principal, abierta la primera vez que se usa y reabierta si se cae"""
+        if self._ftp is not None:
+            try:
+                self._ftp.voidcmd('NOOP')
+            except all_errors:
+                self._ftp = None
+        if self._ftp is None:
+            self._ftp = self._connect()
+        return self._ftp
+
+    def close(self):
+        if self._ftp is not None:
+            try:
+                self._ftp.quit()
+            except all_errors:
+                self._ftp.close()
+            self._ftp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- manifiesto remoto ---
+    def _load_manifest(self):
+        """Lee el manifiesto remoto ({nombre_lógico: {sha256, size, remote_name}}) una vez por sesión"""
+        if self._manifest is None:
+            buffer = io.BytesIO()
+            try:
+                with self._lock:
+                    self.ftp.retrbinary(f'RETR {MANIFEST_NAME}', buffer.write)
+                self._manifest = json.loads(buffer.getvalue().decode('utf-8'))
+            except (error_perm, ValueError):
+                self._manifest = {}  # Todavía no existe (o está corrupto): se sube todo
+        return self._manifest
+
+    def _save_manifest(self):
+        data = json.dumps(self._manifest, indent=2, ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            self.ftp.storbinary(f'STOR {MANIFEST_NAME}{TEMP_SUFFIX}', io.BytesIO(data))
+            self._rename(self.ftp, MANIFEST_NAME + TEMP_SUFFIX, MANIFEST_NAME)
+
+    def _is_unchanged(self, nombre_archivo, digest):
+        entry = self._load_manifest().get(logical_name(nombre_archivo))
+        return bool(entry) and entry.get('sha256') == digest[0] and entry.get('size') == digest[1]
+
+    def _record_published(self, nombre_archivo, digest):
+        self._load_manifest()[logical_name(nombre_archivo)] = {
+            'sha256': digest[0],
+            'size': digest[1],
+            'remote_name': os.path.basename(nombre_archivo),
+            'uploaded_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        self._save_manifest()
+
+    # --- subidas ---
+    @staticmethod
+    def _store(ftp, local_path, remote_name):
+        with open(local_path, 'rb') as archivo:
+            ftp.storbinary(f'STOR {remote_name}', archivo)
+
+    @staticmethod
+    def _rename(ftp, temp_name, remote_name):
+        """
+        RNFR/RNTO. Algunos servidores no sobrescriben: en ese caso el destino
+        se aparta con BACKUP_SUFFIX y solo se borra cuando el nuevo ya está
+        publicado; si la sustitución falla se restaura, así nunca queda el
+        destino sin fichero.
+        """
+        try:
+            ftp.rename(temp_name, remote_name)
+            return
+        except error_perm:
+            pass
+        backup_name = remote_name + BACKUP_SUFFIX
+        try:
+            ftp.delete(backup_name)  # Copia de un intento anterior (no es el fichero publicado)
+        except all_errors:
+            pass
+        ftp.rename(remote_name, backup_name)
+        try:
+            ftp.rename(temp_name, remote_name)
+        except all_errors:
+            ftp.rename(backup_name, remote_name)
+            raise
+        try:
+            ftp.delete(backup_name)
+        except all_errors:
+            pass
+
+    def subir_archivo(self, nombre_archivo):
+        """
+        Sube un fichero por la sesión principal a un nombre temporal y lo
+        publica con RNFR/RNTO. Retorna True/False
+        """
+        remote_name = os.path.basename(nombre_archivo)
+        temp_name = remote_name + TEMP_SUFFIX
+        try:
+            with self._lock:
+                self._store(self.ftp, nombre_archivo, temp_name)
+                self._rename(self.ftp, temp_name, remote_name)
+            print(f"✅ Archivo '{nombre_archivo}' subido correctamente al FTP.")
+            return True
+        except (all_errors + (OSError,)) as e:
+            print(f"❌ Error al subir '{nombre_archivo}' al FTP: {e}")
+            return False
+
+    def _subir_temporal(self, nombre_archivo):
+        """Sube un fichero con nombre temporal por una conexión propia (modo paralelo)"""
+        temp_name = os.path.basename(nombre_archivo) + TEMP_SUFFIX
+        ftp = self._connect(verbose=False)
+        try:
+            self._store(ftp, nombre_archivo, temp_name)
+            return temp_name
+        finally:
+            try:
+                ftp.quit()
+            except all_errors:
+                ftp.close()
+
+    def subir_archivos(self, archivos, on_uploaded=None):
+        """
+        Sube los ficheros respetando el orden de publicación de la lista
+        (complementos → productos → combinaciones). Se detiene en el primer
+        fallo: los siguientes dependen de él.
+        - parallel == 1: uno tras otro por la sesión principal
+        - parallel > 1: transferencias simultáneas por conexiones propias
+        En ambos casos se sube a un nombre temporal y se publica con RNFR/RNTO.
+        Con skip_unchanged, los ficheros cuyo SHA-256/tamaño coincide con el
+        manifiesto remoto no se transfieren.
+        on_uploaded(nombre) se llama cuando cada fichero queda publicado (u omitido).
+        Retorna True si se publicaron todos.
+        """
+        archivos = list(archivos)
+        if not archivos:
+            return True
+
+        digests = {nombre: file_digest(nombre) for nombre in archivos}
+        if self.skip_unchanged:
+            try:
+                unchanged = [nombre for nombre in archivos if self._is_unchanged(nombre, digests[nombre])]
+            except all_errors as e:
+                print(f"❌ Error al conectar con el FTP: {e}")
+                return False
+            for nombre_archivo in unchanged:
+                print(f"  ⏭️  {nombre_archivo} sin cambios respecto a la última subida, se omite")
+                if on_uploaded:
+                    on_uploaded(nombre_archivo)
+            archivos = [nombre for nombre in archivos if nombre not in unchanged]
+            if not archivos:
+                return True
+
+        if self.parallel == 1 or len(archivos) == 1:
+            for nombre_archivo in archivos:
+                print(f"  📤 Subiendo {nombre_archivo}...")
+                if not self.subir_archivo(nombre_archivo):
+                    return False
+                if not self._publish_recorded(nombre_archivo, digests[nombre_archivo]):
+                    return False
+                if on_uploaded:
+                    on_uploaded(nombre_archivo)
+            return True
+
+        print(f"  📤 Subiendo {len(archivos)} archivos en paralelo ({self.parallel} conexiones)...")
+        with ThreadPoolExecutor(max_workers=min(self.parallel, len(archivos))) as executor:
+            futures = [executor.submit(self._subir_temporal, nombre) for nombre in archivos]
+
+            # Publicar en orden a medida que terminan las transferencias
+            published_all = True
+            for nombre_archivo, future in zip(archivos, futures):
+                try:
+                    temp_name = future.result()
+                    if not published_all:
+                        self._delete_quietly(temp_name)
+                        continue
+                    with self._lock:
+                        self._rename(self.ftp, temp_name, os.path.basename(nombre_archivo))
+                    print(f"✅ Archivo '{nombre_archivo}' subido correctamente al FTP.")
+                    if not self._publish_recorded(nombre_archivo, digests[nombre_archivo]):
+                        published_all = False
+                        continue
+                    if on_uploaded:
+                        on_uploaded(nombre_archivo)
+                except (all_errors + (OSError,)) as e:
+                    print(f"❌ Error al subir '{nombre_archivo}' al FTP: {e}")
+                    published_all = False
+        return published_all
+
+    def _publish_recorded(self, nombre_archivo, digest):
+        """Anota el fichero publicado en el manifiesto remoto"""
+        if not self.skip_unchanged:
+            return True
+        try:
+            self._record_published(nombre_archivo, digest)
+            return True
+        except all_errors as e:
+            print(f"❌ Error al actualizar el manifiesto remoto: {e}")
+            return False
+
+    def _delete_quietly(self, remote_name):
+        try:
+            with self._lock:
+                self.ftp.delete(remote_name)
+        except all_errors:
+            pass
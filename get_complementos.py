@@ -4,21 +4,35 @@ y generar CSV para importación en PrestaShop
 """
 
 import json
-import csv
 import re
 import time
+import threading
 import requests
 from datetime import datetime
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from nuxt_http import create_http_session
+from api_cache import ApiCache, API_CACHE_ENABLED
+from replay_archive import recorded_api_get, ReplayMiss
+from id_registry import COMPLEMENT_NAMESPACE
+from csv_stream import PrestaShopCSVWriter
+from prestashop_rows import PRODUCT_CSV_HEADERS, ComplementRow
+from text_sanitizer import clean_text, clean_row_columns, clean_dimension_value, COMPLEMENT_PROFILE
+
 # ================================
 # CONFIGURACIÓN
 # ================================
 TAX_RATE = 1.21
 COMPLEMENT_START_ID = 136  # IDs de PrestaShop para complementos (136-208 = 73 complementos)
 
+# API de Decorabano
+API_BASE_URL = "https://api.decorabano.com/catalog/v1"
+API_PARAMS = {'store': 'ESTM', 'language': 'es'}
+API_TIMEOUT = 10
+API_MAX_CONCURRENCY = 8  # Peticiones simultáneas como máximo contra la API
+
 # Mapeo de tipos de complementos a categorías de PrestaShop (según imagen)
 COMPLEMENT_CATEGORY_MAP = {
     'grifos': 11,           # Grifos de baño
@@ -36,78 +50,124 @@ COMPLEMENT_CATEGORY_MAP = {
 # FUNCIONES PARA LIMPIAR TEXTO
 # ================================
 def clean_html_text(text):
-    """Limpia texto HTML removiendo saltos de línea y caracteres problemáticos para CSV"""
-    if not text or text is None:
-        return ""
-    text = str(text)
-    cleaned = text.replace('&nbsp;', ' ')
-    cleaned = cleaned.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
-    cleaned = cleaned.replace('"', '').replace(';', ',')
-    cleaned = cleaned.replace('|', '-').replace('\x00', '').replace('\x0b', '').replace('\x0c', '')
-    cleaned = re.sub(r'\s+', ' ', cleaned)
-    return cleaned.strip()
-
-def clean_dimension_value(value):
-    """Limpia valores de dimensiones para que sean compatibles con PrestaShop"""
-    if not value or value is None:
-        return ""
-    value = str(value).strip()
-    value = value.replace(' cm', '').replace('cm', '').replace(' ', '')
-    if not value:
-        return ""
-    try:
-        float_val = float(value.replace(',', '.'))
-        return str(float_val)
-    except (ValueError, TypeError):
-        return ""
+    """Limpia texto HTML para el CSV de complementos (';' → ',', ver text_sanitizer.py)"""
+    return clean_text(text, COMPLEMENT_PROFILE)
 
 # ================================
 # FUNCIONES DE API CON PARÁMETROS CORRECTOS
 # ================================
-def get_complement_types(product_uuid):
+_api_session = None
+_api_session_lock = threading.Lock()
+
+def get_api_session():
+    """
+    Devuelve la sesión HTTP compartida para la API (keep-alive: una sola
+    conexión TCP+TLS reutilizada entre llamadas y entre hilos)
+    """
+    global _api_session
+    with _api_session_lock:
+        if _api_session is None:
+            _api_session = create_http_session(API_MAX_CONCURRENCY)
+            _api_session.headers['Accept'] = 'application/json'
+        return _api_session
+
+_api_cache = None
+
+def get_api_cache():
+    """Devuelve la caché en disco compartida de la API (None si está desactivada)"""
+    global _api_cache
+    if not API_CACHE_ENABLED:
+        return None
+    with _api_session_lock:
+        if _api_cache is None:
+            _api_cache = ApiCache()
+        return _api_cache
+
+def api_get_json(url, params, session=None):
+    """
+    GET a la API pasando por la caché en disco si está activa (y por el
+    archivo de --record / --replay si lo hay, ver replay_archive.py).
+    Retorna: (status_code, datos_json o None)
+    """
+    return recorded_api_get(url, params, lambda: _fetch_api_json(url, params, session))
+
+def _fetch_api_json(url, params, session=None):
+    session = session or get_api_session()
+    cache = get_api_cache()
+    if cache is not None:
+        return cache.get_json(session, url, params, timeout=API_TIMEOUT)
+    response = session.get(url, params=params, timeout=API_TIMEOUT)
+    return response.status_code, response.json() if response.status_code == 200 else None
+
+def get_complement_types(product_uuid, session=None):
     """
     Obtiene los tipos de complementos disponibles para un producto
-    desde la API de Decorabano CON los parámetros store y language
+    desde la API de Decorabano CON los parámetros store y language.
+    Retorna None si la llamada falla (una lista vacía significa que el
+    producto no tiene complementos)
     """
-    url = f"https://api.decorabano.com/catalog/v1/products/{product_uuid}/complement_types/"
-    params = {
-        'store': 'ESTM',
-        'language': 'es'
-    }
+    url = f"{API_BASE_URL}/products/{product_uuid}/complement_types/"
+    params = dict(API_PARAMS)
     try:
-        response = requests.get(url, params=params, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
+        status_code, data = api_get_json(url, params, session)
+        if status_code == 200:
             # La respuesta viene en formato {"complement_types": [...]}
             return data.get('complement_types', [])
         else:
-            print(f"    [!] API complement_types retornó status {response.status_code}")
-            return []
+            print(f"    [!] API complement_types retornó status {status_code}")
+            return None
+    except ReplayMiss:
+        raise  # Con --replay falta la respuesta: no es un fallo de la API
     except Exception as e:
         print(f"    [ERROR] Error llamando API complement_types: {e}")
-        return []
+        return None
 
-def get_complements_by_type(product_uuid, complement_type_id):
+def get_complements_by_type(product_uuid, complement_type_id, session=None):
     """
-    Obtiene los complementos de un tipo específico para un producto
+    Obtiene los complementos de un tipo específico para un producto.
+    Retorna None si la llamada falla (distinto de una lista vacía)
     """
-    url = f"https://api.decorabano.com/catalog/v1/products/{product_uuid}/complements/"
-    params = {
-        'store': 'ESTM',
-        'language': 'es',
-        'complement_type': complement_type_id
-    }
+    url = f"{API_BASE_URL}/products/{product_uuid}/complements/"
+    params = dict(API_PARAMS, complement_type=complement_type_id)
     try:
-        response = requests.get(url, params=params, timeout=10)
-        if response.status_code == 200:
+        status_code, data = api_get_json(url, params, session)
+        if status_code == 200:
             # La respuesta es directamente un array de complementos
-            return response.json()
+            return data
         else:
-            print(f"    [!] API complements retornó status {response.status_code}")
-            return []
+            print(f"    [!] API complements retornó status {status_code}")
+            return None
+    except ReplayMiss:
+        raise  # Con --replay falta la respuesta: no es un fallo de la API
     except Exception as e:
         print(f"    [ERROR] Error llamando API complements: {e}")
-        return []
+        return None
+
+def fetch_complements_for_products(product_uuids, max_workers=API_MAX_CONCURRENCY, complement_types=None):
+    """
+    Descarga en paralelo (como mucho max_workers peticiones a la vez, sobre la
+    sesión compartida) los complementos de todos los productos a través del
+    índice global (complement_index.py): cada (producto, tipo) se pide una vez.
+    - complement_types: {product_uuid: [comp_type, ...]} ya leídos del __NUXT__;
+      para esos productos no se llama a complement_types
+    
+    Retorna: dict {product_uuid: [(comp_type, complements_list), ...]} con los
+    tipos en el mismo orden que devuelve la API (sin los productos cuya
+    descarga falló)
+    """
+    from complement_index import ComplementIndex
+    
+    complement_types = complement_types or {}
+    index = ComplementIndex()
+    for product_uuid in product_uuids:
+        index.add_product(product_uuid, complement_types.get(product_uuid))
+    index.fetch(max_workers)
+    
+    stats = index.stats
+    print(f"  📊 {stats['products']} productos: {stats['type_requests']} llamadas a complement_types, "
+          f"{stats['list_requests']} a complements, {stats['distinct_lists']} listas distintas, "
+          f"{stats['failed']} con fallos")
+    return index.results()
 
 # ================================
 # FUNCIONES PARA GENERAR CLAVES ÚNICAS
@@ -174,25 +234,6 @@ def get_complement_category(complement_type_name):
     else:
         return COMPLEMENT_CATEGORY_MAP['otros']
 
-# ================================
-# CABECERAS CSV PRESTASHOP
-# ================================
-PRODUCT_CSV_HEADERS = [
-    'Product ID','Active (0/1)','Name *','Categories (x,y,z...)','Price tax excluded','Tax rules ID','Wholesale price',
-    'On sale (0/1)','Discount amount','Discount percent','Discount from (yyyy-mm-dd)','Discount to (yyyy-mm-dd)',
-    'Reference #','Supplier reference #','Supplier','Manufacturer','EAN13','UPC','MPN','Ecotax','Width','Height','Depth',
-    'Weight','Delivery time of in-stock products','Delivery time of out-of-stock products with allowed orders',
-    'Quantity','Minimal quantity','Low stock level','Send me an email when the quantity is under this level',
-    'Visibility','Additional shipping cost','Unity','Unit price','Summary','Description','Tags (x,y,z...)',
-    'Meta title','Meta keywords','Meta description','URL rewritten','Text when in stock','Text when backorder allowed',
-    'Available for order (0 = No, 1 = Yes)','Product available date','Product creation date',
-    'Show price (0 = No, 1 = Yes)','Image URLs (x,y,z...)','Image alt texts (x,y,z...)',
-    'Delete existing images (0 = No, 1 = Yes)','Feature(Name:Value:Position)','Available online only (0 = No, 1 = Yes)',
-    'Condition','Customizable (0 = No, 1 = Yes)','Uploadable files (0 = No, 1 = Yes)','Text fields (0 = No, 1 = Yes)',
-    'Out of stock action','Virtual product','File URL','Number of allowed downloads','Expiration date','Number of days',
-    'ID / Name of shop','Advanced stock management','Depends On Stock','Warehouse','Acessories  (x,y,z...)'
-]
-
 # ================================
 # EXTRACCIÓN DE COMPLEMENTOS
 # ================================
@@ -404,111 +445,85 @@ def convert_complement_to_prestashop_format(complement_data, prestashop_id):
         if min_days and max_days:
             delivery_time = f"Entre {min_days} y {max_days} días"
     
-    return {
-        'Product ID': prestashop_id,
-        'Active (0/1)': 1,
-        'Name *': clean_html_text(name),
-        'Categories (x,y,z...)': str(category_id),
-        'Price tax excluded': price_tax_excluded,
-        'Tax rules ID': 1,
-        'Wholesale price': '',
-        'On sale (0/1)': on_sale,
-        'Discount amount': discount_amount if on_sale else '',
-        'Discount percent': web_discount if on_sale else '',
-        'Discount from (yyyy-mm-dd)': '',
-        'Discount to (yyyy-mm-dd)': '',
-        'Reference #': ref,
-        'Supplier reference #': '',
-        'Supplier': clean_html_text(brand),
-        'Manufacturer': clean_html_text(brand),
-        'EAN13': ean,
-        'UPC': '',
-        'MPN': complement_data.get('mpn', ''),
-        'Ecotax': '',
-        'Width': '',
-        'Height': '',
-        'Depth': '',
-        'Weight': 0,
-        'Delivery time of in-stock products': clean_html_text(delivery_time),
-        'Delivery time of out-of-stock products with allowed orders': '',
-        'Quantity': 100,
-        'Minimal quantity': 1,
-        'Low stock level': '',
-        'Send me an email when the quantity is under this level': 0,
-        'Visibility': 'both',
-        'Additional shipping cost': '',
-        'Unity': '',
-        'Unit price': '',
-        'Summary': clean_html_text(short_description),
-        'Description': clean_html_text(description),
-        'Tags (x,y,z...)': ",".join(list(set(tags))),
-        'Meta title': clean_html_text(name),
-        'Meta keywords': '',
-        'Meta description': clean_html_text(description),
-        'URL rewritten': slug,
-        'Text when in stock': 'Disponible',
-        'Text when backorder allowed': '',
-        'Available for order (0 = No, 1 = Yes)': 1,
-        'Product available date': '',
-        'Product creation date': '',
-        'Show price (0 = No, 1 = Yes)': 1,
-        'Image URLs (x,y,z...)': image_url,
-        'Image alt texts (x,y,z...)': '',
-        'Delete existing images (0 = No, 1 = Yes)': 1,
-        'Feature(Name:Value:Position)': '',
-        'Available online only (0 = No, 1 = Yes)': 0,
-        'Condition': 'new',
-        'Customizable (0 = No, 1 = Yes)': 0,
-        'Uploadable files (0 = No, 1 = Yes)': 0,
-        'Text fields (0 = No, 1 = Yes)': 0,
-        'Out of stock action': 0,
-        'Virtual product': 0,
-        'File URL': '',
-        'Number of allowed downloads': '',
-        'Expiration date': '',
-        'Number of days': '',
-        'ID / Name of shop': 1,
-        'Advanced stock management': 0,
-        'Depends On Stock': 0,
-        'Warehouse': 0,
-        'Acessories  (x,y,z...)': ''
-    }
+    row = ComplementRow()
+    row['Product ID'] = prestashop_id
+    row['Name *'] = name
+    row['Categories (x,y,z...)'] = str(category_id)
+    row['Price tax excluded'] = price_tax_excluded
+    row['On sale (0/1)'] = on_sale
+    if on_sale:
+        row['Discount amount'] = discount_amount
+        row['Discount percent'] = web_discount
+    row['Reference #'] = ref
+    row['Supplier'] = row['Manufacturer'] = brand
+    row['EAN13'] = ean
+    row['MPN'] = complement_data.get('mpn', '')
+    row['Delivery time of in-stock products'] = delivery_time
+    row['Summary'] = short_description
+    row['Description'] = description
+    row['Tags (x,y,z...)'] = ",".join(dict.fromkeys(tags))  # Orden estable entre ejecuciones
+    row['Meta title'] = name
+    row['Meta description'] = description
+    row['URL rewritten'] = slug
+    row['Image URLs (x,y,z...)'] = image_url
+    # Todas las columnas de texto libre de una vez
+    return clean_row_columns(row, ComplementRow.TEXT_COLUMNS, COMPLEMENT_PROFILE)
 
-def generate_complements_csv(unique_complements, timestamp):
+def iter_complements_rows(unique_complements, key_to_prestashop_id, id_registry=None):
     """
-    Genera el CSV de complementos para importar en PrestaShop.
-    
-    Retorna:
-        - filename: nombre del archivo CSV generado
-        - key_to_prestashop_id: mapeo de unique_key a PrestaShop ID
+    Convierte los complementos únicos a filas PrestaShop, una a una,
+    asignando IDs consecutivos desde COMPLEMENT_START_ID, o los IDs
+    persistentes del registro (por clave única) si se pasa id_registry.
+    key_to_prestashop_id (unique_key → PrestaShop ID) se va rellenando
+    a medida que se generan las filas.
     """
-    print(f"\n[PASO 3] Generando CSV de complementos...")
-    
-    filename = f'{timestamp}-royo-complements_import.csv'
-    key_to_prestashop_id = {}
-    all_complements_data = []
-    
     current_id = COMPLEMENT_START_ID
     
     for unique_key, complement_data in unique_complements.items():
-        # Convertir a formato PrestaShop
-        prestashop_data = convert_complement_to_prestashop_format(complement_data, current_id)
-        all_complements_data.append(prestashop_data)
+        if id_registry:
+            current_id = id_registry.get_or_allocate(COMPLEMENT_NAMESPACE, unique_key, COMPLEMENT_START_ID)
         
         # Mapear la clave única al ID de PrestaShop
         key_to_prestashop_id[unique_key] = current_id
         
+        # Convertir a formato PrestaShop
+        yield convert_complement_to_prestashop_format(complement_data, current_id)
+        
         current_id += 1
+
+def build_complements_rows(unique_complements, id_registry=None):
+    """
+    Igual que iter_complements_rows pero en lista.
+    
+    Retorna:
+        - all_complements_data: lista de filas del CSV
+        - key_to_prestashop_id: mapeo de unique_key a PrestaShop ID
+    """
+    key_to_prestashop_id = {}
+    all_complements_data = list(iter_complements_rows(unique_complements, key_to_prestashop_id, id_registry))
+    return all_complements_data, key_to_prestashop_id
+
+def generate_complements_csv(unique_complements, timestamp, id_registry=None, brand_slug='royo'):
+    """
+    Genera el CSV de complementos para importar en PrestaShop (cada fila se
+    escribe según se convierte, sin acumularlas).
+    
+    Retorna:
+        - filename: nombre del archivo CSV generado
+        - key_to_prestashop_id: mapeo de unique_key a PrestaShop ID
+    """
+    print(f"\n[PASO 3] Generando CSV de complementos...")
+    
+    filename = f'{timestamp}-{brand_slug}-complements_import.csv'
+    key_to_prestashop_id = {}
     
     # Escribir CSV
-    if all_complements_data:
-        with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=PRODUCT_CSV_HEADERS, delimiter=';', quoting=csv.QUOTE_NONNUMERIC)
-            writer.writeheader()
-            writer.writerows(all_complements_data)
-        
-        print(f"[OK] {filename} generado ({len(all_complements_data)} complementos únicos)")
-        print(f"     IDs asignados: {COMPLEMENT_START_ID} - {current_id - 1}")
+    with PrestaShopCSVWriter(filename, PRODUCT_CSV_HEADERS) as writer:
+        writer.write_rows(iter_complements_rows(unique_complements, key_to_prestashop_id, id_registry))
+    
+    if writer.count:
+        print(f"[OK] {filename} generado ({writer.count} complementos únicos)")
+        print(f"     IDs asignados: {min(key_to_prestashop_id.values())} - {max(key_to_prestashop_id.values())}")
     
     return filename, key_to_prestashop_id
 
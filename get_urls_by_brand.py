@@ -1,4 +1,7 @@
 import time
+import queue
+import threading
+from urllib.parse import urlparse
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
@@ -12,15 +15,125 @@ WAIT_FOR_BUTTON = 5
 PAUSE_AFTER_CLICK = 3
 PAUSE_SHORT = 1
 
-def get_all_product_urls_from_brand(driver, brand_url):
-    driver.get(brand_url)
-    print(f"--- Accediendo a la marca: {brand_url} ---")
+# Colecciones recorridas a la vez (una sesión de Chrome por worker)
+DISCOVERY_WORKERS = 4
+
+
+def brand_slug_from_url(brand_url):
+    """https://www.todomueblesdebano.com/marcas/royo/ → royo"""
+    return urlparse(brand_url).path.rstrip('/').rsplit('/', 1)[-1]
+
+
+def merge_collection_urls(brand_name, collections_data, urls_per_collection):
+    """
+    Une las URLs de todas las colecciones en el orden de las colecciones
+    (no en el de llegada) y sin duplicados: un mismo producto puede aparecer
+    en varias colecciones y se queda con la primera.
+    """
+    seen_urls = set()
+    all_product_urls_with_context = []
+    for collection, product_urls in zip(collections_data, urls_per_collection):
+        for product_url in product_urls:
+            if product_url in seen_urls:
+                continue
+            seen_urls.add(product_url)
+            all_product_urls_with_context.append({
+                'marca': brand_name,
+                'coleccion': collection['name'],
+                'url': product_url
+            })
+    return all_product_urls_with_context
+
+
+def _accept_cookies(driver):
     try:
         WebDriverWait(driver, WAIT_TIMEOUT).until(EC.element_to_be_clickable((By.ID, "accept-cookies"))).click()
         print("  -> Cookies aceptadas.")
     except Exception:
         pass
 
+
+def get_collection_product_urls(driver, collection):
+    """URLs de producto de una colección pulsando 'Cargar Mas' hasta el final"""
+    print(f"    --- Extrayendo URLs de la colección: {collection['name']} ---")
+    driver.get(collection['url'])
+
+    while True:
+        try:
+            load_more_button = WebDriverWait(driver, WAIT_FOR_BUTTON).until(EC.element_to_be_clickable((By.XPATH, "//button[contains(@class, 'load-more') and contains(text(), 'Cargar Mas')]")))
+            driver.execute_script("arguments[0].scrollIntoView();", load_more_button)
+            time.sleep(PAUSE_SHORT)
+            load_more_button.click()
+            print("      -> Clic en 'Cargar Mas'...")
+            time.sleep(PAUSE_AFTER_CLICK)
+        except Exception:
+            print("      -> No hay más productos que cargar.")
+            break
+
+    product_soup = BeautifulSoup(driver.page_source, 'html.parser')
+    product_urls = []
+    for container in product_soup.select('div.product-snippet'):
+        link_element = container.select_one('a[title^="Ir a"]')
+        if link_element and link_element.get('href'):
+            product_urls.append(BASE_DOMAIN + link_element['href'])
+    return product_urls
+
+
+def crawl_collections_browser(driver, collections_data, workers=DISCOVERY_WORKERS, driver_factory=None):
+    """
+    Recorre las colecciones con un pool de workers, cada uno con su propio
+    Chrome (el worker 0 reutiliza `driver`). Sin driver_factory, o con un
+    solo worker, se recorren una tras otra con `driver`.
+    Retorna las URLs de cada colección en el mismo orden que collections_data.
+    """
+    workers = max(1, min(workers, len(collections_data)))
+    if workers == 1 or driver_factory is None:
+        return [get_collection_product_urls(driver, collection) for collection in collections_data]
+
+    urls_per_collection = [[] for _ in collections_data]
+    work_queue = queue.Queue()
+    for index, collection in enumerate(collections_data):
+        work_queue.put((index, collection))
+
+    def worker(worker_index):
+        worker_driver = None
+        owns_driver = False
+        try:
+            if worker_index == 0:
+                worker_driver = driver
+            else:
+                worker_driver = driver_factory()
+                owns_driver = True
+                # Cada Chrome nuevo tiene su propio banner de cookies
+                worker_driver.get(BASE_DOMAIN)
+                _accept_cookies(worker_driver)
+            while True:
+                try:
+                    index, collection = work_queue.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    urls_per_collection[index] = get_collection_product_urls(worker_driver, collection)
+                except Exception as e:
+                    print(f"      ❌ Error en la colección {collection['name']}: {e}")
+        finally:
+            if owns_driver:
+                worker_driver.quit()
+
+    threads = [threading.Thread(target=worker, args=(worker_index,), daemon=True)
+               for worker_index in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return urls_per_collection
+
+
+def get_all_product_urls_from_brand(driver, brand_url, workers=DISCOVERY_WORKERS, driver_factory=None):
+    driver.get(brand_url)
+    print(f"--- Accediendo a la marca: {brand_url} ---")
+    _accept_cookies(driver)
+
     soup_brand = BeautifulSoup(driver.page_source, 'html.parser')
     brand_name = soup_brand.select_one("h1").text.strip()
 
@@ -52,38 +165,8 @@ def get_all_product_urls_from_brand(driver, brand_url):
                 
     print(f"  -> Se encontraron {len(collections_data)} colecciones.")
     
-    all_product_urls_with_context = []
-    for collection in collections_data:
-        collection_url = collection['url']
-        collection_name = collection['name']
-        print(f"    --- Extrayendo URLs de la colección: {collection_name} ---")
-        driver.get(collection_url)
-        
-        while True:
-            try:
-                load_more_button = WebDriverWait(driver, WAIT_FOR_BUTTON).until(EC.element_to_be_clickable((By.XPATH, "//button[contains(@class, 'load-more') and contains(text(), 'Cargar Mas')]")))
-                driver.execute_script("arguments[0].scrollIntoView();", load_more_button)
-                time.sleep(PAUSE_SHORT)
-                load_more_button.click()
-                print("      -> Clic en 'Cargar Mas'...")
-                time.sleep(PAUSE_AFTER_CLICK)
-            except Exception:
-                print("      -> No hay más productos que cargar.")
-                break
-        
-        product_soup = BeautifulSoup(driver.page_source, 'html.parser')
-        product_containers = product_soup.select('div.product-snippet')
-        
-        for container in product_containers:
-            link_element = container.select_one('a[title^="Ir a"]')
-            if link_element and link_element.get('href'):
-                relative_url = link_element['href']
-                full_url = BASE_DOMAIN + relative_url
-                all_product_urls_with_context.append({
-                    'marca': brand_name,
-                    'coleccion': collection_name,
-                    'url': full_url
-                })
-    
+    urls_per_collection = crawl_collections_browser(driver, collections_data, workers, driver_factory)
+    all_product_urls_with_context = merge_collection_urls(brand_name, collections_data, urls_per_collection)
+
     print(f"\n  -> Se encontraron un total de {len(all_product_urls_with_context)} productos para esta marca.")
-    return all_product_urls_with_context
\ No newline at end of file
+    return all_product_urls_with_context
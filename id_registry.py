@@ -0,0 +1,98 @@
+"""
+Registro persistente (SQLite) de IDs de PrestaShop. Asocia a cada producto
+(UUID de __NUXT__) y a cada complemento (clave de generate_unique_key) un ID
+estable entre ejecuciones, de modo que un cambio en el orden de descubrimiento
+de URLs no reasigna IDs ni obliga a reimportar todo el catálogo.
+"""
+
+import os
+import sqlite3
+import threading
+
+from incremental_state import STATE_DIR
+
+# ================================
+# CONFIGURACIÓN
+# ================================
+ID_REGISTRY_PATH = os.path.join(STATE_DIR, 'id_registry.sqlite')
+
+PRODUCT_NAMESPACE = 'product'
+COMPLEMENT_NAMESPACE = 'complement'
+
+
+class IdRegistry:
+    """
+    Mapa {(namespace, clave): prestashop_id}. Las consultas se sirven desde
+    memoria (O(1)); los IDs nuevos se asignan dentro de una transacción, así
+    que varios workers (hilos o procesos) pueden pedir IDs a la vez sin
+    coordinarse por el orden de la lista. Un mismo ID de PrestaShop nunca se
+    repite entre namespaces (productos y complementos comparten tabla en la tienda).
+    """
+
+    def __init__(self, path=ID_REGISTRY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ids (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                prestashop_id INTEGER NOT NULL UNIQUE,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self._cache = {
+            (namespace, key): prestashop_id
+            for namespace, key, prestashop_id in self._conn.execute(
+                "SELECT namespace, key, prestashop_id FROM ids")
+        }
+
+    def get(self, namespace, key):
+        """ID ya asignado o None"""
+        return self._cache.get((namespace, key))
+
+    def get_or_allocate(self, namespace, key, start_id, preferred_id=None):
+        """
+        Devuelve el ID de la clave; si no existe asigna de forma atómica
+        preferred_id si está libre (p. ej. el ID por posición que ya tenía en
+        la tienda) o, si no, el siguiente libre del namespace (>= start_id).
+        """
+        cache_key = (namespace, str(key))
+        prestashop_id = self._cache.get(cache_key)
+        if prestashop_id is not None:
+            return prestashop_id
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Otro proceso pudo asignarlo mientras tanto
+                row = self._conn.execute(
+                    "SELECT prestashop_id FROM ids WHERE namespace = ? AND key = ?", cache_key).fetchone()
+                if row:
+                    prestashop_id = row[0]
+                elif preferred_id is not None and not self._conn.execute(
+                        "SELECT 1 FROM ids WHERE prestashop_id = ?", (preferred_id,)).fetchone():
+                    prestashop_id = preferred_id
+                    self._conn.execute("INSERT INTO ids VALUES (?, ?, ?)", cache_key + (prestashop_id,))
+                else:
+                    last_id = self._conn.execute(
+                        "SELECT MAX(prestashop_id) FROM ids WHERE namespace = ?", (namespace,)).fetchone()[0]
+                    prestashop_id = max(start_id, (last_id or 0) + 1)
+                    # Saltar IDs ocupados por otro namespace
+                    while self._conn.execute(
+                            "SELECT 1 FROM ids WHERE prestashop_id = ?", (prestashop_id,)).fetchone():
+                        prestashop_id += 1
+                    self._conn.execute("INSERT INTO ids VALUES (?, ?, ?)", cache_key + (prestashop_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._cache[cache_key] = prestashop_id
+            return prestashop_id
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,111 @@
+"""
+Estado persistente para ejecuciones incrementales: guarda, por UUID de
+producto, un hash del subárbol state.product de __NUXT__ junto con las
+filas generadas la última vez (producto, combinaciones y complementos).
+Si el hash no cambia, el producto se reutiliza sin volver a extraerlo ni
+a consultar la API de complementos.
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+# ================================
+# CONFIGURACIÓN
+# ================================
+STATE_DIR = '.scraper_state'
+INCREMENTAL_STATE_PATH = os.path.join(STATE_DIR, 'incremental.sqlite')
+
+
+def hash_product_state(nuxt_data):
+    """Hash SHA-256 estable del subárbol state.product (None si no existe)"""
+    try:
+        product_state = nuxt_data['state']['product']
+    except (KeyError, TypeError):
+        return None
+    payload = json.dumps(product_state, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def with_product_id(rows, row_type, id_column, numeric_product_id):
+    """
+    Filas guardadas (listas de valores, o dicts de versiones anteriores) como
+    row_type (prestashop_rows) con el ID de producto actualizado
+    """
+    rows = [row_type.from_row(row) for row in rows]
+    for row in rows:
+        row[id_column] = numeric_product_id
+    return rows
+
+
+class IncrementalState:
+    """Almacén SQLite {product_uuid: hash + filas de la última ejecución}"""
+
+    def __init__(self, path=INCREMENTAL_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS products (
+                uuid TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                product_row TEXT,
+                combinations TEXT NOT NULL,
+                complements TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def lookup(self, product_uuid, content_hash):
+        """
+        Devuelve los datos guardados si el producto no ha cambiado desde la
+        última ejecución, o None si es nuevo o su hash es distinto.
+        """
+        if not product_uuid or not content_hash:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, product_row, combinations, complements FROM products WHERE uuid = ?",
+                (product_uuid,)
+            ).fetchone()
+        if not row or row[0] != content_hash:
+            return None
+        return {
+            'product': json.loads(row[1]) if row[1] else None,
+            'combinations': json.loads(row[2]),
+            'complements': [tuple(entry) for entry in json.loads(row[3])],
+        }
+
+    def save(self, product_uuid, content_hash, product_row, combinations, complements):
+        """
+        Guarda el resultado de un producto.
+        complements: lista [(comp_type, complements_list), ...] tal y como la
+        devuelve fetch_complements_for_products
+        """
+        if not product_uuid or not content_hash:
+            return
+        compact_complements = [
+            ({'id': comp_type.get('id', ''), 'web_name': comp_type.get('web_name', '')}, complements_list)
+            for comp_type, complements_list in complements
+        ]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?, ?, ?)",
+                (product_uuid, content_hash,
+                 json.dumps(product_row, ensure_ascii=False) if product_row else None,
+                 json.dumps(combinations, ensure_ascii=False),
+                 json.dumps(compact_complements, ensure_ascii=False),
+                 time.time())
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
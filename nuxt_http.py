@@ -0,0 +1,451 @@
+"""
+Módulo para obtener el objeto window.__NUXT__ de una página de producto
+SIN navegador: descarga el HTML con una sesión HTTP reutilizable y evalúa
+la IIFE minificada que Nuxt incrusta en la página, devolviendo el mismo
+diccionario que driver.execute_script("return window.__NUXT__;")
+"""
+
+import re
+import json
+import requests
+from requests.adapters import HTTPAdapter
+
+# ================================
+# CONFIGURACIÓN
+# ================================
+HTTP_TIMEOUT = 15
+HTTP_POOL_SIZE = 10
+HTTP_HEADERS = {
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                   '(KHTML, like Gecko) Chrome/120.0 Safari/537.36'),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'es-ES,es;q=0.9',
+}
+
+NUXT_ASSIGNMENT_RE = re.compile(r'window\.__NUXT__\s*=\s*')
+
+# Subárboles de __NUXT__ que consumen extract_product_data, extract_combinations_data
+# y la búsqueda del UUID. True = subárbol completo; dict = solo esas claves.
+# El resto (cart, auth, menús, i18n, reseñas...) no se serializa ni se hashea.
+NUXT_PRODUCT_PROJECTION = {
+    'state': {
+        'product': {
+            'product': True,
+            'technical_data': True,
+            'configuration': True,
+        },
+    },
+}
+
+
+class NuxtParseError(Exception):
+    """El HTML no contiene un window.__NUXT__ que se pueda evaluar"""
+
+
+# ================================
+# SESIÓN HTTP
+# ================================
+def create_http_session(pool_size=HTTP_POOL_SIZE):
+    """Crea una sesión HTTP con keep-alive y un pool de conexiones por host"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(HTTP_HEADERS)
+    return session
+
+
+# ================================
+# TOKENIZADOR JS (subconjunto usado por Nuxt)
+# ================================
+_TOKEN_RE = re.compile(r'''
+    (?P<ws>\s+|//[^\n]*|/\*.*?\*/)
+  | (?P<str>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<num>0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<name>[A-Za-z_$][\w$]*)
+  | (?P<punct>[{}\[\]().,:;=!+-])
+''', re.VERBOSE | re.DOTALL)
+
+_SIMPLE_ESCAPES = {
+    'n': '\n', 'r': '\r', 't': '\t', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0',
+}
+_ESCAPE_RE = re.compile(r'\\(u\{[0-9a-fA-F]+\}|u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|\r\n|.)', re.DOTALL)
+
+
+def _unescape_js_string(raw):
+    """Convierte el contenido de un literal de cadena JS a str de Python"""
+    def replace(match):
+        esc = match.group(1)
+        if esc[0] == 'u':
+            code = esc[2:-1] if esc[1] == '{' else esc[1:]
+            return chr(int(code, 16))
+        if esc[0] == 'x':
+            return chr(int(esc[1:], 16))
+        if esc in ('\n', '\r\n', '\r', '\u2028', '\u2029'):
+            return ''
+        return _SIMPLE_ESCAPES.get(esc, esc)
+
+    text = _ESCAPE_RE.sub(replace, raw)
+    # Recomponer pares sustitutos (\ud83d\ude00) en un único carácter
+    return text.encode('utf-16', 'surrogatepass').decode('utf-16')
+
+
+def _parse_number(raw):
+    if raw[:2] in ('0x', '0X'):
+        return int(raw, 16)
+    value = float(raw)
+    # En JS no hay distinción int/float: WebDriver devuelve 3 y no 3.0
+    return int(value) if value.is_integer() and abs(value) < 2 ** 53 else value
+
+
+def _tokenize(source):
+    tokens = []
+    pos = 0
+    length = len(source)
+    while pos < length:
+        match = _TOKEN_RE.match(source, pos)
+        if not match:
+            raise NuxtParseError(f"Carácter inesperado en posición {pos}: {source[pos:pos + 20]!r}")
+        kind = match.lastgroup
+        pos = match.end()
+        if kind == 'ws':
+            continue
+        value = match.group(kind)
+        if kind == 'str':
+            tokens.append(('str', _unescape_js_string(value[1:-1])))
+        elif kind == 'num':
+            tokens.append(('num', _parse_number(value)))
+        else:
+            tokens.append((kind, value))
+    tokens.append(('eof', None))
+    return tokens
+
+
+# ================================
+# EVALUADOR DE LA IIFE
+# ================================
+_UNDEFINED = object()
+_KEYWORDS = {'null': None, 'true': True, 'false': False, 'undefined': None,
+             'NaN': float('nan'), 'Infinity': float('inf')}
+
+
+class _NuxtPayloadParser:
+    """
+    Evalúa un subconjunto de JavaScript suficiente para el payload de Nuxt:
+    literales, objetos, arrays, `void 0`, `!0`/`!1`, referencias a los
+    parámetros de la IIFE y asignaciones `a.b = ...` previas al `return`.
+    Cualquier otra sintaxis (llamadas, `new`, operadores, identificadores
+    desconocidos) lanza NuxtParseError: nunca se devuelve un payload a medias.
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+        self.env = {}
+
+    # --- utilidades ---
+    def peek(self, offset=0):
+        return self.tokens[self.pos + offset]
+
+    def next(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def accept(self, value):
+        if self.tokens[self.pos][1] == value and self.tokens[self.pos][0] in ('punct', 'name'):
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, value):
+        token = self.next()
+        if token[1] != value:
+            raise NuxtParseError(f"Se esperaba '{value}' y se encontró {token[1]!r}")
+        return token
+
+    def end_of_item(self, close_char):
+        """Tras un elemento de una lista: ',' o el cierre; retorna True si se cerró"""
+        if self.accept(','):
+            return False
+        self.expect(close_char)
+        return True
+
+    def skip_block(self, open_char, close_char):
+        """Avanza hasta el cierre correspondiente y devuelve el índice de inicio"""
+        start = self.pos
+        self.expect(open_char)
+        depth = 1
+        while depth:
+            kind, value = self.next()
+            if kind == 'eof':
+                raise NuxtParseError(f"Falta '{close_char}'")
+            if kind == 'punct':
+                if value == open_char:
+                    depth += 1
+                elif value == close_char:
+                    depth -= 1
+        return start
+
+    # --- programa ---
+    def parse_program(self):
+        """window.__NUXT__ = <expresión>"""
+        value = self.parse_expression()
+        self.accept(';')
+        return value
+
+    def parse_expression(self):
+        # IIFE: (function(a,b){...}(x,y))  ó  (function(a,b){...})(x,y)
+        if self.peek()[1] == '(' and self.peek(1) == ('name', 'function'):
+            return self.parse_iife()
+        return self.parse_unary()
+
+    def parse_iife(self):
+        self.expect('(')
+        self.expect('function')
+        if self.peek()[0] == 'name':
+            self.next()
+        self.expect('(')
+        params = []
+        while not self.accept(')'):
+            kind, name = self.next()
+            if kind != 'name':
+                raise NuxtParseError(f"Parámetro no soportado en la IIFE de __NUXT__: {name!r}")
+            params.append(name)
+            if self.end_of_item(')'):
+                break
+
+        body_start = self.skip_block('{', '}')
+        body_end = self.pos
+
+        wrapped = self.accept(')')
+        self.expect('(')
+        args = []
+        while not self.accept(')'):
+            args.append(self.parse_expression())
+            if self.end_of_item(')'):
+                break
+        if not wrapped:
+            self.expect(')')
+
+        outer_env, outer_pos = self.env, self.pos
+        self.env = dict(outer_env)
+        for index, name in enumerate(params):
+            self.env[name] = args[index] if index < len(args) else None
+
+        self.pos = body_start
+        result = self.parse_function_body(body_end)
+
+        self.env, self.pos = outer_env, outer_pos
+        return result
+
+    def parse_function_body(self, body_end):
+        self.expect('{')
+        result = None
+        while self.pos < body_end - 1:
+            if self.accept(';'):
+                continue
+            if self.accept('return'):
+                result = self.parse_expression()
+                self.pos = body_end
+                break
+            if self.accept('var') or self.accept('let') or self.accept('const'):
+                name = self.next()[1]
+                self.env[name] = self.parse_expression() if self.accept('=') else None
+                continue
+            self.parse_assignment()
+        self.pos = body_end
+        return result
+
+    def parse_assignment(self):
+        """Sentencias del tipo a.b[0].c = expr"""
+        kind, name = self.next()
+        if kind != 'name':
+            raise NuxtParseError(f"Sentencia no soportada en el cuerpo de __NUXT__: {name!r}")
+        if self.accept('='):
+            self.env[name] = self.parse_expression()
+            return
+        if name not in self.env:
+            raise NuxtParseError(f"Identificador no soportado en __NUXT__: {name!r}")
+        target = self.env[name]
+        while True:
+            if self.accept('.'):
+                key = self.next()[1]
+            elif self.accept('['):
+                key = self.parse_expression()
+                self.expect(']')
+            else:
+                raise NuxtParseError(f"Asignación no soportada sobre '{name}'")
+            if self.accept('='):
+                value = self.parse_expression()
+                if isinstance(target, list):
+                    index = int(key)
+                    if index >= len(target):
+                        target.extend([None] * (index + 1 - len(target)))
+                    target[index] = value
+                else:
+                    target[key] = value
+                return
+            target = target[int(key)] if isinstance(target, list) else target[key]
+
+    # --- expresiones ---
+    def parse_unary(self):
+        if self.accept('!'):
+            value = self.parse_unary()
+            return not value
+        if self.accept('-'):
+            return -self.parse_unary()
+        if self.accept('+'):
+            return self.parse_unary()
+        if self.accept('void'):
+            self.parse_unary()
+            return None
+        return self.parse_member(self.parse_primary())
+
+    def parse_member(self, value):
+        while True:
+            if self.accept('.'):
+                key = self.next()[1]
+                value = value.get(key) if isinstance(value, dict) else None
+            elif self.peek()[1] == '[' and self.peek()[0] == 'punct':
+                self.next()
+                key = self.parse_expression()
+                self.expect(']')
+                if isinstance(value, list):
+                    value = value[int(key)] if int(key) < len(value) else None
+                elif isinstance(value, dict):
+                    value = value.get(key)
+                else:
+                    value = None
+            elif self.peek() == ('punct', '('):
+                raise NuxtParseError("Llamada a función no soportada en __NUXT__")
+            else:
+                return value
+
+    def parse_primary(self):
+        kind, value = self.peek()
+        if kind in ('str', 'num'):
+            self.next()
+            return value
+        if kind == 'punct':
+            if value == '{':
+                return self.parse_object()
+            if value == '[':
+                return self.parse_array()
+            if value == '(':
+                if self.peek(1) == ('name', 'function'):
+                    return self.parse_iife()
+                self.next()
+                result = self.parse_expression()
+                self.expect(')')
+                return result
+        if kind == 'name':
+            self.next()
+            if value == 'Array' and self.peek()[1] == '(':
+                self.next()
+                size = self.parse_expression()
+                self.expect(')')
+                return [None] * int(size)
+            if value in self.env:
+                return self.env[value]
+            if value in _KEYWORDS:
+                return _KEYWORDS[value]
+            raise NuxtParseError(f"Identificador no soportado en __NUXT__: {value!r}")
+        raise NuxtParseError(f"Token inesperado: {value!r}")
+
+    def parse_object(self):
+        self.expect('{')
+        result = {}
+        while not self.accept('}'):
+            kind, key = self.next()
+            if kind not in ('name', 'str', 'num'):
+                raise NuxtParseError(f"Clave de objeto no soportada: {key!r}")
+            if kind == 'num':
+                key = str(key)
+            if self.accept(':'):
+                result[key] = self.parse_expression()
+            elif kind == 'name' and key in self.env:
+                # Shorthand {a} → {a: a}
+                result[key] = self.env[key]
+            else:
+                raise NuxtParseError(f"Propiedad no soportada en __NUXT__: {key!r}")
+            if self.end_of_item('}'):
+                break
+        return result
+
+    def parse_array(self):
+        self.expect('[')
+        result = []
+        while not self.accept(']'):
+            if self.peek() == ('punct', ','):
+                self.next()
+                result.append(None)
+                continue
+            result.append(self.parse_expression())
+            if self.end_of_item(']'):
+                break
+        return result
+
+
+# ================================
+# API PÚBLICA
+# ================================
+def extract_nuxt_script(html):
+    """Devuelve el código JS asignado a window.__NUXT__ dentro del HTML"""
+    match = NUXT_ASSIGNMENT_RE.search(html)
+    if not match:
+        raise NuxtParseError("No se encontró window.__NUXT__ en el HTML")
+    end = html.find('</script>', match.end())
+    return html[match.end():end if end != -1 else len(html)]
+
+
+def parse_nuxt_payload(script):
+    """Evalúa el payload de window.__NUXT__ (IIFE o literal) y devuelve un dict"""
+    script = script.strip()
+    if script.startswith('{'):
+        try:
+            return json.loads(script.rstrip(';'))
+        except ValueError:
+            pass
+    return _NuxtPayloadParser(_tokenize(script)).parse_program()
+
+
+def project_nuxt_data(data, projection=NUXT_PRODUCT_PROJECTION):
+    """Copia de data con solo las claves declaradas en projection (las que falten se omiten)"""
+    if projection is True or not isinstance(data, dict):
+        return data
+    return {key: project_nuxt_data(data[key], spec) for key, spec in projection.items() if key in data}
+
+
+def projection_script(projection=NUXT_PRODUCT_PROJECTION):
+    """
+    JS para driver.execute_script que aplica la misma proyección dentro del
+    navegador, de modo que solo viaja por WebDriver lo que se va a usar
+    """
+    return (
+        "var pick = function (src, spec) {"
+        " if (spec === true || src === null || typeof src !== 'object' || Array.isArray(src)) return src;"
+        " var out = {};"
+        " for (var key in spec) { if (Object.prototype.hasOwnProperty.call(src, key)) out[key] = pick(src[key], spec[key]); }"
+        " return out; };"
+        f" return window.__NUXT__ ? pick(window.__NUXT__, {json.dumps(projection)}) : null;"
+    )
+
+
+def fetch_nuxt_data(product_url, session=None, timeout=HTTP_TIMEOUT):
+    """
+    Descarga la página de producto y devuelve su window.__NUXT__ como dict,
+    sin abrir Chrome. Lanza NuxtParseError si la página no lo incluye.
+    """
+    session = session or create_http_session()
+    response = session.get(product_url, timeout=timeout)
+    response.raise_for_status()
+    return parse_nuxt_payload(extract_nuxt_script(response.text))
+
+
+if __name__ == "__main__":
+    # Prueba de equivalencia con el fichero de ejemplo del repositorio
+    with open('nuxt_clon.js', 'r', encoding='utf-8') as f:
+        data = parse_nuxt_payload(extract_nuxt_script(f.read()))
+    product = data['state']['product']['product']
+    print(f"✅ __NUXT__ evaluado: {product['name']} ({len(product.get('variants', []))} variantes)")
@@ -0,0 +1,123 @@
+"""
+Filas de los CSVs de PrestaShop en formato compacto: cada fila es una lista
+con los valores en el orden de las cabeceras (una sola lista de referencias
+por fila en lugar de un dict con 66 o 23 claves). Las columnas se siguen
+pudiendo leer y escribir por nombre, y los valores por defecto de cada tipo
+de fila se calculan una vez y se comparten entre todas las filas.
+Al serializar a JSON (journal, estado incremental, ficheros temporales) la
+fila queda como una lista de valores.
+"""
+
+# --- CABECERAS CSV PRESTASHOP ---
+PRODUCT_CSV_HEADERS = [
+    'Product ID','Active (0/1)','Name *','Categories (x,y,z...)','Price tax excluded','Tax rules ID','Wholesale price',
+    'On sale (0/1)','Discount amount','Discount percent','Discount from (yyyy-mm-dd)','Discount to (yyyy-mm-dd)',
+    'Reference #','Supplier reference #','Supplier','Manufacturer','EAN13','UPC','MPN','Ecotax','Width','Height','Depth',
+    'Weight','Delivery time of in-stock products','Delivery time of out-of-stock products with allowed orders',
+    'Quantity','Minimal quantity','Low stock level','Send me an email when the quantity is under this level',
+    'Visibility','Additional shipping cost','Unity','Unit price','Summary','Description','Tags (x,y,z...)',
+    'Meta title','Meta keywords','Meta description','URL rewritten','Text when in stock','Text when backorder allowed',
+    'Available for order (0 = No, 1 = Yes)','Product available date','Product creation date',
+    'Show price (0 = No, 1 = Yes)','Image URLs (x,y,z...)','Image alt texts (x,y,z...)',
+    'Delete existing images (0 = No, 1 = Yes)','Feature(Name:Value:Position)','Available online only (0 = No, 1 = Yes)',
+    'Condition','Customizable (0 = No, 1 = Yes)','Uploadable files (0 = No, 1 = Yes)','Text fields (0 = No, 1 = Yes)',
+    'Out of stock action','Virtual product','File URL','Number of allowed downloads','Expiration date','Number of days',
+    'ID / Name of shop','Advanced stock management','Depends On Stock','Warehouse','Acessories  (x,y,z...)'
+]
+
+COMBINATION_CSV_HEADERS = [
+    'Id del Producto','Referencia del Producto','Atributo (Nombre:Tipo:Posicion)*','Valor (Valor:Posicion)*',
+    'Ref proveedor','Referencia','EAN13','UPC','MPN','Precio de coste','Impacto en el precio','Ecotasa',
+    'Cantidad','Cantidad minima','Nivel de stock bajo','Enviame un mensaje de correo electronico',
+    'Impacto en el peso','Predeterminado (0=No, 1=Si)','Fecha de disponibilidad de la combinacion',
+    'Elegir entre imagenes de productos por posicion(1,2,3)','URLs de las imagenes(x,y,z...)','Textos alternativos de imagen(x,y,z...)',
+    'Id / Nombre de la tienda'
+]
+
+
+class CSVRow(list):
+    """
+    Fila de un CSV: lista de valores en el orden de HEADERS, accesible
+    también por nombre de columna (row['Name *']).
+    Las subclases definen HEADERS y DEFAULTS (solo las columnas que no van vacías).
+    """
+    __slots__ = ()
+    HEADERS = []
+    DEFAULTS = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.INDEX = {header: index for index, header in enumerate(cls.HEADERS)}
+        cls.DEFAULT_VALUES = tuple(cls.DEFAULTS.get(header, '') for header in cls.HEADERS)
+
+    def __init__(self, values=None):
+        super().__init__(self.DEFAULT_VALUES if values is None else values)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = self.INDEX[key]
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, str):
+            key = self.INDEX[key]
+        super().__setitem__(key, value)
+
+    def get(self, column, default=None):
+        index = self.INDEX.get(column)
+        return default if index is None else super().__getitem__(index)
+
+    def with_values(self, changes):
+        """Copia de la fila con las columnas indicadas cambiadas"""
+        row = type(self)(self)
+        for column, value in changes.items():
+            row[column] = value
+        return row
+
+    def to_dict(self):
+        return dict(zip(self.HEADERS, self))
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Fila guardada (lista de valores, o dict con el formato anterior del
+        journal y del estado incremental) → fila compacta
+        """
+        if isinstance(row, dict):
+            return cls(row.get(header, '') for header in cls.HEADERS)
+        return cls(row)
+
+
+class ProductRow(CSVRow):
+    __slots__ = ()
+    HEADERS = PRODUCT_CSV_HEADERS
+    # Columnas de texto libre que pasan por text_sanitizer
+    TEXT_COLUMNS = (
+        'Name *', 'Supplier', 'Manufacturer', 'Delivery time of in-stock products', 'Summary', 'Description',
+        'Meta title', 'Meta description',
+    )
+    DEFAULTS = {
+        'Active (0/1)': 1, 'Tax rules ID': 1, 'Weight': 0, 'Quantity': 0, 'Minimal quantity': 1,
+        'Send me an email when the quantity is under this level': 0, 'Visibility': 'both',
+        'Text when in stock': 'Disponible', 'Available for order (0 = No, 1 = Yes)': 1,
+        'Show price (0 = No, 1 = Yes)': 1, 'Delete existing images (0 = No, 1 = Yes)': 1,
+        'Available online only (0 = No, 1 = Yes)': 0, 'Condition': 'new', 'Customizable (0 = No, 1 = Yes)': 0,
+        'Uploadable files (0 = No, 1 = Yes)': 0, 'Text fields (0 = No, 1 = Yes)': 0, 'Out of stock action': 0,
+        'Virtual product': 0, 'ID / Name of shop': 1, 'Advanced stock management': 0, 'Depends On Stock': 0,
+        'Warehouse': 0,
+    }
+
+
+class ComplementRow(ProductRow):
+    """Complementos: mismo CSV que los productos, con stock por defecto"""
+    __slots__ = ()
+    DEFAULTS = dict(ProductRow.DEFAULTS, **{'Quantity': 100})
+
+
+class CombinationRow(CSVRow):
+    __slots__ = ()
+    HEADERS = COMBINATION_CSV_HEADERS
+    DEFAULTS = {
+        'Ecotasa': 0, 'Cantidad': 100, 'Cantidad minima': 1, 'Impacto en el peso': 0,
+        'Predeterminado (0=No, 1=Si)': 0, 'Id / Nombre de la tienda': 1,
+    }
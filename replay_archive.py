@@ -0,0 +1,122 @@
+"""
+Grabación y reproducción de ejecuciones sin red. Con --record se guardan en
+un archivo comprimido (JSON por líneas + gzip) todas las entradas que llegan
+de fuera: las URLs de cada marca (PASO 1), el __NUXT__ de cada producto, ya
+proyectado (PASO 2), y las respuestas de la API de Decorabano (PASO 3).
+Con --replay se regeneran los CSVs leyendo solo de ese archivo, sin red ni
+Chrome, para perfilar y ajustar las transformaciones por separado.
+"""
+
+import gzip
+import json
+import threading
+
+from api_cache import make_cache_key
+
+# ================================
+# CONFIGURACIÓN
+# ================================
+REPLAY_COMPRESSLEVEL = 6  # gzip: 1 (rápido) - 9 (más pequeño)
+
+# Tipos de entrada del archivo
+URLS = 'urls'  # clave: URL de la marca → lista de productos del PASO 1
+NUXT = 'nuxt'  # clave: URL del producto → __NUXT__ proyectado
+API = 'api'    # clave: URL + parámetros (make_cache_key) → [status, json]
+
+
+class ReplayMiss(KeyError):
+    """La entrada pedida no está en el archivo que se reproduce"""
+
+
+class ReplayArchive:
+    """
+    Archivo de una ejecución. Con replay=False se graba (cada entrada una
+    sola vez, desde cualquier hilo); con replay=True se carga entero y solo
+    se lee.
+    """
+
+    def __init__(self, path, replay=False):
+        self.path = path
+        self.replaying = replay
+        self.stats = {URLS: 0, NUXT: 0, API: 0}
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._file = None
+        if replay:
+            self._load()
+        else:
+            self._file = gzip.open(path, 'wt', encoding='utf-8', compresslevel=REPLAY_COMPRESSLEVEL)
+
+    def _load(self):
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._entries[(entry['kind'], entry['key'])] = entry['data']
+                    self.stats[entry['kind']] += 1
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+            # Grabación interrumpida: se usa lo que se llegó a escribir
+            print(f"⚠️  Archivo de reproducción incompleto ({e}), se usan {len(self._entries)} entradas")
+
+    def put(self, kind, key, data):
+        with self._lock:
+            if self._file is None or (kind, key) in self._entries:
+                return
+            self._entries[(kind, key)] = None  # Solo hace falta saber que ya está escrita
+            self._file.write(json.dumps({'kind': kind, 'key': key, 'data': data},
+                                        ensure_ascii=False, separators=(',', ':')) + '\n')
+            self.stats[kind] += 1
+
+    def get(self, kind, key):
+        try:
+            return self._entries[(kind, key)]
+        except KeyError:
+            raise ReplayMiss(f"{kind} {key} no está en {self.path}") from None
+
+    def brand_urls(self):
+        """URLs de marca grabadas, en el orden en que se descubrieron"""
+        return [key for kind, key in self._entries if kind == URLS]
+
+    def close(self):
+        if self._file is not None:
+            with self._lock:
+                self._file.close()
+                self._file = None
+
+
+# Archivo de la ejecución en curso (None → ni se graba ni se reproduce)
+_active_archive = None
+
+
+def activate(archive):
+    global _active_archive
+    _active_archive = archive
+
+
+def active_archive():
+    return _active_archive
+
+
+def replaying():
+    return _active_archive is not None and _active_archive.replaying
+
+
+def recorded(kind, key, fetch):
+    """
+    fetch() a través del archivo activo: al reproducir se lee del archivo
+    (sin llamar a fetch); al grabar se llama y se guarda el resultado.
+    """
+    archive = _active_archive
+    if archive is None:
+        return fetch()
+    if archive.replaying:
+        return archive.get(kind, key)
+    data = fetch()
+    archive.put(kind, key, data)
+    return data
+
+
+def recorded_api_get(url, params, fetch):
+    """recorded() para una petición a la API: fetch() → (status_code, json)"""
+    status_code, data = recorded(API, make_cache_key(url, params), lambda: list(fetch()))
+    return status_code, data
@@ -1,10 +1,14 @@
-import json
-import csv
 import re
+import sys
+import argparse
 import time
 import os
+import queue
+import hashlib
+import threading
 from datetime import datetime
-from ftplib import FTP
+from functools import lru_cache
+from operator import itemgetter
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
@@ -12,83 +16,114 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
 # Importamos el módulo para obtener URLs
-from get_urls_by_brand import get_all_product_urls_from_brand
+from get_urls_by_brand import get_all_product_urls_from_brand, brand_slug_from_url
+# Obtención de __NUXT__ por HTTP (sin navegador)
+from nuxt_http import create_http_session, fetch_nuxt_data, project_nuxt_data, projection_script
+# Estado de ejecuciones anteriores (modo incremental)
+from incremental_state import IncrementalState, hash_product_state, with_product_id
+# Exportación delta respecto a lo último subido
+from delta_export import DeltaExporter, write_prestashop_csv
+# CSVs escritos en streaming (y filas pendientes en fichero temporal)
+from csv_stream import PrestaShopCSVWriter, RowSpill, row_values
+# Limpieza de textos común a productos y complementos
+from text_sanitizer import clean_text, clean_row_columns, clean_dimension_value, PRODUCT_PROFILE
+# Filas compactas (lista de valores en el orden de las cabeceras)
+from prestashop_rows import PRODUCT_CSV_HEADERS, COMBINATION_CSV_HEADERS, ProductRow, CombinationRow
+# IDs de PrestaShop estables entre ejecuciones
+from id_registry import IdRegistry, PRODUCT_NAMESPACE
+# Checkpoints para reanudar ejecuciones interrumpidas
+from checkpoint import RunJournal, CHECKPOINT_MAX_AGE
+# Subidas FTP con una sola sesión (y transferencias en paralelo opcionales)
+from ftp_uploader import FTPUploader
+# Tipos de complemento leídos del propio __NUXT__ (PASO 3 sin llamadas a complement_types)
+from complement_index import complement_types_from_nuxt, ComplementPipeline
+# Grabación / reproducción sin red de las entradas de la ejecución (--record / --replay)
+from replay_archive import ReplayArchive, ReplayMiss, activate, active_archive, replaying, recorded, URLS, NUXT
 
 # ================================
 # 1. FUNCIÓN PARA LIMPIAR TEXTO HTML
 # ================================
 def clean_html_text(text):
-    """Limpia texto HTML removiendo saltos de línea y caracteres problemáticos para CSV"""
-    if not text or text is None:
-        return ""
-    text = str(text)
-    cleaned = text.replace('&nbsp;', ' ')
-    cleaned = cleaned.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
-    
-    # ¡OJO! Corregido para no reintroducir comas.
-    cleaned = cleaned.replace('"', '').replace(';', ' ') 
-
-    cleaned = cleaned.replace('|', '-').replace('\x00', '').replace('\x0b', '').replace('\x0c', '')
-    cleaned = re.sub(r'\s+', ' ', cleaned)
-    return cleaned.strip()
-
-def clean_dimension_value(value):
-    """Limpia valores de dimensiones para que sean compatibles con PrestaShop"""
-    if not value or value is None:
-        return ""
-    
-    # Convertir a string y limpiar
-    value = str(value).strip()
-    
-    # Remover "cm" y otros textos
-    value = value.replace(' cm', '').replace('cm', '').replace(' ', '')
-    
-    # Si queda vacío, devolver vacío
-    if not value:
-        return ""
-    
-    # Intentar convertir a float para validar que sea numérico
-    try:
-        float_val = float(value.replace(',', '.'))  # Cambiar comas por puntos
-        return str(float_val)
-    except (ValueError, TypeError):
-        return ""  # Si no se puede convertir, devolver vacío
+    """Limpia texto HTML para el CSV de productos (';' → espacio, ver text_sanitizer.py)"""
+    return clean_text(text, PRODUCT_PROFILE)
 
 # --- CONFIGURACIÓN ---
 BRAND_URL_TO_SCRAPE = "https://www.todomueblesdebano.com/marcas/royo/"
+
+# Modo lote: varias marcas en una sola ejecución, compartiendo workers, cachés
+# y sesión FTP. Vacía → solo BRAND_URL_TO_SCRAPE. También por línea de comandos:
+#   python royo_prestashop_ftp.py URL_MARCA_1 URL_MARCA_2 ...
+BRAND_URLS_TO_SCRAPE = []
+# "per_brand" → un juego de CSVs por marca; "merged" → un único juego para todo el lote
+BATCH_OUTPUT_MODE = "per_brand"
+MERGED_OUTPUT_SLUG = "marcas"
 TAX_RATE = 1.21
 
-# Generar nombres de archivo con fecha y hora
-timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-PRODUCT_OUTPUT_FILENAME = f'{timestamp}-royo-products_import.csv'
-COMBINATION_OUTPUT_FILENAME = f'{timestamp}-royo-combinations_import.csv'
-
-# --- CABECERAS CSV PRESTASHOP ---
-PRODUCT_CSV_HEADERS = [
-    'Product ID','Active (0/1)','Name *','Categories (x,y,z...)','Price tax excluded','Tax rules ID','Wholesale price',
-    'On sale (0/1)','Discount amount','Discount percent','Discount from (yyyy-mm-dd)','Discount to (yyyy-mm-dd)',
-    'Reference #','Supplier reference #','Supplier','Manufacturer','EAN13','UPC','MPN','Ecotax','Width','Height','Depth',
-    'Weight','Delivery time of in-stock products','Delivery time of out-of-stock products with allowed orders',
-    'Quantity','Minimal quantity','Low stock level','Send me an email when the quantity is under this level',
-    'Visibility','Additional shipping cost','Unity','Unit price','Summary','Description','Tags (x,y,z...)',
-    'Meta title','Meta keywords','Meta description','URL rewritten','Text when in stock','Text when backorder allowed',
-    'Available for order (0 = No, 1 = Yes)','Product available date','Product creation date',
-    'Show price (0 = No, 1 = Yes)','Image URLs (x,y,z...)','Image alt texts (x,y,z...)',
-    'Delete existing images (0 = No, 1 = Yes)','Feature(Name:Value:Position)','Available online only (0 = No, 1 = Yes)',
-    'Condition','Customizable (0 = No, 1 = Yes)','Uploadable files (0 = No, 1 = Yes)','Text fields (0 = No, 1 = Yes)',
-    'Out of stock action','Virtual product','File URL','Number of allowed downloads','Expiration date','Number of days',
-    'ID / Name of shop','Advanced stock management','Depends On Stock','Warehouse','Acessories  (x,y,z...)'
-]
+# Modo de obtención de las páginas de producto:
+#   "http"    → descarga del HTML y evaluación de la IIFE de __NUXT__ (sin Chrome)
+#   "browser" → Chrome + execute_script (además contrasta precios con el DOM)
+PRODUCT_FETCH_MODE = "http"
+
+# Los precios salen de __NUXT__ (pvp_supplier / pvp_web / web_discount). En modo browser
+# se contrasta con el precio visible esta fracción de productos (0 = nunca, 1 = todos);
+# la muestra sale del UUID, así que en cada ejecución se contrastan los mismos
+PRICE_DOM_SAMPLE_RATE = 0.1
+PRICE_DOM_TOLERANCE = 0.01  # €
 
-COMBINATION_CSV_HEADERS = [
-    'Id del Producto','Referencia del Producto','Atributo (Nombre:Tipo:Posicion)*','Valor (Valor:Posicion)*',
-    'Ref proveedor','Referencia','EAN13','UPC','MPN','Precio de coste','Impacto en el precio','Ecotasa',
-    'Cantidad','Cantidad minima','Nivel de stock bajo','Enviame un mensaje de correo electronico',
-    'Impacto en el peso','Predeterminado (0=No, 1=Si)','Fecha de disponibilidad de la combinacion',
-    'Elegir entre imagenes de productos por posicion(1,2,3)','URLs de las imagenes(x,y,z...)','Textos alternativos de imagen(x,y,z...)',
-    'Id / Nombre de la tienda'
+# Nombres y valores de características ya limpios que se recuerdan entre productos
+FEATURE_TEXT_CACHE_SIZE = 4096
+
+# Número de workers que visitan productos en paralelo (en modo browser, una sesión de Chrome cada uno)
+PRODUCT_WORKERS = 4
+
+# Chrome "rápido" (cuando hace falta navegador): bloquea por CDP imágenes, vídeo,
+# fuentes y trackers, carga 'eager' y espera a __NUXT__ en lugar del evento load
+FAST_BROWSER = True
+BLOCKED_URL_PATTERNS = [
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.mp4', '*.webm', '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*/image/upload/*', '*/video/upload/*',  # Cloudinary (cdn.todomueblesdebano.com / cdn.decorabano.com)
+    '*googletagmanager.com*', '*google-analytics.com*', '*doubleclick.net*', '*googleadservices.com*',
+    '*facebook.net*', '*facebook.com/tr*', '*hotjar.com*', '*clarity.ms*', '*bat.bing.com*',
+    '*analytics.tiktok.com*', '*criteo.*',
 ]
 
+# Modo incremental: reutiliza filas y complementos de productos cuyo state.product no ha cambiado
+INCREMENTAL_MODE = True
+
+# Modo de exportación:
+#   "full"  → CSVs completos en cada ejecución
+#   "delta" → solo filas nuevas/modificadas respecto a la última subida + lista de desactivación
+EXPORT_MODE = "full"
+
+# IDs de PrestaShop persistentes por UUID de producto / clave de complemento.
+# Un producto nuevo recibe su ID por posición (86 + i) si está libre: en la
+# primera ejecución se conservan los IDs que ya tenía la tienda.
+# Con False se vuelve a la numeración por posición (86 + i).
+ID_REGISTRY_ENABLED = True
+PRODUCT_START_ID = 87
+
+# Checkpoints: si la ejecución anterior se interrumpió, se reanuda desde la última unidad completada
+CHECKPOINT_ENABLED = True
+COMPLEMENT_CHECKPOINT_BATCH = 25  # Productos por lote de llamadas a la API entre checkpoints
+
+# Conexiones FTP simultáneas en el PASO 7 (1 = una sola sesión, ficheros uno tras otro)
+FTP_PARALLEL_UPLOADS = 1
+# No volver a subir ficheros idénticos a los ya publicados (manifiesto remoto con SHA-256/tamaño)
+FTP_SKIP_UNCHANGED = True
+
+# Generar nombres de archivo con fecha y hora
+def build_output_filenames(run_timestamp, brand_slug='royo'):
+    """Nombres de los CSVs de productos, combinaciones y desactivación de una ejecución"""
+    return (
+        f'{run_timestamp}-{brand_slug}-products_import.csv',
+        f'{run_timestamp}-{brand_slug}-combinations_import.csv',
+        f'{run_timestamp}-{brand_slug}-products_deactivate.csv',
+    )
+
+timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+PRODUCT_OUTPUT_FILENAME, COMBINATION_OUTPUT_FILENAME, DEACTIVATION_OUTPUT_FILENAME = build_output_filenames(timestamp)
+
 # ================================
 # 1. FUNCIÓN FTP
 # ================================
@@ -106,35 +141,99 @@ def leer_configuracion_ftp(archivo_config):
         return None
 
 def subir_archivo_ftp(nombre_archivo, servidor, usuario, contraseña, ruta_remota="/"):
-    try:
-        ftp = FTP(servidor)
-        ftp.login(usuario, contraseña)
-        print(f"🔗 Conectado al FTP: {servidor}")
-        
-        directorio_actual = ftp.pwd()
-        print(f"📁 Directorio actual: {directorio_actual}")
-        
-        if ruta_remota and ruta_remota != "/" and ruta_remota.strip():
-            try:
-                ftp.cwd(ruta_remota)
-                print(f"📁 Cambiado a: {ruta_remota}")
-            except Exception as e:
-                print(f"⚠️  No se pudo cambiar a '{ruta_remota}': {e}")
-                print(f"📁 Usando directorio actual: {directorio_actual}")
-        
-        with open(nombre_archivo, 'rb') as archivo:
-            ftp.storbinary(f'STOR {nombre_archivo}', archivo)
-        
-        print(f"✅ Archivo '{nombre_archivo}' subido correctamente al FTP.")
-        ftp.quit()
-        return True
-    except Exception as e:
-        print(f"❌ Error al subir '{nombre_archivo}' al FTP: {e}")
-        return False
+    """Sube un único fichero abriendo y cerrando su propia sesión (para lotes usar FTPUploader)"""
+    with FTPUploader(servidor, usuario, contraseña, ruta_remota) as uploader:
+        return uploader.subir_archivo(nombre_archivo)
 
 # ================================
 # 2. EXTRACCIÓN DATOS PRESTASHOP
 # ================================
+def resolve_prices(prices):
+    """
+    Precios con IVA a partir de state.product.product.prices (en céntimos).
+    Retorna: (precio_original, precio_con_descuento)
+    - precio_original: el tachado en la web (pvp_supplier) si hay descuento, si no pvp_web
+    - precio_con_descuento: pvp_web (= pvp_supplier * (1 - web_discount/100))
+    """
+    pvp_supplier = prices.get('pvp_supplier', 0) / 100
+    pvp_web = prices.get('pvp_web', 0) / 100
+    original = pvp_supplier if pvp_supplier > pvp_web else pvp_web
+    return original, pvp_web
+
+def parse_euro_amount(price_text):
+    """ "1.234,56€" → 1234.56 """
+    price_text_clean = price_text.replace('€', '').strip()
+    # Si tiene punto como separador de miles y coma como decimal: "1.234,56" → "1234.56"
+    if ',' in price_text_clean and '.' in price_text_clean:
+        price_text_clean = price_text_clean.replace('.', '').replace(',', '.')
+    # Si solo tiene coma como decimal: "609,84" → "609.84"
+    elif ',' in price_text_clean:
+        price_text_clean = price_text_clean.replace(',', '.')
+    return float(price_text_clean)
+
+def price_dom_sampled(product_uuid):
+    """¿Entra el producto en la muestra de PRICE_DOM_SAMPLE_RATE? Siempre la misma respuesta para un UUID"""
+    bucket = int(hashlib.sha256(product_uuid.encode('utf-8')).hexdigest(), 16) % 1000
+    return bucket < PRICE_DOM_SAMPLE_RATE * 1000
+
+def check_price_against_dom(driver, expected_price):
+    """
+    Compara el precio original calculado con el visible en la página
+    (tachado si hay descuento, si no el normal). Si no coinciden se avisa y
+    se usa el del DOM, que es el que ve el cliente.
+    """
+    try:
+        elements = (driver.find_elements(By.CSS_SELECTOR, "span.line-through")
+                    or driver.find_elements(By.CSS_SELECTOR, "span.price"))
+        dom_price = parse_euro_amount(elements[0].text)
+    except (IndexError, ValueError) as e:
+        print(f"    ⚠️  No se pudo leer el precio visual para contrastarlo ({e})")
+        return expected_price
+    if abs(dom_price - expected_price) > PRICE_DOM_TOLERANCE:
+        print(f"    ⚠️  Precio calculado {expected_price}€ ≠ precio en la web {dom_price}€, se usa el de la web")
+        return dom_price
+    print(f"    🏷️  Precio contrastado con la web: {dom_price}€")
+    return expected_price
+
+@lru_cache(maxsize=FEATURE_TEXT_CACHE_SIZE)
+def clean_feature_text(text):
+    """clean_html_text + comas por puntos (la coma separa características); los nombres se repiten entre productos"""
+    return clean_html_text(text).replace(',', '.')
+
+def iter_features(technical_data, complements, tech_data_map):
+    """
+    Genera las entradas de Feature(Name:Value:Position) recorriendo una sola
+    vez las características técnicas y los grupos de complementos, sin
+    repetir nombre (gana la primera). De paso rellena tech_data_map con los
+    valores sin limpiar de cada atributo (gana el último, para las medidas).
+    """
+    seen_names = set()
+    
+    for item in technical_data:
+        if not (item.get('attribute') and item.get('options')):
+            continue
+        raw_name = item['attribute']['name']
+        raw_value = item['options'][0]['option']['value_string']
+        tech_data_map[raw_name.lower()] = raw_value
+        
+        attr_name = clean_feature_text(raw_name)
+        attr_value = clean_feature_text(raw_value)
+        if len(attr_name) < 2 or not attr_value or attr_name in seen_names:
+            continue
+        seen_names.add(attr_name)
+        yield f"{attr_name}:{attr_value}:{item.get('position', 0)}"
+    
+    for complement_group in complements or []:
+        group_name = clean_feature_text(complement_group.get('name', 'Complementos'))
+        options = complement_group.get('options', [])
+        if not options or group_name in seen_names:
+            continue
+        complement_names = [opt.get('name', '').replace(',', '.') for opt in options if opt.get('name')]
+        if complement_names:
+            seen_names.add(group_name)
+            # Une los nombres con un guion para no usar comas
+            yield f"{group_name}:Disponible ({' - '.join(complement_names[:3])}):999"
+
 def extract_product_data(nuxt_data, numeric_product_id, driver=None):
     try:
         product_data = nuxt_data['state']['product']['product']
@@ -149,49 +248,14 @@ def extract_product_data(nuxt_data, numeric_product_id, driver=None):
     except (KeyError, TypeError): 
         return None
 
-    tech_data_map = {item['attribute']['name'].lower(): item['options'][0]['option']['value_string'] 
-                     for item in technical_data if item.get('attribute') and item.get('options')}
-    
-    # EXTRAER PRECIO VISUAL DEL HTML (precio ORIGINAL sin descuento, para que PrestaShop aplique el descuento)
-    price_with_tax = 0
-    if driver:
-        try:
-            # Primero intentar obtener el precio TACHADO (precio original sin descuento)
-            # Este es el precio que debe ir en "Price tax excluded" para que PrestaShop aplique el descuento
-            try:
-                original_price_element = driver.find_element(By.CSS_SELECTOR, "span.line-through")
-                price_text = original_price_element.text.strip()
-                print(f"    🏷️  Precio ORIGINAL (tachado) encontrado: {price_text}")
-            except:
-                # Si no hay precio tachado, usar el precio normal (producto sin descuento)
-                price_element = driver.find_element(By.CSS_SELECTOR, "span.price")
-                price_text = price_element.text.strip()
-                print(f"    💰 Precio (sin descuento en web): {price_text}")
-            
-            # Extraer número del texto (ej: "609,84€" → 609.84)
-            # Reemplazar separador de miles (.) y decimal (,) al formato estándar
-            price_text_clean = price_text.replace('€', '').strip()
-            
-            # Si tiene punto como separador de miles y coma como decimal: "1.234,56" → "1234.56"
-            if ',' in price_text_clean and '.' in price_text_clean:
-                price_text_clean = price_text_clean.replace('.', '').replace(',', '.')
-            # Si solo tiene coma como decimal: "609,84" → "609.84"
-            elif ',' in price_text_clean:
-                price_text_clean = price_text_clean.replace(',', '.')
-            
-            price_with_tax = float(price_text_clean)
-            print(f"    💰 Precio extraído (ORIGINAL con IVA): {price_with_tax}€")
-        except Exception as e:
-            print(f"    ⚠️  No se pudo extraer precio visual, usando pvp_web del __NUXT__")
+    tech_data_map = {}  # {nombre del atributo en minúsculas: valor sin limpiar} (lo rellena iter_features)
     
-    # Si se obtuvo precio visual (con IVA), calcular precio sin IVA
-    if price_with_tax > 0:
-        price_tax_excluded = round(price_with_tax / TAX_RATE, 6)
-        price_final = price_with_tax  # Para cálculo de descuentos
-    else:
-        # Fallback: usar precio del __NUXT__
-        price_final = prices.get('pvp_web', 0) / 100
-        price_tax_excluded = round(price_final / TAX_RATE, 6) if price_final > 0 else 0
+    # PRECIO ORIGINAL (con IVA, sin descuento) calculado del __NUXT__ para que PrestaShop aplique el descuento;
+    # en modo browser se contrasta con el precio visible en una muestra de productos
+    price_with_tax, _ = resolve_prices(prices)
+    if driver and price_dom_sampled(product_data.get('id') or ''):
+        price_with_tax = check_price_against_dom(driver, price_with_tax)
+    price_tax_excluded = round(price_with_tax / TAX_RATE, 6) if price_with_tax > 0 else 0
     
     on_sale = 1 if prices.get('pvp_supplier', 0) > prices.get('pvp_web', 0) else 0
     discount_amount = round((prices.get('pvp_supplier', 0) - prices.get('pvp_web', 0)) / 100, 2) if on_sale else 0
@@ -209,74 +273,11 @@ def extract_product_data(nuxt_data, numeric_product_id, driver=None):
     ]
     image_urls = ",".join(filtered_images)
     
-     # 1. Inicializa un diccionario único para DEDUPLICAR todas las características
-    features_dict = {}
+    # Características técnicas + grupos de complementos en una sola pasada
+    features_str = ",".join(iter_features(technical_data, complements, tech_data_map))
 
-    # 2. Procesa las CARACTERÍSTICAS TÉCNICAS y las añade al diccionario
-    for item in technical_data:
-        if item.get('attribute') and item.get('options'):
-            attr_name = clean_html_text(item['attribute']['name'])
-            attr_value = clean_html_text(item['options'][0]['option']['value_string'])
-            position = item.get('position', 0)
-            
-            if not attr_name or len(attr_name) < 2 or not attr_value:
-                continue
-            
-            # Reemplaza comas por puntos para evitar conflictos
-            attr_name_clean = attr_name.replace(',', '.')
-            attr_value_clean = attr_value.replace(',', '.')
-            
-            # Añade al diccionario solo si no existe ya (evita duplicados)
-            if attr_name_clean not in features_dict:
-                features_dict[attr_name_clean] = f"{attr_name_clean}:{attr_value_clean}:{position}"
-
-    # 3. Procesa los COMPLEMENTOS y los añade al MISMO diccionario
-    if complements:
-        for complement_group in complements:
-            group_name = clean_html_text(complement_group.get('name', 'Complementos'))
-            group_name_clean = group_name.replace(',', '.')
-            options = complement_group.get('options', [])
-            
-            # Revisa que no exista ya la característica del complemento
-            if options and group_name_clean not in features_dict:
-                complement_names = [opt.get('name', '').replace(',', '.') for opt in options if opt.get('name')]
-                if complement_names:
-                    # Une los nombres con un guion para no usar comas
-                    complement_names_str = ' - '.join(complement_names[:3]) 
-                    features_dict[group_name_clean] = f"{group_name_clean}:Disponible ({complement_names_str}):999"
-
-    # 4. Crea la LISTA FINAL a partir del diccionario unificado
-    features_list = list(features_dict.values())
-
-    # Añadir complementos como características adicionales (sin duplicados)
-    complement_features = {}
-    if complements:
-        for complement_group in complements:
-            group_name = clean_html_text(complement_group.get('name', 'Complementos'))
-            group_name_clean = group_name.replace(',', '.')
-            options = complement_group.get('options', [])
-            if options and group_name_clean not in complement_features:
-                complement_names = [opt.get('name', '').replace(',', '.') for opt in options if opt.get('name')]
-                if complement_names:
-                    complement_features[group_name_clean] = f"{group_name_clean}:Disponible ({', '.join(complement_names[:3])}):999"
-    features_list.extend(complement_features.values())
-    for item in technical_data:
-        if item.get('attribute') and item.get('options'):
-            attr_name = clean_html_text(item['attribute']['name'])
-            attr_value = clean_html_text(item['options'][0]['option']['value_string'])
-            position = item.get('position', 0)
-            if not attr_name or len(attr_name) < 2 or not attr_value:
-                continue
-            
-            # Reemplazar comas internas por '.' (punto)
-            attr_name_clean = attr_name.replace(',', '.')
-            attr_value_clean = attr_value.replace(',', '.')
-            
-            if attr_name_clean not in features_dict:
-                features_dict[attr_name_clean] = f"{attr_name_clean}:{attr_value_clean}:{position}"
-    features_list = list(features_dict.values())
-
-    tags = list(set([word.lower() for word in re.split(r'\s|,', product_data.get('name', '')) if len(word) > 3]))
+    # Sin repetir y en orden de aparición (un set cambia de orden entre ejecuciones y el delta lo vería como cambio)
+    tags = list(dict.fromkeys([word.lower() for word in re.split(r'\s|,', product_data.get('name', '')) if len(word) > 3]))
     tags.append("muebles")
     tags.append("baño")
     tags.append(product_data.get('supplier', {}).get('name', '').lower())
@@ -309,119 +310,130 @@ def extract_product_data(nuxt_data, numeric_product_id, driver=None):
         if summary_text and len(summary_text) > 800:
             summary_text = summary_text[:800] + '...'
 
+    row = ProductRow()
+    row['Product ID'] = numeric_product_id
+    row['Name *'] = product_data.get('name', '')
+    row['Categories (x,y,z...)'] = categories_str
+    row['Price tax excluded'] = price_tax_excluded
+    row['On sale (0/1)'] = on_sale
+    if on_sale:
+        row['Discount amount'] = discount_amount
+        row['Discount percent'] = prices.get('web_discount', '')
+    row['Reference #'] = product_data.get('ref', '')
+    row['Supplier'] = row['Manufacturer'] = product_data.get('supplier', {}).get('name', '')
+    row['EAN13'] = product_data.get('ean', '')
+    row['Width'] = clean_dimension_value(tech_data_map.get('ancho seleccionable estándar', ''))
+    row['Height'] = clean_dimension_value(tech_data_map.get('alto seleccionable estándar', ''))
+    row['Depth'] = clean_dimension_value(tech_data_map.get('fondo seleccionable estándar', ''))
+    row['Delivery time of in-stock products'] = delivery_time
+    row['Summary'] = summary_text
+    row['Description'] = seo_data.get('description', '')
+    row['Tags (x,y,z...)'] = ",".join(dict.fromkeys(tags))
+    row['Meta title'] = seo_data.get('meta_title', '')
+    row['Meta description'] = seo_data.get('meta_description', '')
+    row['URL rewritten'] = url_slug
+    row['Image URLs (x,y,z...)'] = image_urls
+    row['Feature(Name:Value:Position)'] = features_str
+    row['Virtual product'] = 0 if not file_url else 1
+    row['File URL'] = file_url
+    # Todas las columnas de texto libre de una vez
+    return clean_row_columns(row, ProductRow.TEXT_COLUMNS, PRODUCT_PROFILE)
+
+# Pistas para nombrar un atributo sin nombre a partir de uno de sus valores
+ATTRIBUTE_UNIT_HINTS = ['cm', 'mm', 'm ']
+ATTRIBUTE_COLOR_HINTS = ['blanco', 'negro', 'gris', 'azul', 'rojo', 'verde', 'amarillo', 'nogal', 'roble', 'wengue', 'antracita']
+
+def infer_attribute_name(sample_value, index):
+    """Nombre descriptivo para un atributo sin nombre (medidas, colores...)"""
+    sample_value = (sample_value or '').lower()
+    if any(unit in sample_value for unit in ATTRIBUTE_UNIT_HINTS):
+        return "Medida"
+    if any(color in sample_value for color in ATTRIBUTE_COLOR_HINTS):
+        return "Color"
+    if 'espejo' in sample_value:
+        return "Espejo"
+    return f"Opción {index+1}"
+
+def attribute_option_name(option):
+    """Nombre del atributo que trae una opción de variante ('' si no trae)"""
+    attribute = option.get('attribute')
+    if isinstance(attribute, dict):
+        attr_name = clean_html_text(attribute.get('name') or attribute.get('label'))
+        if attr_name:
+            return attr_name
+    return clean_html_text(option.get('attribute_name'))
+
+def index_attributes(variants):
+    """
+    Recorre una sola vez todas las variantes y retorna
+    {attribute_id: {"name", "type", "position"}}.
+    La posición es la de la opción en la primera variante; los atributos que
+    solo aparecen en variantes posteriores van detrás. El nombre es el primero
+    que traiga cualquier variante o, si ninguna lo trae, uno deducido de los
+    valores (infer_attribute_name).
+    """
+    first_options = variants[0].get('options', {}).get('options', [])
+    positions = {}  # attribute_id → (posición, opción de muestra)
+    for index, option in enumerate(first_options):
+        if option.get('attribute_id'):
+            positions[option['attribute_id']] = (index, option)
+    
+    names = {}
+    next_position = len(first_options)
+    for variant in variants:
+        for option in variant.get('options', {}).get('options', []):
+            attr_id = option.get('attribute_id')
+            if attr_id in names or not attr_id:
+                continue  # Ya indexado y con nombre: el caso habitual
+            if attr_id not in positions:
+                positions[attr_id] = (next_position, option)
+                next_position += 1
+            attr_name = attribute_option_name(option)
+            if attr_name:
+                names[attr_id] = attr_name
+    
     return {
-        'Product ID': numeric_product_id, 'Active (0/1)': 1, 'Name *': clean_html_text(product_data.get('name', '')),
-        'Categories (x,y,z...)': categories_str, 'Price tax excluded': price_tax_excluded, 'Tax rules ID': 1,
-        'Wholesale price': '', 'On sale (0/1)': on_sale, 'Discount amount': discount_amount if on_sale else '',
-        'Discount percent': prices.get('web_discount', '') if on_sale else '', 'Discount from (yyyy-mm-dd)': '',
-        'Discount to (yyyy-mm-dd)': '', 'Reference #': product_data.get('ref', ''), 'Supplier reference #': '',
-        'Supplier': clean_html_text(product_data.get('supplier', {}).get('name', '')), 'Manufacturer': clean_html_text(product_data.get('supplier', {}).get('name', '')),
-        'EAN13': product_data.get('ean', ''), 'UPC': '', 'MPN': '', 'Ecotax': '', 
-        'Width': clean_dimension_value(tech_data_map.get('ancho seleccionable estándar', '')),
-        'Height': clean_dimension_value(tech_data_map.get('alto seleccionable estándar', '')),
-        'Depth': clean_dimension_value(tech_data_map.get('fondo seleccionable estándar', '')), 'Weight': 0,
-        'Delivery time of in-stock products': clean_html_text(delivery_time),
-        'Delivery time of out-of-stock products with allowed orders': '', 'Quantity': 0, 'Minimal quantity': 1,
-        'Low stock level': '', 'Send me an email when the quantity is under this level': 0, 'Visibility': 'both',
-        'Additional shipping cost': '', 'Unity': '', 'Unit price': '', 'Summary': clean_html_text(summary_text),
-        'Description': clean_html_text(seo_data.get('description', '')), 'Tags (x,y,z...)': ",".join(list(set(tags))),
-        'Meta title': clean_html_text(seo_data.get('meta_title', '')), 'Meta keywords': '', 'Meta description': clean_html_text(seo_data.get('meta_description', '')),
-        'URL rewritten': url_slug, 'Text when in stock': 'Disponible', 'Text when backorder allowed': '',
-        'Available for order (0 = No, 1 = Yes)': 1, 'Product available date': '', 'Product creation date': '',
-        'Show price (0 = No, 1 = Yes)': 1, 'Image URLs (x,y,z...)': image_urls, 'Image alt texts (x,y,z...)': '',
-        'Delete existing images (0 = No, 1 = Yes)': 1, 'Feature(Name:Value:Position)': ",".join(features_list),
-        'Available online only (0 = No, 1 = Yes)': 0, 'Condition': 'new', 'Customizable (0 = No, 1 = Yes)': 0,
-        'Uploadable files (0 = No, 1 = Yes)': 0, 'Text fields (0 = No, 1 = Yes)': 0, 'Out of stock action': 0,
-        'Virtual product': 0 if not file_url else 1, 'File URL': file_url, 'Number of allowed downloads': '', 'Expiration date': '',
-        'Number of days': '', 'ID / Name of shop': 1, 'Advanced stock management': 0, 'Depends On Stock': 0,
-        'Warehouse': 0, 'Acessories  (x,y,z...)': ''
+        attr_id: {
+            "name": names.get(attr_id) or infer_attribute_name(option.get('name'), position),
+            "type": "select",
+            "position": position,
+        }
+        for attr_id, (position, option) in positions.items()
     }
 
-def extract_combinations_data(nuxt_data, numeric_product_id):
+def iter_combinations_data(nuxt_data, numeric_product_id):
+    """
+    Genera las filas de combinaciones del producto, una por variante, sin
+    acumularlas: el coste crece linealmente con el número de variantes.
+    """
     try:
         product_data = nuxt_data['state']['product']['product']
         variants = product_data.get('variants', [])
-        if not variants: return []
-        
+        if not variants: return
         base_price_cents = product_data.get('prices', {}).get('pvp_web', 0)
-        all_combinations = []
-        
-        # Obtener la URL de la imagen principal del producto (filtrar imagen problemática)
-        images_list = product_data.get('images', [])
-        main_image_url = ""
-        problematic_image = "products/f96cbc2f-a08e-4832-9d62-8cdeae03c4f2/Vitale_DetallePatas_1668600799.0959315"
-        
-        if images_list:
-            # Buscar la primera imagen válida (que no sea la problemática)
-            for img in images_list:
-                if img['public_id'] != problematic_image:
-                    main_image_url = f"https://cdn.todomueblesdebano.com/image/upload/f_auto%2Cq_auto/v1/{img['public_id']}"
-                    break
-        
-    except (KeyError, TypeError) as e:
+    except (KeyError, TypeError, AttributeError) as e:
         print(f"    ❌ Error extrayendo combinaciones: {e}")
-        return []
-
-    # Crear mapping de atributos de forma más directa desde las variantes
-    # Examinar la primera variante para obtener los IDs y nombres de atributos
-    attribute_mapping = {}
-    if variants and len(variants) > 0:
-        first_variant = variants[0]
-        if 'options' in first_variant and 'options' in first_variant['options']:
-            options_list = first_variant['options']['options']
-            
-            # Para cada opción en la primera variante, extraer información del atributo
-            for index, option in enumerate(options_list):
-                attr_id = option.get('attribute_id')
-                if not attr_id:
-                    continue
-                
-                # Intentar múltiples formas de obtener el nombre del atributo
-                friendly_name = None
-                
-                # Método 1: Buscar en toda la lista de variantes un campo "attribute" con nombre
-                for variant in variants[:5]:  # Revisar las primeras 5 variantes
-                    for opt in variant.get('options', {}).get('options', []):
-                        if opt.get('attribute_id') == attr_id:
-                            # Intentar extraer nombre de diferentes ubicaciones
-                            if 'attribute' in opt and isinstance(opt['attribute'], dict):
-                                attr_name = opt['attribute'].get('name') or opt['attribute'].get('label')
-                                if attr_name:
-                                    friendly_name = clean_html_text(attr_name)
-                                    break
-                            # Intentar desde attribute_name
-                            if not friendly_name and 'attribute_name' in opt:
-                                friendly_name = clean_html_text(opt['attribute_name'])
-                                break
-                    if friendly_name:
-                        break
-                
-                # Si no se encontró nombre, usar valor por defecto descriptivo
-                if not friendly_name:
-                    # Intentar inferir del tipo de valores (si son medidas, colores, etc.)
-                    sample_value = option.get('name', '').lower()
-                    if any(unit in sample_value for unit in ['cm', 'mm', 'm ']):
-                        friendly_name = "Medida"
-                    elif any(color in sample_value for color in ['blanco', 'negro', 'gris', 'azul', 'rojo', 'verde', 'amarillo', 'nogal', 'roble', 'wengue', 'antracita']):
-                        friendly_name = "Color"
-                    elif 'espejo' in sample_value:
-                        friendly_name = "Espejo"
-                    else:
-                        friendly_name = f"Opción {index+1}"
-                
-                attribute_mapping[attr_id] = {"name": friendly_name, "type": "select", "position": index}
+        return
     
+    attribute_mapping = index_attributes(variants)
     attributes_header = ",".join([f"{v['name']}:{v['type']}:{v['position']}" for v in attribute_mapping.values()])
-
+    positions = {attr_id: attribute['position'] for attr_id, attribute in attribute_mapping.items()}
+    
+    # Columnas comunes a todas las combinaciones del producto
+    template = CombinationRow()
+    template['Id del Producto'] = numeric_product_id
+    template['Atributo (Nombre:Tipo:Posicion)*'] = attributes_header
+    
     default_assigned = False
-    for index, variant in enumerate(variants):
+    for variant in variants:
         values_list = []
         for option in variant.get('options', {}).get('options', []):
-            attr_id = option.get('attribute_id')
-            if attr_id in attribute_mapping:
-                pos = attribute_mapping[attr_id]['position']
-                values_list.append(f"{option.get('name', '')}:{pos}")
-        values_str = ",".join(sorted(values_list, key=lambda x: x.split(':')[1]))
+            pos = positions.get(option.get('attribute_id'))
+            if pos is not None:
+                values_list.append((pos, option.get('name', '')))
+        # Orden numérico por posición (la 10 va después de la 9)
+        values_list.sort(key=itemgetter(0))
+        values_str = ",".join([f"{name}:{pos}" for pos, name in values_list])
         
         variant_price_cents = variant.get('prices', {}).get('pvp_web', 0)
         price_impact = round((variant_price_cents - base_price_cents) / 100, 6) if base_price_cents > 0 else 0
@@ -431,196 +443,468 @@ def extract_combinations_data(nuxt_data, numeric_product_id):
             is_default = 1
             default_assigned = True
         
-        # Usar siempre la imagen principal del producto (posición 1) para todas las combinaciones
-        image_position = 1
-            
-        all_combinations.append({
-            'Id del Producto': numeric_product_id, 
-            'Referencia del Producto': '', 
-            'Atributo (Nombre:Tipo:Posicion)*': attributes_header,
-            'Valor (Valor:Posicion)*': values_str, 
-            'Ref proveedor': '', 
-            'Referencia': variant.get('ref', ''), 
-            'EAN13': variant.get('ean', ''),
-            'UPC': '', 
-            'MPN': '',
-            'Precio de coste': '', 
-            'Impacto en el precio': price_impact, 
-            'Ecotasa': 0,
-            'Cantidad': 100,
-            'Cantidad minima': 1, 
-            'Nivel de stock bajo': '', 
-            'Enviame un mensaje de correo electronico': '',
-            'Impacto en el peso': 0, 
-            'Predeterminado (0=No, 1=Si)': is_default, 
-            'Fecha de disponibilidad de la combinacion': '',
-            'Elegir entre imagenes de productos por posicion(1,2,3)': '', 
-            'URLs de las imagenes(x,y,z...)': '', 
-            'Textos alternativos de imagen(x,y,z...)': '', 
-            'Id / Nombre de la tienda': 1
-        })
-    return all_combinations
+        combination = CombinationRow(template)
+        combination['Valor (Valor:Posicion)*'] = values_str
+        combination['Referencia'] = variant.get('ref', '')
+        combination['EAN13'] = variant.get('ean', '')
+        combination['Impacto en el precio'] = price_impact
+        combination['Predeterminado (0=No, 1=Si)'] = is_default
+        yield combination
+
+def extract_combinations_data(nuxt_data, numeric_product_id):
+    """Lista de filas de combinaciones (ver iter_combinations_data)"""
+    return list(iter_combinations_data(nuxt_data, numeric_product_id))
 
 # ================================
-# 3. FUNCIÓN PRINCIPAL INTEGRADA
+# 3. VISITA DE PRODUCTOS (POOL DE WORKERS)
 # ================================
-def main():
-    print("🚀 INICIANDO: Scraper Royo + PrestaShop + FTP")
-    print("=" * 50)
-    
+# Solo los subárboles de __NUXT__ que se usan (ver NUXT_PRODUCT_PROJECTION en nuxt_http.py)
+NUXT_PROJECTION_SCRIPT = projection_script()
+
+def create_chrome_driver(fast=None):
+    """
+    Crea una sesión de Chrome headless con la configuración del scraper.
+    Con fast (por defecto FAST_BROWSER) no se descargan imágenes, vídeo,
+    fuentes ni trackers y driver.get vuelve en DOMContentLoaded.
+    """
+    fast = FAST_BROWSER if fast is None else fast
     options = webdriver.ChromeOptions()
     options.add_argument("--headless")
     options.add_argument("--window-size=1920,1080")
     options.add_argument("--log-level=3")
-    
-    driver = None
-    all_products_data = []
-    all_combinations_data = []
-    product_uuid_list = []  # Lista de (numeric_id, uuid) para luego obtener complementos
+    if fast:
+        options.page_load_strategy = 'eager'
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    service = Service(executable_path='chromedriver.exe')
+    driver = webdriver.Chrome(service=service, options=options)
+    if fast:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+    return driver
+
+def wait_for_nuxt(driver, timeout=10):
+    """Espera a que el payload de Nuxt esté disponible (no hace falta el evento load)"""
+    WebDriverWait(driver, timeout).until(
+        lambda d: d.execute_script("return !!(window.__NUXT__ && window.__NUXT__.state);"))
+
+def process_product(i, product_info, total, driver=None, http_session=None, incremental_state=None,
+                    id_registry=None):
+    """
+    Visita un producto (Chrome o HTTP según PRODUCT_FETCH_MODE) y extrae
+    producto + combinaciones + UUID. El ID numérico es el del registro si el
+    UUID ya lo tiene y si no el de la posición i; los IDs nuevos del registro
+    se asignan después, en el orden de la lista (assign_registry_id), para
+    que no dependan del orden en que terminen los workers.
+    Si se pasa incremental_state y el hash de state.product no ha cambiado,
+    se reutilizan las filas y complementos de la ejecución anterior.
+    Retorna: dict con numeric_id, uuid, content_hash, product, combinations,
+    complements (None salvo si se reutiliza) y complement_types (los del
+    __NUXT__, o None si no vienen) — o None si falla
+    """
+    product_url = product_info['url']
+    numeric_product_id = 86 + i  # Empezar desde 87 (86+1=87)
+    print(f"  [{i}/{total}] {product_url}")
     
     try:
-        # PASO 1: Obtener todas las URLs de productos
-        print("🔍 PASO 1: Obteniendo URLs de productos...")
-        service = Service(executable_path='chromedriver.exe')
-        driver = webdriver.Chrome(service=service, options=options)
+        if replaying():
+            # __NUXT__ ya proyectado, grabado con --record
+            nuxt_data = active_archive().get(NUXT, product_url)
+            page_driver = None
+        elif PRODUCT_FETCH_MODE == "http":
+            # Misma proyección que en el navegador: el hash de state.product no depende del modo
+            nuxt_data = recorded(NUXT, product_url,
+                                 lambda: project_nuxt_data(fetch_nuxt_data(product_url, http_session)))
+            page_driver = None
+        else:
+            driver.get(product_url)
+            if FAST_BROWSER:
+                wait_for_nuxt(driver)
+            else:
+                WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, "__nuxt")))
+            nuxt_data = recorded(NUXT, product_url, lambda: driver.execute_script(NUXT_PROJECTION_SCRIPT))
+            page_driver = driver
         
-        product_urls_with_context = get_all_product_urls_from_brand(driver, BRAND_URL_TO_SCRAPE)
-        print(f"✅ Se encontraron {len(product_urls_with_context)} productos")
+        # Obtener UUID del producto (usamos 'id' que es el UUID en __NUXT__)
+        try:
+            product_uuid = nuxt_data['state']['product']['product']['id']
+        except:
+            product_uuid = ''
         
-        # PASO 2: UNA SOLA VISITA - Extraer productos + combinaciones + UUIDs
-        print(f"\n🕷️ PASO 2: Procesando productos y recopilando UUIDs (1 VISITA por producto)...")
-        for i, product_info in enumerate(product_urls_with_context, 1):
-            product_url = product_info['url']
-            numeric_product_id = 86 + i  # Empezar desde 87 (86+1=87)
-            print(f"  [{i}/{len(product_urls_with_context)}] {product_url} (ID: {numeric_product_id})")
-            
-            try:
-                driver.get(product_url)
-                WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, "__nuxt")))
-                nuxt_data = driver.execute_script("return window.__NUXT__;")
-                
-                # Obtener UUID del producto (usamos 'id' que es el UUID en __NUXT__)
-                try:
-                    product_uuid = nuxt_data['state']['product']['product']['id']
-                except:
-                    product_uuid = ''
-                
-                # Guardar UUID para luego obtener complementos
-                if product_uuid:
-                    product_uuid_list.append((numeric_product_id, product_uuid))
-                
-                # Extraer datos del producto (PASAMOS driver para obtener precio visual)
-                product_data = extract_product_data(nuxt_data, numeric_product_id, driver)
-                if product_data:
-                    all_products_data.append(product_data)
-                    print(f"    ✅ Producto procesado (UUID: {product_uuid[:8]}...)")
-                else:
-                    print(f"    ⚠️  No se pudieron extraer datos del producto")
-                
-                # Extraer combinaciones
-                combinations_data = extract_combinations_data(nuxt_data, numeric_product_id)
-                if combinations_data:
-                    all_combinations_data.extend(combinations_data)
-                    print(f"    ✅ {len(combinations_data)} combinaciones extraídas")
-                
-            except Exception as e:
-                print(f"    ❌ Error: {e}")
-                continue
-            
-            time.sleep(1)  # Pausa entre productos
+        if id_registry:
+            numeric_product_id = id_registry.get(
+                PRODUCT_NAMESPACE, product_uuid or f"URL:{product_url}") or numeric_product_id
+        print(f"    🆔 [{i}] ID: {numeric_product_id}")
         
-        # PASO 3: Obtener complementos de todos los productos vía API
-        print(f"\n🔧 PASO 3: Obteniendo complementos de {len(product_uuid_list)} productos vía API...")
+        # ¿Producto sin cambios desde la última ejecución?
+        content_hash = hash_product_state(nuxt_data)
+        previous = incremental_state.lookup(product_uuid, content_hash) if incremental_state else None
+        if previous:
+            print(f"    ♻️  [{i}] Sin cambios, se reutilizan datos anteriores (UUID: {product_uuid[:8]}...)")
+            return {
+                'numeric_id': numeric_product_id,
+                'uuid': product_uuid,
+                'content_hash': content_hash,
+                'product': with_product_id([previous['product']], ProductRow, 'Product ID',
+                                           numeric_product_id)[0] if previous['product'] else None,
+                'combinations': with_product_id(previous['combinations'], CombinationRow, 'Id del Producto',
+                                                numeric_product_id),
+                'complements': previous['complements'],
+            }
         
-        unique_complements = {}
-        uuid_to_unique_key = {}
-        product_to_complement_uuids = {}
+        # Extraer datos del producto (en modo browser PASAMOS driver para obtener precio visual)
+        product_data = extract_product_data(nuxt_data, numeric_product_id, page_driver)
+        if product_data:
+            print(f"    ✅ [{i}] Producto procesado (UUID: {product_uuid[:8]}...)")
+        else:
+            print(f"    ⚠️  [{i}] No se pudieron extraer datos del producto")
         
-        from get_complementos import get_complement_types, get_complements_by_type, generate_unique_key
+        # Extraer combinaciones
+        combinations_data = extract_combinations_data(nuxt_data, numeric_product_id)
+        if combinations_data:
+            print(f"    ✅ [{i}] {len(combinations_data)} combinaciones extraídas")
         
-        for i, (numeric_id, product_uuid) in enumerate(product_uuid_list, 1):
-            print(f"  [{i}/{len(product_uuid_list)}] Producto ID {numeric_id} (UUID: {product_uuid[:8]}...)")
+        return {
+            'numeric_id': numeric_product_id,
+            'uuid': product_uuid,
+            'content_hash': content_hash,
+            'product': product_data,
+            'combinations': combinations_data,
+            'complements': None,
+            'complement_types': complement_types_from_nuxt(nuxt_data),
+        }
+    except ReplayMiss:
+        raise  # El archivo no tiene esta página: se detiene la reproducción (no es un fallo del producto)
+    except Exception as e:
+        print(f"    ❌ [{i}] Error: {e}")
+        return None
+
+def process_products_pool(product_urls_with_context, workers=PRODUCT_WORKERS, driver=None, http_session=None,
+                          incremental_state=None, id_registry=None, completed=None, on_result=None):
+    """
+    Procesa los productos con N workers alimentados desde una cola de trabajo.
+    En modo browser cada worker usa su propia sesión de Chrome (el primero
+    reutiliza `driver` si se pasa). Los resultados se devuelven en el orden
+    original de product_urls_with_context.
+    - completed: {i: resultado} ya obtenidos en una ejecución anterior (no se visitan)
+    - on_result(i, resultado): se llama desde el worker al terminar cada producto
+    Con --replay, si al archivo le falta una página se detienen todos los
+    workers y se relanza ReplayMiss.
+    """
+    total = len(product_urls_with_context)
+    completed = completed or {}
+    results = [completed.get(i) for i in range(1, total + 1)]
+    
+    work_queue = queue.Queue()
+    for i, product_info in enumerate(product_urls_with_context, 1):
+        if i not in completed:
+            work_queue.put((i, product_info))
+    
+    if work_queue.empty():
+        return results
+    workers = max(1, min(workers, work_queue.qsize()))
+    replay_errors = []
+    
+    def worker(worker_index):
+        worker_driver = None
+        owns_driver = False
+        try:
+            if PRODUCT_FETCH_MODE != "http" and not replaying():
+                if worker_index == 0 and driver is not None:
+                    worker_driver = driver
+                else:
+                    worker_driver = create_chrome_driver()
+                    owns_driver = True
             
-            try:
-                complement_types_data = get_complement_types(product_uuid)
+            while not replay_errors:
+                try:
+                    i, product_info = work_queue.get_nowait()
+                except queue.Empty:
+                    break
+                results[i - 1] = process_product(i, product_info, total, worker_driver, http_session,
+                                                 incremental_state, id_registry)
+                if on_result:
+                    on_result(i, results[i - 1])
                 
-                if not complement_types_data:
-                    continue
+                if PRODUCT_FETCH_MODE != "http":
+                    time.sleep(1)  # Pausa entre productos (solo con navegador)
+        except ReplayMiss as e:
+            replay_errors.append(e)
+        except Exception as e:
+            print(f"    ❌ Worker {worker_index} detenido: {e}")
+        finally:
+            if owns_driver:
+                worker_driver.quit()
+    
+    threads = [threading.Thread(target=worker, args=(w,), daemon=True) for w in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if replay_errors:
+        raise replay_errors[0]
+    
+    return results
+
+# ================================
+# 4. FUNCIÓN PRINCIPAL INTEGRADA
+# ================================
+def discover_product_urls(brand_url, driver=None):
+    """
+    PASO 1 para una marca. Retorna (urls, driver): el driver solo se crea si
+    hace falta el navegador y se reutiliza para el resto de marcas y el PASO 2.
+    """
+    archive = active_archive()
+    if replaying():
+        return archive.get(URLS, brand_url), driver
+    
+    driver = driver or create_chrome_driver()
+    product_urls_with_context = get_all_product_urls_from_brand(
+        driver, brand_url, driver_factory=create_chrome_driver)
+    if archive:
+        archive.put(URLS, brand_url, product_urls_with_context)
+    return product_urls_with_context, driver
+
+def collect_complements(product_uuid_list, complements_by_product):
+    """
+    Agrupa los complementos de los productos de un juego de CSVs.
+    Retorna: (unique_complements, uuid_to_unique_key, product_to_complement_uuids)
+    """
+    from get_complementos import generate_unique_key
+    
+    unique_complements = {}
+    uuid_to_unique_key = {}
+    product_to_complement_uuids = {}
+    
+    for i, (numeric_id, product_uuid) in enumerate(product_uuid_list, 1):
+        print(f"  [{i}/{len(product_uuid_list)}] Producto ID {numeric_id} (UUID: {product_uuid[:8]}...)")
+        
+        try:
+            complement_types_data = complements_by_product.get(product_uuid, [])
+            
+            if not complement_types_data:
+                continue
+            
+            product_complement_ids = []
+            
+            for comp_type, complements_list in complement_types_data:
+                comp_type_name = comp_type.get('web_name', 'Unknown')
                 
-                product_complement_ids = []
+                if complements_list:
+                    print(f"      - {comp_type_name}: {len(complements_list)} items")
                 
-                for comp_type in complement_types_data:
-                    comp_type_id = comp_type.get('id', '')
-                    comp_type_name = comp_type.get('web_name', 'Unknown')
-                    
-                    complements_list = get_complements_by_type(product_uuid, comp_type_id)
+                for complement in complements_list:
+                    unique_key, key_type = generate_unique_key(complement)
+                    comp_uuid = complement.get('id', '') or complement.get('uuid', '')
                     
-                    if complements_list:
-                        print(f"      - {comp_type_name}: {len(complements_list)} items")
+                    if unique_key not in unique_complements:
+                        unique_complements[unique_key] = complement
+                        uuid_to_unique_key[comp_uuid] = unique_key
+                    else:
+                        uuid_to_unique_key[comp_uuid] = unique_key
                     
-                    for complement in complements_list:
-                        unique_key, key_type = generate_unique_key(complement)
-                        comp_uuid = complement.get('id', '') or complement.get('uuid', '')
-                        
-                        if unique_key not in unique_complements:
-                            unique_complements[unique_key] = complement
-                            uuid_to_unique_key[comp_uuid] = unique_key
-                        else:
-                            uuid_to_unique_key[comp_uuid] = unique_key
-                        
-                        product_complement_ids.append(comp_uuid)
-                
-                if product_complement_ids:
-                    product_to_complement_uuids[product_uuid] = product_complement_ids
-                    print(f"      ✅ {len(product_complement_ids)} complementos recopilados")
-            
-            except Exception as e:
-                print(f"      ❌ Error: {e}")
+                    product_complement_ids.append(comp_uuid)
             
-            time.sleep(0.5)
+            if product_complement_ids:
+                product_to_complement_uuids[product_uuid] = product_complement_ids
+                print(f"      ✅ {len(product_complement_ids)} complementos recopilados")
         
-        print(f"\n✅ Complementos únicos obtenidos: {len(unique_complements)}")
-        
-        # PASO 4: Generar CSV de complementos
-        print(f"\n📄 PASO 4: Generando CSV de complementos...")
-        
-        complement_csv_name = None
-        key_to_prestashop_id = {}
-        
-        if unique_complements:
-            from get_complementos import generate_complements_csv
-            complement_csv_name, key_to_prestashop_id = generate_complements_csv(
-                unique_complements,
-                timestamp
-            )
-            print(f"✅ {complement_csv_name} generado con {len(unique_complements)} complementos (IDs: 136-{135+len(unique_complements)})")
+        except Exception as e:
+            print(f"      ❌ Error: {e}")
+    
+    return unique_complements, uuid_to_unique_key, product_to_complement_uuids
+
+def assign_registry_id(i, result, product_url, id_registry):
+    """
+    ID del registro para el resultado i (llamar en el orden de la lista): los
+    productos nuevos reciben su ID por posición si está libre, o el siguiente.
+    Si no coincide con el provisional de process_product se reescriben las filas.
+    """
+    numeric_product_id = id_registry.get_or_allocate(
+        PRODUCT_NAMESPACE, result['uuid'] or f"URL:{product_url}", PRODUCT_START_ID, preferred_id=86 + i)
+    if numeric_product_id != result['numeric_id']:
+        print(f"    🆔 [{i}] ID nuevo en el registro: {numeric_product_id}")
+        result['numeric_id'] = numeric_product_id
+        if result.get('product'):
+            result['product'] = with_product_id([result['product']], ProductRow, 'Product ID',
+                                                numeric_product_id)[0]
+        result['combinations'] = with_product_id(result.get('combinations') or [], CombinationRow,
+                                                 'Id del Producto', numeric_product_id)
+    return result
+
+class ResultSequencer:
+    """
+    Entrega los resultados del pool a on_result(i, resultado) en el orden
+    original aunque los workers terminen desordenados: los que llegan antes
+    de tiempo esperan (normalmente, como mucho uno por worker).
+    """
+
+    def __init__(self, on_result, first_index=1):
+        self.on_result = on_result
+        self._next = first_index
+        self._waiting = {}
+        self._lock = threading.Lock()
+
+    def add(self, i, result):
+        with self._lock:
+            self._waiting[i] = result
+            while self._next in self._waiting:
+                ready = self._waiting.pop(self._next)
+                if ready:
+                    self.on_result(self._next, ready)
+                self._next += 1
+
+    def flush(self):
+        """Entrega lo que quede (productos que no llegaron a procesarse)"""
+        with self._lock:
+            for i in sorted(self._waiting):
+                if self._waiting[i]:
+                    self.on_result(i, self._waiting[i])
+            self._waiting = {}
+
+class GroupExport:
+    """
+    Juego de CSVs de un grupo (una marca, o todas en modo "merged") que se
+    llena a medida que terminan los productos, sin acumular las filas:
+    - combinaciones: se escriben directamente en su CSV (en modo delta van a
+      un fichero temporal, porque se comparan con la foto al final)
+    - producto: a un fichero temporal compacto, hasta que el PASO 5 conoce
+      los IDs de los complementos y puede rellenar Accessories
+    """
+
+    def __init__(self, slug, run_timestamp, brands, delta=False):
+        self.slug = slug
+        self.timestamp = run_timestamp
+        self.brands = brands
+        self.product_csv_name, self.combination_csv_name, self.deactivation_csv_name = \
+            build_output_filenames(run_timestamp, slug)
+        self.product_uuid_list = []  # Lista de (numeric_id, uuid) de este juego de CSVs
+        self.product_count = 0
+        self.combination_count = 0
+        self._seen_product_ids = set()
+        self.pending_products = RowSpill()
+        if delta:
+            self.combinations = RowSpill()
         else:
-            print(f"⚠️  No se encontraron complementos para generar CSV")
+            self.combinations = PrestaShopCSVWriter(self.combination_csv_name, COMBINATION_CSV_HEADERS)
+
+    def add(self, result):
+        """
+        Pasa las filas de un resultado al grupo. Las filas se sacan del
+        resultado para que no sigan en memoria.
+        """
+        product_row = result.pop('product', None)
+        combination_rows = result.pop('combinations', None) or []
         
-        # PASO 5: Actualizar productos con Accessories
-        print(f"\n🔗 PASO 5: Actualizando productos con Accessories...")
+        # Con el registro de IDs, un mismo producto listado en varias colecciones tiene el mismo ID
+        if result['numeric_id'] in self._seen_product_ids:
+            return
+        self._seen_product_ids.add(result['numeric_id'])
+        if result['uuid']:
+            self.product_uuid_list.append((result['numeric_id'], result['uuid']))
         
-        for product_data in all_products_data:
-            numeric_id = product_data['Product ID']
-            
-            # Buscar el UUID de este producto
-            product_uuid = None
-            for pid, puuid in product_uuid_list:
-                if pid == numeric_id:
-                    product_uuid = puuid
-                    break
+        for combination_row in combination_rows:
+            if isinstance(self.combinations, RowSpill):
+                self.combinations.append(row_values(combination_row, COMBINATION_CSV_HEADERS))
+            else:
+                self.combinations.write(combination_row)
+        self.combination_count += len(combination_rows)
+        
+        if product_row:
+            self.product_count += 1
+        # Los productos nuevos o modificados se guardan en el estado incremental
+        # en el PASO 5, cuando ya se conocen sus complementos
+        new_content = result['complements'] is None
+        self.pending_products.append({
+            'uuid': result['uuid'],
+            'product': row_values(product_row, PRODUCT_CSV_HEADERS) if product_row else None,
+            'content_hash': result['content_hash'] if new_content else None,
+            'combinations': [row_values(row, COMBINATION_CSV_HEADERS) for row in combination_rows]
+                            if new_content else None,
+        })
+
+    def close(self):
+        self.pending_products.close()
+        self.combinations.close()
+
+    def discard(self):
+        """Cierra y borra los CSVs ya escritos (ejecución que no se puede completar)"""
+        self.close()
+        for filename in (self.product_csv_name, self.combination_csv_name, self.deactivation_csv_name):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+def export_group(group, complements_by_product, id_registry=None, delta_exporter=None, incremental_state=None):
+    """
+    PASOS 4-6 para un juego de CSVs (una marca, o todas en modo "merged"),
+    una vez que el grupo tiene todos sus productos (GroupExport.add).
+    Retorna un dict con los ficheros a subir en el orden obligatorio
+    (complementos → productos → combinaciones) y los totales. En modo delta
+    incluye además las filas eliminadas: la desactivación se escribe cuando
+    todos los grupos están exportados (write_deactivation_csv).
+    """
+    brand_slug = group.slug
+    run_timestamp = group.timestamp
+    product_csv_name = group.product_csv_name
+    combination_csv_name = group.combination_csv_name
+    deactivation_csv_name = group.deactivation_csv_name
+    product_uuid_list = group.product_uuid_list
+    
+    # Las combinaciones ya están escritas (salvo en modo delta, que las compara en el PASO 6)
+    if isinstance(group.combinations, PrestaShopCSVWriter):
+        group.combinations.close()
+    
+    print(f"\n🧩 [{brand_slug}] Complementos de {len(product_uuid_list)} productos...")
+    unique_complements, uuid_to_unique_key, product_to_complement_uuids = collect_complements(
+        product_uuid_list, complements_by_product)
+    print(f"\n✅ Complementos únicos obtenidos: {len(unique_complements)}")
+    
+    # PASO 4: Generar CSV de complementos
+    print(f"\n📄 PASO 4 [{brand_slug}]: Generando CSV de complementos...")
+    
+    complement_csv_name = None
+    key_to_prestashop_id = {}
+    all_complements_data = []
+    
+    if unique_complements and delta_exporter:
+        # En modo delta el CSV de complementos se escribe en el PASO 6 (solo cambios)
+        from get_complementos import build_complements_rows
+        all_complements_data, key_to_prestashop_id = build_complements_rows(unique_complements, id_registry)
+        print(f"✅ {len(all_complements_data)} complementos preparados "
+              f"(IDs: {min(key_to_prestashop_id.values())}-{max(key_to_prestashop_id.values())})")
+    elif unique_complements:
+        from get_complementos import generate_complements_csv
+        complement_csv_name, key_to_prestashop_id = generate_complements_csv(
+            unique_complements,
+            run_timestamp,
+            id_registry,
+            brand_slug
+        )
+        print(f"✅ {complement_csv_name} generado con {len(unique_complements)} complementos "
+              f"(IDs: {min(key_to_prestashop_id.values())}-{max(key_to_prestashop_id.values())})")
+    else:
+        print(f"⚠️  No se encontraron complementos para generar CSV")
+    
+    # PASO 5: Actualizar productos con Accessories (al releerlos del fichero temporal)
+    print(f"\n🔗 PASO 5 [{brand_slug}]: Actualizando productos con Accessories...")
+    
+    def finished_products():
+        for pending in group.pending_products:
+            product_uuid = pending['uuid']
             
-            if not product_uuid:
-                continue
+            if incremental_state and pending['content_hash'] and product_uuid in complements_by_product:
+                # Guardar el estado del producto para la próxima ejecución (no si falló la
+                # descarga de sus complementos: se guardaría como "sin complementos")
+                incremental_state.save(product_uuid, pending['content_hash'], pending['product'],
+                                       pending['combinations'], complements_by_product.get(product_uuid, []))
             
-            # Obtener complementos de este producto
-            comp_uuids = product_to_complement_uuids.get(product_uuid, [])
-            if not comp_uuids:
+            if not pending['product']:
                 continue
+            product_row = ProductRow(pending['product'])
             
-            # Mapear UUIDs a IDs de PrestaShop
+            # Mapear los complementos de este producto a IDs de PrestaShop
             prestashop_ids = []
-            for comp_uuid in comp_uuids:
+            for comp_uuid in product_to_complement_uuids.get(product_uuid, []) if product_uuid else []:
                 unique_key = uuid_to_unique_key.get(comp_uuid)
                 if unique_key:
                     ps_id = key_to_prestashop_id.get(unique_key)
@@ -629,73 +913,363 @@ def main():
             
             # Actualizar el campo Accessories
             if prestashop_ids:
-                product_data['Acessories  (x,y,z...)'] = ",".join(prestashop_ids)
-                print(f"  • Producto ID {numeric_id} → {len(prestashop_ids)} accesorios")
-        
-        # PASO 6: Generar CSVs de productos y combinaciones
-        print(f"\n📄 PASO 6: Generando CSVs de productos y combinaciones...")
-        
-        if all_products_data:
-            with open(PRODUCT_OUTPUT_FILENAME, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=PRODUCT_CSV_HEADERS, delimiter=';', quoting=csv.QUOTE_NONNUMERIC)
-                writer.writeheader()
-                writer.writerows(all_products_data)
-            print(f"✅ {PRODUCT_OUTPUT_FILENAME} generado ({len(all_products_data)} productos)")
-        
-        if all_combinations_data:
-            with open(COMBINATION_OUTPUT_FILENAME, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=COMBINATION_CSV_HEADERS, delimiter=';', quoting=csv.QUOTE_NONNUMERIC)
-                writer.writeheader()
-                writer.writerows(all_combinations_data)
-            print(f"✅ {COMBINATION_OUTPUT_FILENAME} generado ({len(all_combinations_data)} combinaciones)")
+                product_row['Acessories  (x,y,z...)'] = ",".join(prestashop_ids)
+                print(f"  • Producto ID {product_row['Product ID']} → {len(prestashop_ids)} accesorios")
+            yield product_row
+    
+    # PASO 6: Generar CSVs de productos y combinaciones
+    print(f"\n📄 PASO 6 [{brand_slug}]: Generando CSVs de productos y combinaciones (modo {EXPORT_MODE})...")
+    
+    product_rows_written = 0
+    combination_rows_written = group.combination_count
+    removed_complements, removed_products = [], []
+    
+    if delta_exporter:
+        # Una foto por marca (o por lote en modo "merged")
+        # La foto guarda las filas como dict (el mismo hash que en versiones anteriores)
+        complement_rows, removed_complements = delta_exporter.diff(
+            f'{brand_slug}:complements', [row.to_dict() for row in all_complements_data], 'Product ID')
+        product_rows, removed_products = delta_exporter.diff(
+            f'{brand_slug}:products', (row.to_dict() for row in finished_products()), 'Product ID')
+        combination_rows, _ = delta_exporter.diff(
+            f'{brand_slug}:combinations', (CombinationRow(values).to_dict() for values in group.combinations),
+            'Id del Producto', grouped=True)
+        
+        print(f"  • Complementos: {len(complement_rows)}/{len(all_complements_data)} con cambios")
+        print(f"  • Productos: {len(product_rows)}/{group.product_count} con cambios")
+        print(f"  • Combinaciones: {len(combination_rows)}/{group.combination_count} con cambios")
+        print(f"  • Eliminados: {len(removed_products)} productos y {len(removed_complements)} complementos")
+        
+        if complement_rows:
+            complement_csv_name = f'{run_timestamp}-{brand_slug}-complements_import.csv'
+            write_prestashop_csv(complement_csv_name, complement_rows, PRODUCT_CSV_HEADERS)
+            print(f"✅ {complement_csv_name} generado ({len(complement_rows)} complementos)")
+        if product_rows:
+            write_prestashop_csv(product_csv_name, product_rows, PRODUCT_CSV_HEADERS)
+        if combination_rows:
+            write_prestashop_csv(combination_csv_name, combination_rows, COMBINATION_CSV_HEADERS)
+        product_rows_written = len(product_rows)
+        combination_rows_written = len(combination_rows)
+    else:
+        with PrestaShopCSVWriter(product_csv_name, PRODUCT_CSV_HEADERS) as writer:
+            writer.write_rows(finished_products())
+        product_rows_written = writer.count
+    group.close()
+    
+    if product_rows_written:
+        print(f"✅ {product_csv_name} generado ({product_rows_written} productos)")
+    if combination_rows_written:
+        print(f"✅ {combination_csv_name} generado ({combination_rows_written} combinaciones)")
+    
+    # Orden obligatorio: complementos → productos (con referencias a complementos)
+    # → combinaciones → (modo delta, write_deactivation_csv) productos que ya no existen
+    files = []
+    if complement_csv_name and os.path.exists(complement_csv_name):
+        files.append(complement_csv_name)
+    if product_rows_written:
+        files.append(product_csv_name)
+    if combination_rows_written:
+        files.append(combination_csv_name)
+    
+    return {
+        'files': files,
+        'complements': len(unique_complements),
+        'products': group.product_count,
+        'combinations': group.combination_count,
+        'deactivation_csv_name': deactivation_csv_name,
+        'removed_products': removed_products,
+        'removed_complements': removed_complements,
+    }
+
+def write_deactivation_csv(export, complement_ids_in_use):
+    """
+    Modo delta, con todos los grupos ya exportados: CSV de desactivación con
+    los productos eliminados del grupo y sus complementos eliminados que
+    ninguna marca sigue usando. Los IDs de complementos son globales (registro
+    de IDs): uno que deja de listar una marca puede seguir en los Accessories
+    de otra.
+    """
+    removed_complements = [row for row in export['removed_complements']
+                           if str(row['Product ID']) not in complement_ids_in_use]
+    kept = len(export['removed_complements']) - len(removed_complements)
+    deactivation_rows = DeltaExporter.deactivation_rows(removed_complements + export['removed_products'])
+    if kept:
+        print(f"  ♻️  [{export['slug']}] {kept} complementos eliminados siguen activos (los usa otra marca)")
+    if deactivation_rows:
+        deactivation_csv_name = export['deactivation_csv_name']
+        write_prestashop_csv(deactivation_csv_name, deactivation_rows, PRODUCT_CSV_HEADERS)
+        export['files'].append(deactivation_csv_name)
+        print(f"✅ {deactivation_csv_name} generado ({len(deactivation_rows)} productos a desactivar)")
+
+def main(brand_urls=None, record_path=None, replay_path=None):
+    """
+    brand_urls: lista de URLs de marca (por defecto BRAND_URLS_TO_SCRAPE, o
+    BRAND_URL_TO_SCRAPE si está vacía). Todas las marcas comparten los
+    workers del PASO 2, la descarga de complementos y la sesión FTP.
+    record_path: graba en ese archivo las URLs, los __NUXT__ y las respuestas
+    de la API de la ejecución (ver replay_archive.py).
+    replay_path: regenera los CSVs desde un archivo grabado, sin red, sin
+    Chrome y sin subir al FTP (por defecto, las marcas grabadas).
+    """
+    # Al grabar o reproducir se procesa todo desde cero: sin reanudar ni reutilizar
+    # productos sin cambios, para que todas las entradas pasen por el archivo
+    archive = None
+    if replay_path:
+        archive = ReplayArchive(replay_path, replay=True)
+        print(f"📼 Reproduciendo {replay_path}: {archive.stats}")
+    elif record_path:
+        archive = ReplayArchive(record_path)
+        print(f"📼 Grabando la ejecución en {record_path}")
+    activate(archive)
+    
+    brand_urls = list(brand_urls or (archive.brand_urls() if replay_path else None)
+                      or BRAND_URLS_TO_SCRAPE or [BRAND_URL_TO_SCRAPE])
+    print(f"🚀 INICIANDO: Scraper {len(brand_urls)} marca(s) + PrestaShop + FTP")
+    print("=" * 50)
+    
+    driver = None
+    incremental_state = IncrementalState() if INCREMENTAL_MODE and not archive else None
+    id_registry = IdRegistry() if ID_REGISTRY_ENABLED else None
+    delta_exporter = DeltaExporter() if EXPORT_MODE == "delta" and not replay_path else None
+    groups = []
+    
+    # Un journal por marca: cada una se reanuda por separado, con su propio
+    # timestamp y nombres de fichero de la ejecución interrumpida
+    brands = []
+    for brand_url in brand_urls:
+        journal = RunJournal(brand_url, timestamp) if CHECKPOINT_ENABLED and not archive else None
+        brand = {
+            'url': brand_url,
+            'slug': brand_slug_from_url(brand_url),
+            'journal': journal,
+            'timestamp': journal.timestamp if journal else timestamp,
+        }
+        if journal and journal.resumed:
+            print(f"♻️  [{brand['slug']}] Reanudando ejecución {brand['timestamp']}: {len(journal.products)} productos, "
+                  f"{len(journal.complements)} complementos y {len(journal.uploaded)} subidas ya completados")
+        elif journal and journal.expired:
+            print(f"⚠️  [{brand['slug']}] La ejecución sin terminar tiene más de {CHECKPOINT_MAX_AGE // 3600} h: "
+                  f"se descarta y se empieza de cero (los precios se vuelven a leer)")
+        brands.append(brand)
+    
+    try:
+        # PASO 1: Obtener todas las URLs de productos
+        print("🔍 PASO 1: Obteniendo URLs de productos...")
+        for brand in brands:
+            journal = brand['journal']
+            if journal and journal.urls is not None:
+                brand['urls'] = journal.urls
+                print(f"♻️  [{brand['slug']}] URLs recuperadas del checkpoint")
+            else:
+                brand['urls'], driver = discover_product_urls(brand['url'], driver)
+                if journal:
+                    journal.record_urls(brand['urls'])
+            print(f"✅ [{brand['slug']}] Se encontraron {len(brand['urls'])} productos")
+        
+        # PASO 2: UNA SOLA VISITA - Extraer productos + combinaciones + UUIDs
+        # Un único pool para todas las marcas; cada producto se anota en el journal de su marca
+        product_urls_with_context = []
+        completed = {}
+        index_to_brand = {}
+        for brand in brands:
+            offset = len(product_urls_with_context)
+            brand['offset'] = offset
+            product_urls_with_context.extend(brand['urls'])
+            for local_index in range(1, len(brand['urls']) + 1):
+                index_to_brand[offset + local_index] = brand
+            if brand['journal']:
+                completed.update({offset + i: result for i, result in brand['journal'].products.items()})
+        
+        # Juegos de CSVs: uno por marca, o uno solo para todo el lote
+        merge_outputs = BATCH_OUTPUT_MODE == "merged"
+        if len(brands) > 1 and not merge_outputs and not id_registry:
+            # Sin registro los IDs de complementos son consecutivos por CSV y chocarían entre marcas
+            print("⚠️  Sin registro de IDs los CSVs por marca compartirían IDs de complementos: se genera un único juego")
+            merge_outputs = True
+        if merge_outputs and len(brands) > 1:
+            groups.append(GroupExport(MERGED_OUTPUT_SLUG, brands[0]['timestamp'], brands, delta_exporter is not None))
+            for brand in brands:
+                brand['group'] = groups[0]
+        else:
+            for brand in brands:
+                brand['group'] = GroupExport(brand['slug'], brand['timestamp'], [brand], delta_exporter is not None)
+                groups.append(brand['group'])
+        
+        # Las filas de cada producto pasan a su juego de CSVs en cuanto termina,
+        # en el orden original (las combinaciones ya quedan escritas en disco)
+        def add_to_group(i, result):
+            if id_registry:
+                assign_registry_id(i, result, product_urls_with_context[i - 1]['url'], id_registry)
+            index_to_brand[i]['group'].add(result)
+        
+        sequencer = ResultSequencer(add_to_group)
+        
+        # PASO 3 solapado con el PASO 2: los complementos de cada producto se piden en cuanto
+        # se conoce su UUID, por lotes, mientras los workers siguen visitando páginas
+        from get_complementos import API_MAX_CONCURRENCY
+        
+        complements_by_product = {}
+        for brand in brands:
+            journal = brand['journal']
+            if journal and journal.complements:
+                complements_by_product.update(journal.complements)
+                print(f"  ♻️  [{brand['slug']}] Complementos de {len(journal.complements)} productos "
+                      f"recuperados del checkpoint")
+        complement_stage = ComplementPipeline(complements_by_product, COMPLEMENT_CHECKPOINT_BATCH,
+                                              API_MAX_CONCURRENCY).start()
+        
+        def send_to_complement_stage(i, result):
+            if not result or not result['uuid']:
+                return
+            if result['complements'] is not None:
+                # Producto sin cambios: se reutilizan los complementos de la ejecución anterior
+                complements_by_product.setdefault(result['uuid'], result['complements'])
+            else:
+                complement_stage.submit(result['uuid'], result.get('complement_types'),
+                                        index_to_brand[i]['journal'])
+        
+        def record_product(i, result):
+            brand = index_to_brand[i]
+            if brand['journal']:
+                brand['journal'].record_product(i - brand['offset'], result)
+            send_to_complement_stage(i, result)
+            sequencer.add(i, result)
+        
+        # Productos ya extraídos antes de la interrupción: sus complementos pueden empezar ya
+        for i, result in sorted(completed.items()):
+            send_to_complement_stage(i, result)
+            sequencer.add(i, result)
+        
+        print(f"\n🕷️ PASO 2 + 🔧 PASO 3: Procesando productos y obteniendo sus complementos vía API "
+              f"(1 VISITA por producto, modo {PRODUCT_FETCH_MODE}, {PRODUCT_WORKERS} workers)...")
+        http_session = create_http_session(max(PRODUCT_WORKERS, 10)) if PRODUCT_FETCH_MODE == "http" else None
+        try:
+            results = process_products_pool(product_urls_with_context, PRODUCT_WORKERS, driver, http_session,
+                                            incremental_state, id_registry,
+                                            completed=completed, on_result=record_product)
+        finally:
+            # Esperar a los lotes pendientes (y relanzar el error de la API si lo hubo)
+            complement_stage.close()
+        sequencer.flush()
+        results = [result for result in results if result]
+        
+        stats = complement_stage.stats
+        reused = sum(1 for result in results if result['complements'] is not None)
+        print(f"\n✅ Complementos: {stats['products']} productos consultados en {stats['batches']} lotes "
+              f"({stats['type_requests']} llamadas a complement_types, {stats['list_requests']} a complements), "
+              f"{reused} sin cambios")
+        if stats['failed']:
+            print(f"⚠️  {stats['failed']} productos sin complementos por fallos de la API "
+                  f"(no se guardan: se volverán a pedir en la próxima ejecución)")
+        
+        # PASOS 4-6: completar cada juego de CSVs (el estado incremental de los
+        # productos nuevos o modificados se guarda al cerrar sus filas)
+        exports = [dict(export_group(group, complements_by_product, id_registry, delta_exporter, incremental_state),
+                        slug=group.slug, brands=group.brands)
+                   for group in groups]
+        if delta_exporter:
+            # Complementos en uso por alguna marca: las de esta ejecución y, del resto, lo último subido
+            complement_ids_in_use = delta_exporter.keys_in_use(':complements')
+            for export in exports:
+                write_deactivation_csv(export, complement_ids_in_use)
         
         # PASO 7: Subir a FTP en el orden correcto
         print(f"\n📤 PASO 7: Subiendo archivos al FTP...")
-        config = leer_configuracion_ftp("ftp_config.txt")
+        config = None if replay_path else leer_configuracion_ftp("ftp_config.txt")
         
         if config:
-            # 1. Primero complementos
-            if complement_csv_name and os.path.exists(complement_csv_name):
-                print(f"  📤 Subiendo {complement_csv_name}...")
-                subir_archivo_ftp(complement_csv_name, config.get("servidor"), 
-                                config.get("usuario"), config.get("contraseña"), 
-                                config.get("ruta_remota", "/"))
+            pending_uploads = []
+            file_to_journals = {}
+            for export in exports:
+                journals = [brand['journal'] for brand in export['brands'] if brand['journal']]
+                for filename in export['files']:
+                    if journals and all(filename in journal.uploaded for journal in journals):
+                        print(f"  ♻️  {filename} ya se subió antes de la interrupción")
+                        continue
+                    pending_uploads.append(filename)
+                    file_to_journals[filename] = journals
             
-            # 2. Luego productos (con referencias a complementos)
-            if all_products_data:
-                print(f"  📤 Subiendo {PRODUCT_OUTPUT_FILENAME}...")
-                subir_archivo_ftp(PRODUCT_OUTPUT_FILENAME, config.get("servidor"), 
-                                config.get("usuario"), config.get("contraseña"), 
-                                config.get("ruta_remota", "/"))
+            def record_upload(filename):
+                for journal in file_to_journals.get(filename, []):
+                    journal.record_upload(filename)
             
-            # 3. Finalmente combinaciones
-            if all_combinations_data:
-                print(f"  📤 Subiendo {COMBINATION_OUTPUT_FILENAME}...")
-                subir_archivo_ftp(COMBINATION_OUTPUT_FILENAME, config.get("servidor"), 
-                                config.get("usuario"), config.get("contraseña"), 
-                                config.get("ruta_remota", "/"))
+            # Una sola sesión autenticada para todos los ficheros de todas las marcas
+            with FTPUploader.from_config(config, parallel=FTP_PARALLEL_UPLOADS,
+                                        skip_unchanged=FTP_SKIP_UNCHANGED) as uploader:
+                uploads_ok = uploader.subir_archivos(pending_uploads, on_uploaded=record_upload)
+            
+            # La foto del delta solo avanza si todo se subió bien
+            if delta_exporter and uploads_ok:
+                delta_exporter.commit()
             
             print(f"\n🎉 PROCESO COMPLETADO!")
-            print(f"   • {len(unique_complements)} complementos")
-            print(f"   • {len(all_products_data)} productos")
-            print(f"   • {len(all_combinations_data)} combinaciones")
-            print(f"   Todos los archivos subidos al FTP correctamente!")
+            for export in exports:
+                print(f"   [{export['slug']}]")
+                print(f"   • {export['complements']} complementos")
+                print(f"   • {export['products']} productos")
+                print(f"   • {export['combinations']} combinaciones")
+            if uploads_ok:
+                print(f"   Todos los archivos subidos al FTP correctamente!")
+            else:
+                print(f"   ⚠️  Algunos archivos no se pudieron subir al FTP (se reintentarán en la próxima ejecución)")
         else:
-            print(f"\n⚠️ Archivos generados pero sin configuración FTP.")
+            if replay_path:
+                print(f"\n📼 Reproducción: no se sube nada al FTP.")
+            else:
+                print(f"\n⚠️ Archivos generados pero sin configuración FTP.")
             print(f"📄 Archivos disponibles localmente:")
-            if complement_csv_name:
-                print(f"   • {complement_csv_name}")
-            print(f"   • {PRODUCT_OUTPUT_FILENAME}")
-            print(f"   • {COMBINATION_OUTPUT_FILENAME}")
+            for export in exports:
+                for filename in export['files']:
+                    print(f"   • {filename}")
+            uploads_ok = True
+        
+        # Ejecución completa: la próxima empieza de cero
+        if uploads_ok:
+            for brand in brands:
+                if brand['journal']:
+                    brand['journal'].finish()
     
+    except ReplayMiss as e:
+        # Archivo incompleto o de otras marcas: unos CSVs a medias no servirían para comparar
+        print(f"❌ 📼 Reproducción detenida: {e.args[0]}")
+        print(f"   El archivo está incompleto o no corresponde a esta ejecución; no se generan CSVs")
+        for group in groups:
+            group.discard()
+        raise
     except Exception as e:
         print(f"❌ Error en el proceso: {e}")
         import traceback
         traceback.print_exc()
     finally:
+        for group in groups:
+            group.close()
+        if delta_exporter:
+            delta_exporter.close()
+        if incremental_state:
+            incremental_state.close()
+        if id_registry:
+            id_registry.close()
         if driver:
             driver.quit()
-            print("\n👋 Scraper finalizado.")
+        if archive:
+            archive.close()
+            activate(None)
+            if record_path:
+                print(f"📼 Grabado en {record_path}: {archive.stats}")
+        print("\n👋 Scraper finalizado.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # python royo_prestashop_ftp.py [URL_MARCA ...] [--record ARCHIVO | --replay ARCHIVO]
+    parser = argparse.ArgumentParser(description="Scraper de marcas → CSVs PrestaShop → FTP")
+    parser.add_argument('brand_urls', nargs='*', metavar='URL_MARCA',
+                        help="URLs de marca (por defecto BRAND_URLS_TO_SCRAPE / BRAND_URL_TO_SCRAPE)")
+    replay_group = parser.add_mutually_exclusive_group()
+    replay_group.add_argument('--record', metavar='ARCHIVO',
+                              help="grabar las páginas y respuestas de la API en ARCHIVO (.jsonl.gz)")
+    replay_group.add_argument('--replay', metavar='ARCHIVO',
+                              help="regenerar los CSVs desde ARCHIVO, sin red, sin Chrome y sin FTP")
+    args = parser.parse_args()
+    try:
+        main(args.brand_urls, record_path=args.record, replay_path=args.replay)
+    except ReplayMiss:
+        sys.exit(1)
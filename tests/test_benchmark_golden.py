@@ -0,0 +1,23 @@
+import csv
+import os
+
+import benchmark
+
+PRICE_COLUMNS = ('Price tax excluded', 'On sale (0/1)', 'Discount amount', 'Discount percent')
+
+
+def test_current_output_matches_original_golden_csvs():
+    assert benchmark.check_golden() == {kind: True for kind in benchmark.GOLDEN_OUTPUT_CSV}
+
+
+def test_golden_prices_are_the_recorded_web_prices():
+    """El precio de referencia es el que se grabó del navegador, no uno deducido del __NUXT__"""
+    with open(os.path.join(benchmark.BASE_DIR, benchmark.GOLDEN_CSV['products']), encoding='utf-8', newline='') as f:
+        recorded = {row['URL rewritten']: row for row in csv.DictReader(f, delimiter=';')}
+    with open(os.path.join(benchmark.GOLDEN_OUTPUT_DIR, benchmark.GOLDEN_OUTPUT_CSV['products']),
+              encoding='utf-8', newline='') as f:
+        golden = list(csv.DictReader(f, delimiter=';'))
+    assert golden
+    for row in golden:
+        for column in PRICE_COLUMNS:
+            assert row[column] == recorded[row['URL rewritten']][column]
@@ -0,0 +1,34 @@
+import json
+from datetime import datetime, timedelta
+
+from checkpoint import RunJournal
+
+BRAND_URL = 'https://www.todomueblesdebano.com/marcas/royo/'
+
+
+def interrupted_journal(directory, started_at):
+    journal = RunJournal(BRAND_URL, '20250101000000', str(directory))
+    journal.record_product(1, {'uuid': 'uuid-1', 'complements': None})
+    with open(journal.path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    records[0]['started_at'] = started_at.isoformat()
+    with open(journal.path, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(record) + '\n' for record in records)
+
+
+def test_recent_unfinished_run_is_resumed(tmp_path):
+    interrupted_journal(tmp_path, datetime.now() - timedelta(minutes=30))
+    journal = RunJournal(BRAND_URL, '20250102000000', str(tmp_path), max_age=3600)
+    assert journal.resumed and not journal.expired
+    assert journal.timestamp == '20250101000000'
+    assert list(journal.products) == [1]
+
+
+def test_old_unfinished_run_starts_over(tmp_path):
+    interrupted_journal(tmp_path, datetime.now() - timedelta(hours=2))
+    journal = RunJournal(BRAND_URL, '20250102000000', str(tmp_path), max_age=3600)
+    assert journal.expired and not journal.resumed
+    assert journal.timestamp == '20250102000000'
+    assert journal.products == {}
+    # El journal nuevo sustituye al caducado
+    assert not RunJournal(BRAND_URL, '20250103000000', str(tmp_path), max_age=3600).expired
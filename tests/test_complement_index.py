@@ -0,0 +1,85 @@
+import complement_index
+from complement_index import ComplementIndex, ComplementPipeline
+
+TYPES = [{'id': 't1', 'web_name': 'Espejos'}, {'id': 't2', 'web_name': 'Grifos'}]
+
+
+def fake_api(monkeypatch, failing_lists=(), failing_types=()):
+    """API simulada: las llamadas de los productos/pares indicados fallan (None)"""
+    def get_complement_types(product_uuid, session=None):
+        return None if product_uuid in failing_types else TYPES
+
+    def get_complements_by_type(product_uuid, type_id, session=None):
+        if (product_uuid, type_id) in failing_lists:
+            return None
+        return [] if type_id == 't2' else [{'id': f'{product_uuid}-{type_id}', 'ref': 'R1'}]
+
+    monkeypatch.setattr(complement_index, 'get_complement_types', get_complement_types)
+    monkeypatch.setattr(complement_index, 'get_complements_by_type', get_complements_by_type)
+
+
+def test_failed_list_is_not_reported_as_empty(monkeypatch):
+    fake_api(monkeypatch, failing_lists={('a', 't1')})
+    index = ComplementIndex()
+    index.add_product('a', TYPES)
+    index.add_product('b', TYPES)
+    results = index.fetch(session=object()).results()
+
+    assert index.failed == {'a'}
+    assert 'a' not in results
+    # Lista vacía de verdad: se conserva como tal
+    assert results['b'] == [(TYPES[0], [{'id': 'b-t1', 'ref': 'R1'}]), (TYPES[1], [])]
+
+
+def test_failed_complement_types(monkeypatch):
+    fake_api(monkeypatch, failing_types={'a'})
+    index = ComplementIndex()
+    index.add_product('a')
+    index.add_product('b')
+    results = index.fetch(session=object()).results()
+
+    assert index.failed == {'a'}
+    assert set(results) == {'b'}
+    assert index.stats['failed'] == 1
+
+
+class FakeJournal:
+    def __init__(self):
+        self.complements = {}
+
+    def record_complements(self, complements_by_product):
+        self.complements.update(complements_by_product)
+
+
+def test_pipeline_does_not_keep_failed_products(monkeypatch):
+    fake_api(monkeypatch, failing_lists={('a', 't2')})
+    monkeypatch.setattr(complement_index, 'get_api_session', lambda: object())
+    complements_by_product = {}
+    journal = FakeJournal()
+    pipeline = ComplementPipeline(complements_by_product, batch_size=2).start()
+    pipeline.submit('a', TYPES, journal)
+    pipeline.submit('b', TYPES, journal)
+    pipeline.close()
+
+    assert set(complements_by_product) == {'b'}
+    assert set(journal.complements) == {'b'}
+    assert pipeline.stats['failed'] == 1
+    # Un producto fallido se puede volver a enviar
+    fake_api(monkeypatch)
+    pipeline = ComplementPipeline(complements_by_product, batch_size=1).start()
+    pipeline.submit('a', TYPES, journal)
+    pipeline.close()
+    assert set(complements_by_product) == {'a', 'b'}
+
+
+def test_one_request_per_product_and_type(monkeypatch):
+    fake_api(monkeypatch)
+    index = ComplementIndex()
+    for product_uuid in ('a', 'b', 'a'):  # 'a' listado en dos colecciones
+        index.add_product(product_uuid, TYPES)
+    results = index.fetch(session=object()).results()
+
+    assert index.stats['list_requests'] == 4
+    # La lista vacía de 't2' es la misma para los dos productos: se guarda una vez
+    assert index.stats['distinct_lists'] == 3
+    assert results['a'] == [(TYPES[0], [{'id': 'a-t1', 'ref': 'R1'}]), (TYPES[1], [])]
@@ -0,0 +1,96 @@
+import copy
+import csv
+import glob
+import json
+import os
+
+import pytest
+
+import get_complementos
+import royo_prestashop_ftp as scraper
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BRAND_URLS = ['https://www.todomueblesdebano.com/marcas/royo/',
+              'https://www.todomueblesdebano.com/marcas/otra/']
+
+
+def complement(ref, name):
+    return {'id': f'uuid-{ref}', 'name': name, 'ref': ref, 'price': 1000, 'pvp_supplier': 2000}
+
+
+class FakeUploader:
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        return cls()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def subir_archivos(self, archivos, on_uploaded=None):
+        return True
+
+
+@pytest.fixture
+def delta_run(tmp_path, monkeypatch):
+    """main() en modo delta sin red; offered[marca] = complementos de sus productos"""
+    with open(os.path.join(REPO_DIR, 'nuxt_data.json'), encoding='utf-8') as f:
+        nuxt_data = json.load(f)
+    offered = {}
+
+    def fetch_nuxt_data(product_url, session=None):
+        data = copy.deepcopy(nuxt_data)
+        data['state']['product']['product']['id'] = product_url.rsplit('/', 1)[1].replace('.html', '')
+        data['state']['product']['configuration']['options'].pop('complement_types', None)
+        return data
+
+    def fetch_api_json(url, params, session=None):
+        if url.endswith('complement_types/'):
+            return 200, {'complement_types': [{'id': 't1', 'web_name': 'Espejos'}]}
+        brand = url.split('/products/')[1].split('-')[0]
+        return 200, offered[brand]
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scraper, 'EXPORT_MODE', 'delta')
+    monkeypatch.setattr(scraper, 'INCREMENTAL_MODE', False)
+    monkeypatch.setattr(scraper, 'CHECKPOINT_ENABLED', False)
+    monkeypatch.setattr(scraper, 'create_chrome_driver', lambda fast=None: None)
+    monkeypatch.setattr(scraper, 'get_all_product_urls_from_brand', lambda driver, brand_url, **kwargs: [
+        {'marca': scraper.brand_slug_from_url(brand_url), 'coleccion': 'Colección',
+         'url': f'https://www.todomueblesdebano.com/{scraper.brand_slug_from_url(brand_url)}-1.html'}])
+    monkeypatch.setattr(scraper, 'fetch_nuxt_data', fetch_nuxt_data)
+    monkeypatch.setattr(scraper, 'leer_configuracion_ftp', lambda filename: {'servidor': 'ftp.prueba'})
+    monkeypatch.setattr(scraper, 'FTPUploader', FakeUploader)
+    monkeypatch.setattr(get_complementos, '_fetch_api_json', fetch_api_json)
+
+    def run(run_timestamp):
+        monkeypatch.setattr(scraper, 'timestamp', run_timestamp)
+        scraper.main(BRAND_URLS)
+    return offered, run
+
+
+def deactivated_names(pattern):
+    names = []
+    for filename in glob.glob(pattern):
+        with open(filename, encoding='utf-8', newline='') as f:
+            names.extend(row['Name *'] for row in csv.DictReader(f, delimiter=';'))
+    return names
+
+
+def test_complement_kept_active_while_another_brand_uses_it(delta_run):
+    offered, run = delta_run
+    offered['royo'] = [complement('SHARED', 'Espejo SHARED'), complement('R1', 'Espejo royo')]
+    offered['otra'] = [complement('SHARED', 'Espejo SHARED')]
+    run('20250101000000')
+
+    # Royo deja de listar el compartido y su propio espejo
+    offered['royo'] = []
+    run('20250102000000')
+    assert deactivated_names('20250102000000-royo-products_deactivate.csv') == ['Espejo royo']
+
+    # Cuando ninguna marca lo usa, se desactiva
+    offered['otra'] = []
+    run('20250103000000')
+    assert deactivated_names('20250103000000-otra-products_deactivate.csv') == ['Espejo SHARED']
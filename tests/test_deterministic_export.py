@@ -0,0 +1,62 @@
+"""
+Las filas deben salir idénticas en cada ejecución del intérprete: el modo
+delta (row_hash) y el manifiesto del FTP comparan contra ejecuciones anteriores.
+"""
+import json
+import os
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXPORT_SCRIPT = r'''
+import json, sys
+sys.path.insert(0, sys.argv[1])
+from delta_export import DeltaExporter, row_hash
+from royo_prestashop_ftp import extract_product_data, extract_combinations_data
+from get_complementos import convert_complement_to_prestashop_format
+from prestashop_rows import CombinationRow
+
+with open(sys.argv[1] + '/nuxt_data.json', encoding='utf-8') as f:
+    nuxt_data = json.load(f)
+products = [extract_product_data(nuxt_data, 87).to_dict()]
+combinations = [row.to_dict() for row in extract_combinations_data(nuxt_data, 87)]
+complements = [
+    convert_complement_to_prestashop_format({
+        'name': f'Grifo de lavabo Imex {i}', 'ref': f'BDD0{i}', 'brand': 'IMEX', 'price': 6800 + i,
+        'pvp_supplier': 9000, 'web_discount': 26, 'complement_type': {'name': 'Grifos compatibles'},
+    }, 136 + i).to_dict()
+    for i in range(3)
+]
+
+exporter = DeltaExporter(sys.argv[2])
+changed = {
+    'products': len(exporter.diff('products', products, 'Product ID')[0]),
+    'complements': len(exporter.diff('complements', complements, 'Product ID')[0]),
+    'combinations': len(exporter.diff('combinations', combinations, 'Id del Producto', grouped=True)[0]),
+}
+exporter.commit()
+exporter.close()
+print(json.dumps({
+    'hashes': [row_hash(row) for row in products + complements] + [row_hash(combinations)],
+    'changed': changed,
+}))
+'''
+
+
+def run_export(seed, snapshot_path):
+    env = dict(os.environ, PYTHONHASHSEED=str(seed))
+    completed = subprocess.run([sys.executable, '-c', EXPORT_SCRIPT, REPO, snapshot_path],
+                               cwd=os.path.dirname(snapshot_path), env=env,
+                               capture_output=True, text=True, encoding='utf-8', check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def test_rows_hash_the_same_under_different_hash_seeds(tmp_path):
+    snapshot_path = str(tmp_path / 'delta_snapshot.sqlite')
+    first = run_export(1, snapshot_path)
+    second = run_export(2, snapshot_path)
+
+    assert first['hashes'] == second['hashes']
+    # Misma entrada, otra semilla: el delta no ve ningún cambio
+    assert second['changed'] == {'products': 0, 'complements': 0, 'combinations': 0}
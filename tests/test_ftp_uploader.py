@@ -0,0 +1,47 @@
+from ftplib import error_perm
+
+import pytest
+
+from ftp_uploader import FTPUploader, BACKUP_SUFFIX
+
+
+class NoOverwriteFTP:
+    """Servidor que no permite RNTO sobre un fichero existente"""
+
+    def __init__(self, files, fail_publish=False):
+        self.files = dict(files)
+        self.fail_publish = fail_publish
+
+    def rename(self, source, target):
+        if source not in self.files:
+            raise error_perm('550 No such file')
+        if target in self.files:
+            raise error_perm('550 File exists')
+        if self.fail_publish and source.endswith('.part'):
+            raise error_perm('553 Could not rename')
+        self.files[target] = self.files.pop(source)
+
+    def delete(self, name):
+        if name not in self.files:
+            raise error_perm('550 No such file')
+        del self.files[name]
+
+
+def test_rename_replaces_existing_file():
+    ftp = NoOverwriteFTP({'royo.csv': 'viejo', 'royo.csv.part': 'nuevo'})
+    FTPUploader._rename(ftp, 'royo.csv.part', 'royo.csv')
+    assert ftp.files == {'royo.csv': 'nuevo'}
+
+
+def test_failed_rename_keeps_published_file():
+    ftp = NoOverwriteFTP({'royo.csv': 'viejo', 'royo.csv.part': 'nuevo'}, fail_publish=True)
+    with pytest.raises(error_perm):
+        FTPUploader._rename(ftp, 'royo.csv.part', 'royo.csv')
+    assert ftp.files['royo.csv'] == 'viejo'
+    assert 'royo.csv' + BACKUP_SUFFIX not in ftp.files
+
+
+def test_stale_backup_does_not_block_publishing():
+    ftp = NoOverwriteFTP({'royo.csv': 'viejo', 'royo.csv.part': 'nuevo', 'royo.csv' + BACKUP_SUFFIX: 'antiguo'})
+    FTPUploader._rename(ftp, 'royo.csv.part', 'royo.csv')
+    assert ftp.files == {'royo.csv': 'nuevo'}
@@ -0,0 +1,55 @@
+import copy
+import csv
+import json
+import os
+import time
+
+from id_registry import IdRegistry, PRODUCT_NAMESPACE
+import get_complementos
+import royo_prestashop_ftp as scraper
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BRAND_URL = 'https://www.todomueblesdebano.com/marcas/royo/'
+
+
+def test_preferred_id_used_only_when_free(tmp_path):
+    registry = IdRegistry(str(tmp_path / 'ids.sqlite'))
+    assert registry.get_or_allocate(PRODUCT_NAMESPACE, 'a', 87, preferred_id=88) == 88
+    assert registry.get_or_allocate(PRODUCT_NAMESPACE, 'b', 87, preferred_id=88) == 89
+    assert registry.get_or_allocate(PRODUCT_NAMESPACE, 'a', 87, preferred_id=90) == 88
+    registry.close()
+
+
+def test_new_product_ids_follow_list_order(tmp_path, monkeypatch):
+    with open(os.path.join(REPO_DIR, 'nuxt_data.json'), encoding='utf-8') as f:
+        nuxt_data = json.load(f)
+
+    def fetch_nuxt_data(product_url, session=None):
+        i = int(product_url.rsplit('-', 1)[1].split('.')[0])
+        time.sleep(0.05 * (4 - i))  # El primero de la lista es el último en terminar
+        data = copy.deepcopy(nuxt_data)
+        data['state']['product']['product']['id'] = f'uuid-{i}'
+        return data
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scraper, 'timestamp', '20250101000000')
+    monkeypatch.setattr(scraper, 'PRODUCT_WORKERS', 3)
+    monkeypatch.setattr(scraper, 'CHECKPOINT_ENABLED', False)
+    monkeypatch.setattr(scraper, 'INCREMENTAL_MODE', False)
+    monkeypatch.setattr(scraper, 'create_chrome_driver', lambda fast=None: None)
+    monkeypatch.setattr(scraper, 'get_all_product_urls_from_brand', lambda driver, brand_url, **kwargs: [
+        {'marca': 'Royo', 'coleccion': 'Colección', 'url': f'https://www.todomueblesdebano.com/mueble-{i}.html'}
+        for i in (1, 2, 3)])
+    monkeypatch.setattr(scraper, 'fetch_nuxt_data', fetch_nuxt_data)
+    monkeypatch.setattr(scraper, 'leer_configuracion_ftp', lambda filename: None)
+    monkeypatch.setattr(get_complementos, '_fetch_api_json', lambda url, params, session=None:
+                        (200, {'complement_types': []} if url.endswith('complement_types/') else []))
+    scraper.main([BRAND_URL])
+
+    with open('20250101000000-royo-products_import.csv', encoding='utf-8', newline='') as f:
+        product_ids = [row['Product ID'] for row in csv.DictReader(f, delimiter=';')]
+    with open('20250101000000-royo-combinations_import.csv', encoding='utf-8', newline='') as f:
+        combination_ids = {row['Id del Producto'] for row in csv.DictReader(f, delimiter=';')}
+    # Registro vacío: los IDs por posición de siempre (86 + i)
+    assert product_ids == ['87', '88', '89']
+    assert combination_ids == {'87', '88', '89'}
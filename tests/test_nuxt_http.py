@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from nuxt_http import NuxtParseError, extract_nuxt_script, parse_nuxt_payload, project_nuxt_data
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def nuxt_clon():
+    with open(os.path.join(REPO_DIR, 'nuxt_clon.js'), encoding='utf-8') as f:
+        return parse_nuxt_payload(extract_nuxt_script(f.read()))
+
+
+def test_nuxt_clon_fixture(nuxt_clon):
+    assert nuxt_clon['serverRendered'] is True
+    assert nuxt_clon['routePath'] == '/conjunto-mueble-de-bano-royo-wave-1-cajon.html'
+
+    product = nuxt_clon['state']['product']['product']
+    assert product['id'] == 'd1d3408d-cb8b-4d31-a73b-74146cc58d5b'
+    assert product['name'] == 'Conjunto mueble de baño Royo Wave'
+    assert product['ean'] == '8414623378408'
+    assert product['prices'] == {'pv_cost_price': 29376, 'pvp_supplier': 68002, 'pvp_web': 56204,
+                                 'web_discount': 17.35, 'professional_discount': 8}
+    assert product['facility_available'] is False and product['sustainability'] is True
+    assert product['sku_sm'] is None
+
+    assert len(product['variants']) == 24
+    variant = product['variants'][0]
+    assert variant['ref'] == 'C0073294'
+    assert variant['prices']['pvp_web'] == 63504
+    assert [option['name'] for option in variant['options']['options']] == [
+        '100 cm', 'Arena mate', 'Sin espejo / ver otras opciones en complementos']
+
+    technical_data = nuxt_clon['state']['product']['technical_data']
+    assert len(technical_data) == 20
+    assert technical_data[0]['attribute']['name'] == 'Tamaño de lavabo'
+    assert technical_data[0]['options'][0]['option']['value_string'] == \
+        'Lavabo cerámico mide entre 1cm y 1,5 cm más que el mueble.'
+    assert 'complement_types' in nuxt_clon['state']['product']['configuration']['options']
+    assert set(project_nuxt_data(nuxt_clon)['state']['product']) == {'product', 'technical_data', 'configuration'}
+
+
+def test_supported_syntax():
+    script = ("(function(a,b,c){a.x=[1,,2];b[0]=c;return {a,b,n:void 0,t:!0,f:!1,arr:Array(2),"
+              "'k':a.x[2],\"q\":-1.5e1,h:0x1F,}}({},[],'s\\u00f1'))")
+    assert parse_nuxt_payload(script) == {'a': {'x': [1, None, 2]}, 'b': ['sñ'], 'n': None, 't': True, 'f': False,
+                                          'arr': [None, None], 'k': 2, 'q': -15, 'h': 31}
+
+
+@pytest.mark.parametrize('script', [
+    "(function(a){return {d:new Date(0),y:1}}(1))",
+    "(function(a){return {x:a.b(1)}}({b:1}))",
+    "(function(a){return {x:foo}}(1))",
+    "(function(a){return {x:1 y:2}}(1))",
+    "(function(a){return {x:1+2}}(1))",
+    "(function(a){return [1 2]}(1))",
+    "(function(a){b.c=1;return a}(1))",
+])
+def test_unsupported_syntax_raises(script):
+    with pytest.raises(NuxtParseError):
+        parse_nuxt_payload(script)
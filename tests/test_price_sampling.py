@@ -0,0 +1,23 @@
+import uuid
+
+import royo_prestashop_ftp as scraper
+
+
+def sampled(uuids):
+    return [product_uuid for product_uuid in uuids if scraper.price_dom_sampled(product_uuid)]
+
+
+def test_same_products_sampled_every_run(monkeypatch):
+    monkeypatch.setattr(scraper, 'PRICE_DOM_SAMPLE_RATE', 0.1)
+    uuids = [str(uuid.uuid5(uuid.NAMESPACE_URL, f'producto-{i}')) for i in range(2000)]
+    first = sampled(uuids)
+    assert first == sampled(uuids) == sampled(reversed(uuids))[::-1]
+    assert 150 < len(first) < 250
+
+
+def test_sample_rate_bounds(monkeypatch):
+    uuids = [f'uuid-{i}' for i in range(100)]
+    monkeypatch.setattr(scraper, 'PRICE_DOM_SAMPLE_RATE', 0)
+    assert sampled(uuids) == []
+    monkeypatch.setattr(scraper, 'PRICE_DOM_SAMPLE_RATE', 1)
+    assert sampled(uuids) == uuids
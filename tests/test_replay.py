@@ -0,0 +1,73 @@
+import copy
+import glob
+import gzip
+import json
+import os
+
+import pytest
+
+import get_complementos
+import royo_prestashop_ftp as scraper
+from replay_archive import ReplayMiss, API, NUXT
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BRAND_URL = 'https://www.todomueblesdebano.com/marcas/prueba/'
+
+
+@pytest.fixture
+def offline_run(tmp_path, monkeypatch):
+    """Ejecución con la red sustituida por datos fijos, en un directorio temporal"""
+    with open(os.path.join(REPO_DIR, 'nuxt_data.json'), encoding='utf-8') as f:
+        nuxt_data = json.load(f)
+
+    def fetch_nuxt_data(product_url, session=None):
+        data = copy.deepcopy(nuxt_data)
+        data['state']['product']['product']['id'] = 'uuid-' + product_url.rsplit('-', 1)[1].split('.')[0]
+        data['state']['product']['configuration']['options'].pop('complement_types', None)
+        return data
+
+    def fetch_api_json(url, params, session=None):
+        if url.endswith('complement_types/'):
+            return 200, {'complement_types': [{'id': 't1', 'web_name': 'Espejos'}]}
+        return 200, [{'id': 'c1', 'name': 'Espejo', 'ref': 'E1', 'price': 1000, 'pvp_supplier': 2000}]
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scraper, 'timestamp', '20250101000000')
+    monkeypatch.setattr(scraper, 'create_chrome_driver', lambda fast=None: None)
+    monkeypatch.setattr(scraper, 'get_all_product_urls_from_brand', lambda driver, brand_url, **kwargs: [
+        {'marca': 'Prueba', 'coleccion': 'Colección', 'url': f'https://www.todomueblesdebano.com/mueble-{i}.html'}
+        for i in range(3)])
+    monkeypatch.setattr(scraper, 'fetch_nuxt_data', fetch_nuxt_data)
+    monkeypatch.setattr(scraper, 'leer_configuracion_ftp', lambda filename: None)
+    monkeypatch.setattr(get_complementos, '_fetch_api_json', fetch_api_json)
+    return tmp_path
+
+
+def shorten_archive(source, target, drop):
+    """Copia del archivo sin la primera entrada del tipo `drop`"""
+    with gzip.open(source, 'rt', encoding='utf-8') as f:
+        lines = f.readlines()
+    dropped = next(line for line in lines if json.loads(line)['kind'] == drop)
+    with gzip.open(target, 'wt', encoding='utf-8') as f:
+        f.writelines(line for line in lines if line is not dropped)
+
+
+@pytest.mark.parametrize('drop', [NUXT, API])
+def test_shortened_archive_stops_replay(offline_run, drop):
+    archive_path = str(offline_run / 'run.jsonl.gz')
+    scraper.main([BRAND_URL], record_path=archive_path)
+
+    replay_dir = offline_run / 'replay'
+    replay_dir.mkdir()
+    os.chdir(replay_dir)
+    scraper.main([], replay_path=archive_path)
+    assert glob.glob('*-prueba-products_import.csv')
+
+    short_path = str(offline_run / 'short.jsonl.gz')
+    shorten_archive(archive_path, short_path, drop)
+    short_dir = offline_run / 'short'
+    short_dir.mkdir()
+    os.chdir(short_dir)
+    with pytest.raises(ReplayMiss):
+        scraper.main([], replay_path=short_path)
+    assert not glob.glob('*.csv')
@@ -0,0 +1,80 @@
+"""
+Limpieza de textos para los CSVs de PrestaShop, común a productos y
+complementos. Cada CSV tiene su perfil: una tabla de reemplazos que solo se
+diferencia en qué se pone en lugar de ';'. Los espacios en blanco (saltos
+de línea, tabuladores...) se colapsan en una sola pasada al final, así que
+no necesitan entrada en la tabla. Para limpiar varias columnas de una fila
+(o una columna entera) de una vez está clean_texts / clean_row_columns.
+"""
+
+# ================================
+# PERFILES
+# ================================
+def _profile(semicolon):
+    """Tabla (buscar, reemplazar) en el orden en que se aplica"""
+    return (
+        ('&nbsp;', ' '),  # antes que ';'
+        ('"', ''),
+        (';', semicolon),
+        ('|', '-'),
+        ('\x00', ''), ('\x0b', ''), ('\x0c', ''),  # \x0b y \x0c se quitan, no cuentan como espacio
+    )
+
+# Productos: ';' → espacio. Complementos: ';' → ','
+PRODUCT_PROFILE = _profile(' ')
+COMPLEMENT_PROFILE = _profile(',')
+
+# Separador para limpiar varios textos juntos: no es espacio ni está en las tablas
+_BATCH_SEPARATOR = '\ue000'
+
+
+def _apply(text, profile):
+    for old, new in profile:
+        if old in text:
+            text = text.replace(old, new)
+    # Colapsa cualquier espacio en blanco (también \n, \r, \t) y recorta los extremos
+    return ' '.join(text.split())
+
+
+def clean_text(text, profile=PRODUCT_PROFILE):
+    """Limpia texto HTML removiendo saltos de línea y caracteres problemáticos para CSV"""
+    if not text:
+        return ""
+    return _apply(str(text), profile)
+
+
+def clean_texts(texts, profile=PRODUCT_PROFILE):
+    """
+    clean_text de varios textos en una sola llamada (las columnas de texto de
+    una fila, o una columna entera): se unen, se limpian juntos y se separan.
+    """
+    texts = [str(text) if text else '' for text in texts]
+    joined = _BATCH_SEPARATOR.join(texts)
+    if joined.count(_BATCH_SEPARATOR) != len(texts) - 1:
+        # El separador venía en algún texto: uno a uno
+        return [clean_text(text, profile) for text in texts]
+    return [part.strip() for part in _apply(joined, profile).split(_BATCH_SEPARATOR)]
+
+
+def clean_row_columns(row, columns, profile=PRODUCT_PROFILE):
+    """Limpia en la fila (in situ) las columnas indicadas; retorna la fila"""
+    for column, cleaned in zip(columns, clean_texts([row[column] for column in columns], profile)):
+        row[column] = cleaned
+    return row
+
+
+def clean_dimension_value(value):
+    """Limpia valores de dimensiones para que sean compatibles con PrestaShop"""
+    if not value:
+        return ""
+
+    # Convertir a string y quitar "cm" y espacios
+    value = str(value).strip().replace(' cm', '').replace('cm', '').replace(' ', '')
+    if not value:
+        return ""
+
+    # Intentar convertir a float para validar que sea numérico
+    try:
+        return str(float(value.replace(',', '.')))  # Cambiar comas por puntos
+    except (ValueError, TypeError):
+        return ""  # Si no se puede convertir, devolver vacío